@@ -1,71 +1,108 @@
+from gevent import monkey
+# Make threading locks cooperative so a game's lock can be held while emitting to its players
+monkey.patch_all()
+
 from functools import wraps
-import json
 from json.decoder import JSONDecodeError
-from typing import Dict, List
-import os
-from time import sleep
-from flask import Flask, request, abort, jsonify, make_response
-import jsonpatch
-from flask_socketio import SocketIO, join_room
+from typing import Dict, List, Optional, Tuple
+from time import sleep, perf_counter
+import gevent
+from flask import Flask, request, abort, jsonify, make_response, redirect, g
+from flask_socketio import SocketIO
 
 from player import Player
 from game import Game
+from config import CLIENT_ORIGIN, HOST, PORT, COOKIE_MAX_AGE, MESSAGE_QUEUE, UPDATE_WINDOW_MS
+from coalescing import Coalescer
+import lobby
+import metrics
+import moves
+import profiler
+import routing
+import serializer
 import util
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'secret!'
-socketio = SocketIO(app)
-
-# Handle OS interrupts
-util.register_signal_handler()
-
-games: Dict[str, Game] = {}
-clients: Dict[str, str] = {}
+socketio = SocketIO(app, message_queue=MESSAGE_QUEUE)
 
-if 'TBG_CLIENT_ORIGIN' in os.environ:
-    CLIENT_ORIGIN = os.environ['TBG_CLIENT_ORIGIN']
+@socketio.on('connect')
+def on_connect(auth=None):
+    metrics.sockets.inc()
 
-# Construct host and port from environment variables
-HOST = os.getenv('TBG_HOST', '0.0.0.0')
-PORT = os.getenv('TBG_PORT', 8080)
+@socketio.on('disconnect')
+def on_disconnect(reason=None):
+    metrics.sockets.inc(amount=-1)
 
 @socketio.on('login')
 def on_login(login_info):
-    try:
-        game: Game = games[login_info['game']]
-        player: Player = [player for player in game.players if player.token == login_info['token']][0]
-    except KeyError:
-        socketio.emit('error', 'Socket connection must start with sending of token (cookie) and game (id) in JSON format')
+    result: Dict = lobby.socket_login(login_info, request.sid)
+    if result.get('redirect'):
+        # The client logs in again on a socket to the node serving the game
+        socketio.emit('redirect', result['redirect'], room=request.sid)
         return
-    except IndexError:
-        socketio.emit('error', 'User does not exist')
+    if result.get('error'):
+        socketio.emit('error', result['error'], room=request.sid)
         return
-    player.socket_sid = request.sid
-    socketio.emit('client full', json.dumps(game.retrieve_game(player)), room=player.socket_sid)
+    game: Game = result['game']
+    player: Player = result['player']
+    with game.lock:
+        move_rooms(game, player, result['previous_sid'], request.sid)
+        patches: Optional[List[str]] = lobby.missed_updates(game, player, login_info.get('version'))
+        if patches is None:
+            socketio.emit('client full', serializer.encode_view(game, player), room=request.sid)
+            metrics.emits.inc('client full')
+            return
+        for patch in patches:
+            socketio.emit('client update', patch, room=request.sid)
+        metrics.emits.inc('client update', amount=len(patches))
+
+def move_rooms(game: Game, player: Player, previous_sid: str, sid: str) -> None:
+    '''Moves player's rooms from socket previous_sid to socket sid, either of which may be blank'''
+    for room in lobby.rooms(game, player):
+        if previous_sid:
+            socketio.server.leave_room(previous_sid, room, namespace='/')
+        if sid:
+            socketio.server.enter_room(sid, room, namespace='/')
+
+def close_rooms(game: Game) -> None:
+    '''Empties the rooms of a removed game'''
+    socketio.server.close_room(game.id, namespace='/')
+    for player in game.players:
+        socketio.server.close_room(lobby.rooms(game, player)[1], namespace='/')
+
+lobby.on_remove.append(close_rooms)
 
 def check_valid_request(f):
     '''Decorator. Verifies game exists and client is authorized. Returns game and client'''
     @wraps(f)
     def wrapper(*args, **kwargs):
-        try:
-            game: Game = games[kwargs['game_id']]
-        except KeyError:
-            abort(400, util.error('Game does not exist'))
+        with profiler.span(request.url_rule.rule), profiler.sample():
+            result: Dict = error_check(lobby.authorize(kwargs['game_id'], request.cookies.get('tbg_token')))
+            game: Game = result['game']
+            with game.lock:
+                version: int = game.version
+                try:
+                    return f(game, result['player'])
+                finally:
+                    if game.version != version:
+                        lobby.save(game)
+    return wrapper
 
-        try:
-            player: Player = [player for player in game.players if player.token == request.cookies.get('tbg_token')][0]
-        except IndexError:
-            abort(400, util.error('Not authorized to view game'))
+def send_updates(game):
+    '''Sends each player a JSON patch of the changes made since the last update'''
+    with game.lock:
+        updates: List[Tuple[str, str]] = lobby.client_updates(game)
+        with profiler.span('update.emit'):
+            for room, patch in updates:
+                socketio.emit('client update', patch, room=room)
 
-        return f(game, player)
-    return wrapper
+coalescer = Coalescer(UPDATE_WINDOW_MS / 1000, send_updates, gevent.spawn_later)
+lobby.on_remove.append(coalescer.forget)
 
 def update_client(game):
-    for player in game.players:
-        update = game.retrieve_game(player)
-        patch = jsonpatch.make_patch(player.last_update, update)
-        socketio.emit('client update', patch.to_string(), room=player.socket_sid)
-        player.last_update = update
+    '''Updates players on the changes made since the last update, now or merged with later moves'''
+    coalescer.update(game)
 
 def error_check(result: Dict) -> Dict:
     '''Aborts with 400 if result is error'''
@@ -79,6 +116,35 @@ def error400(err):
     return jsonify(err.description), 400
 
 
+@app.before_request
+def start_timer():
+    g.request_start = perf_counter()
+
+
+@app.before_request
+def route_to_owner():
+    '''Redirects requests for a game served by another node to that node'''
+    game_id: str = (request.view_args or {}).get('game_id')
+    if game_id and not routing.is_local(game_id):
+        return owner_redirect(routing.owner(game_id))
+    return None
+
+
+def owner_redirect(node: str):
+    '''Redirects the request to node, which serves the game it's for'''
+    return redirect(node + request.full_path.rstrip('?'), code=307)
+
+
+@app.after_request
+def record_request(response):
+    '''Records request latency by route'''
+    start: Optional[float] = g.get('request_start')
+    if start is not None:
+        rule: str = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.requests.observe(perf_counter() - start, rule, request.method)
+    return response
+
+
 @app.after_request
 def enable_cors(response):
     '''Verifies server responds to all requests'''
@@ -87,9 +153,16 @@ def enable_cors(response):
         response.headers['Access-Control-Allow-Origin'] = CLIENT_ORIGIN
     response.headers['Access-Control-Allow-Credentials'] = 'true'
     response.headers['Access-Control-Allow-Methods'] = 'GET, POST, PUT, OPTIONS'
-    response.headers['Access-Control-Allow-Headers'] = 'Origin, Accept, Content-Type, X-Requested-With, X-CSRF-Token, user-agent'
+    response.headers['Access-Control-Allow-Headers'] = ('Origin, Accept, Content-Type, X-Requested-With, '
+                                                        'X-CSRF-Token, user-agent')
     return response
 
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    '''Returns server metrics in the Prometheus text format'''
+    return app.response_class(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
 @app.route('/api/access', methods=['GET'])
 def access() -> Dict:
     '''
@@ -97,14 +170,10 @@ def access() -> Dict:
     sends user their game info. If not, it takes them to the login page.
     '''
     cookie: str = request.cookies.get('tbg_token')
-    try:
-        game_id: str = clients[cookie]
-    except KeyError:
-        abort(400, util.error('Access denied'))
-    if games[game_id].status == 'Completed':
-        abort(400, util.error('Game already completed'))
-    player: Player = util.shrink([player for player in games[game_id].players if player.token == request.cookies.get('tbg_token')])
-    return jsonify({'game': game_id, "player_name": player.name})
+    result: Dict = lobby.access(cookie)
+    if result.get('redirect'):
+        return owner_redirect(result['redirect'])
+    return jsonify(error_check(result))
 
 
 @app.route('/api/login', methods=['POST'])
@@ -120,34 +189,31 @@ def login() -> Dict:
     except KeyError:
         abort(400, util.error('Incorrect JSON data'))
 
-    # Get first public game
-    game: Game = util.shrink([games[game_id] for game_id in games if games[game_id].game_type == 'public'])
-
-    # If game game_id isn't a blank string, use that game
-    if game_id in games:
-        game = games[game_id]
-
-    if name in [player.name for player in game.players]:
-        abort(400, util.error('User already exists with that name'))
-    if game.status != 'Awaiting':
-        abort(400, util.error('Game has already started or ended'))
-    if game.is_full():
-        abort(400, util.error('Game is full'))
-
-    player: Player = Player(name)
-    game.add_player(player)
-    clients[player.token] = game_id
+    result: Dict = lobby.join_game(name, game_id)
+    if result.get('redirect'):
+        return owner_redirect(result['redirect'])
+    error_check(result)
     response = make_response(jsonify(util.success('Successfully logged into game')))
-    response.set_cookie('tbg_token', player.token, max_age=6000)
-    update_client(game)
+    response.set_cookie('tbg_token', result['player'].token, max_age=COOKIE_MAX_AGE)
+    update_client(result['game'])
     return response
 
+@app.route('/api/games', methods=['GET'])
+def list_games() -> Dict:
+    '''Lists public games waiting for players, a page at a time (offset and limit query parameters)'''
+    try:
+        offset: int = int(request.args.get('offset', 0))
+        limit: int = int(request.args.get('limit', 20))
+    except ValueError:
+        abort(400, util.error('Offset and limit must be integers'))
+    return jsonify(error_check(lobby.list_games(offset, limit)))
+
 @app.route('/api/create', methods=['POST'])
 def create_new_game():
     '''Creates new player and game, returns game id'''
     post_data: Dict = request.get_json()
     try:
-        player: Player = Player(post_data['name'])
+        name: str = post_data['name']
     except KeyError:
         abort(400, util.error('Name not supplied'))
 
@@ -155,34 +221,31 @@ def create_new_game():
         game_type: str = post_data['game_type']
     except KeyError:
         abort(400, util.error('Game type not supplied'))
-    if game_type not in ('public', 'private'):
-        abort(400, util.error('Invalid game type parameter'))
-
-    game: Game = Game(game_type)
-    game.add_player(player)
-    games[game.id] = game
-    clients[player.token] = game.id
-    response = make_response(jsonify({'game': game.id}))
-    response.set_cookie('tbg_token', player.token, max_age=6000)
+
+    seed: Optional[int] = post_data['seed'] if 'seed' in post_data else None
+
+    result: Dict = error_check(lobby.create_game(name, game_type, seed))
+    response = make_response(jsonify({'game': result['game'].id}))
+    response.set_cookie('tbg_token', result['player'].token, max_age=COOKIE_MAX_AGE)
     return response
 
 @app.route('/api/game/<game_id>/leave', methods=['POST'])
 @check_valid_request
 def leave_game(game: Game, player: Player) -> Dict:
     '''Player leaves game'''
-    result: Dict = game.leave_game(player)
+    result: Dict = lobby.leave_game(game, player)
     error_check(result)
+    move_rooms(game, player, player.socket_sid, '')
+    update_client(game)
     response = make_response(jsonify(result))
-    response.set_cookie('tbg_token', '', max_age=6000)
+    response.set_cookie('tbg_token', '', max_age=COOKIE_MAX_AGE)
     return response
 
 @app.route('/api/game/<game_id>', methods=['GET'])
 @check_valid_request
 def game_status(game: Game, player: Player) -> Dict:
     '''Returns all game info'''
-    result: Dict = game.retrieve_game(player)
-    error_check(result)
-    return jsonify(result)
+    return app.response_class(serializer.encode_view(game, player), mimetype='application/json')
 
 
 @app.route('/api/game/<game_id>/start', methods=['POST'])
@@ -306,6 +369,19 @@ def reject_trade(game: Game, player: Player) -> Dict:
     update_client(game)
     return jsonify(result)
 
+@app.route('/api/game/<game_id>/moves', methods=['POST'])
+@check_valid_request
+def make_moves(game: Game, player: Player) -> Dict:
+    '''Makes a list of moves in order, all of them or none if one fails, then updates players once'''
+    post_data: Dict = request.get_json()
+    try:
+        batch: List[Dict] = post_data['moves']
+    except (KeyError, TypeError):
+        abort(400, util.error('Incorrect JSON data'))
+    result: Dict = error_check(moves.apply_moves(game, player, batch))
+    update_client(game)
+    return jsonify(result)
+
 @app.route('/api/game/<game_id>/buy', methods=['POST'])
 @check_valid_request
 def buy_field(game: Game, player: Player) -> Dict:
@@ -315,5 +391,9 @@ def buy_field(game: Game, player: Player) -> Dict:
     update_client(game)
     return jsonify(result)
 
-print("Server starting {}:{}".format(HOST, PORT))
-socketio.run(app, HOST, PORT)
+if __name__ == '__main__':
+    # Handle OS interrupts
+    util.register_signal_handler()
+    lobby.start()
+    print("Server starting {}:{}".format(HOST, PORT))
+    socketio.run(app, HOST, PORT)
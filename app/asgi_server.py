@@ -0,0 +1,374 @@
+'''
+Asyncio server mode. Serves the same REST routes and Socket.IO events as TBG.py on an
+ASGI server (uvicorn), driving the same game engine and lobby state.
+
+Run with: python app/asgi_server.py
+'''
+import asyncio
+import json
+import time
+from collections import defaultdict
+from http.cookies import SimpleCookie
+from urllib.parse import parse_qsl
+from typing import Dict, List, Optional, Tuple
+
+import socketio
+import uvicorn
+
+from config import CLIENT_ORIGIN, HOST, PORT, COOKIE_MAX_AGE, MESSAGE_QUEUE, UPDATE_WINDOW_MS
+from coalescing import Coalescer
+from game import Game
+import lobby
+import metrics
+import moves
+import profiler
+import routing
+import serializer
+import util
+
+sio = socketio.AsyncServer(
+    async_mode='asgi',
+    cors_allowed_origins=CLIENT_ORIGIN or '*',
+    client_manager=socketio.AsyncRedisManager(MESSAGE_QUEUE) if MESSAGE_QUEUE else None
+)
+
+# Held while a game's updates are sent, so concurrent moves reach players in the order made.
+# Handlers run on one event loop, so moves never interleave with each other, but still take
+# the game's lock against the journal's checkpoint thread and the reaper. Everything else the
+# server keeps is only touched on the loop; the reaper hands removed games over with on_remove.
+update_locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+
+# Event loop the server runs on, set at startup
+loop: Optional[asyncio.AbstractEventLoop] = None
+
+CORS_HEADERS: List[Tuple[bytes, bytes]] = [
+    (b'access-control-allow-credentials', b'true'),
+    (b'access-control-allow-methods', b'GET, POST, PUT, OPTIONS'),
+    (b'access-control-allow-headers',
+     b'Origin, Accept, Content-Type, X-Requested-With, X-CSRF-Token, user-agent')
+]
+if CLIENT_ORIGIN:
+    CORS_HEADERS.append((b'access-control-allow-origin', CLIENT_ORIGIN.encode()))
+
+
+class Request:
+    '''HTTP request parsed from an ASGI scope and body'''
+
+    def __init__(self, scope: Dict, body: bytes) -> None:
+        self.method: str = scope['method']
+        self.path: str = scope['path']
+        self.query_string: str = scope.get('query_string', b'').decode('latin-1')
+        self.query: Dict[str, str] = dict(parse_qsl(self.query_string))
+        self.body: bytes = body
+        cookie = SimpleCookie()
+        for name, value in scope['headers']:
+            if name == b'cookie':
+                cookie.load(value.decode('latin-1'))
+        self.cookies: Dict[str, str] = {key: morsel.value for key, morsel in cookie.items()}
+
+    def get_json(self) -> Optional[Dict]:
+        try:
+            return json.loads(self.body)
+        except ValueError:
+            return None
+
+
+class Response:
+    '''
+    HTTP response, optionally setting the token cookie and updating a game's players once sent.
+    Without a status, the response is a 400 if body is an error and a 200 otherwise. Players
+    aren't updated after an error, as a request that fails leaves the game as it was.
+    A game the request changed is set as save, and saved before the response is sent.
+    '''
+
+    def __init__(self, body: Dict, status: Optional[int] = None, token: Optional[str] = None,
+                 update: Optional[Game] = None, encoded: Optional[str] = None,
+                 location: Optional[str] = None, content_type: str = 'application/json') -> None:
+        self.status: int = status if status is not None else 400 if body.get('error') else 200
+        self.body: bytes = (encoded if encoded is not None else serializer.dumps(body)).encode()
+        self.token: Optional[str] = token
+        self.update: Optional[Game] = update if self.status == 200 else None
+        self.location: Optional[str] = location
+        self.content_type: str = content_type
+        self.save: Optional[Game] = None
+
+    def headers(self) -> List[Tuple[bytes, bytes]]:
+        headers: List[Tuple[bytes, bytes]] = [(b'content-type', self.content_type.encode())] + CORS_HEADERS
+        if self.location is not None:
+            headers.append((b'location', self.location.encode()))
+        if self.token is not None:
+            cookie: str = 'tbg_token={}; Max-Age={}; Path=/'.format(self.token, COOKIE_MAX_AGE)
+            headers.append((b'set-cookie', cookie.encode()))
+        return headers
+
+
+def owner_redirect(request: Request, node: str) -> Response:
+    '''Redirects request to node, which serves the game it's for'''
+    target: str = node + request.path
+    if request.query_string:
+        target += '?' + request.query_string
+    return Response({}, 307, location=target)
+
+
+def access(request: Request) -> Response:
+    result: Dict = lobby.access(request.cookies.get('tbg_token'))
+    if result.get('redirect'):
+        return owner_redirect(request, result['redirect'])
+    return Response(result)
+
+
+def login(request: Request) -> Response:
+    post_data = request.get_json()
+    try:
+        name: str = post_data['name']
+        game_id: str = post_data['game']
+    except (KeyError, TypeError):
+        return Response(util.error('Incorrect JSON data'))
+    result: Dict = lobby.join_game(name, game_id)
+    if result.get('redirect'):
+        return owner_redirect(request, result['redirect'])
+    if result.get('error'):
+        return Response(result)
+    return Response(util.success('Successfully logged into game'), token=result['player'].token,
+                    update=result['game'])
+
+
+def list_games(request: Request) -> Response:
+    try:
+        offset: int = int(request.query.get('offset', '0'))
+        limit: int = int(request.query.get('limit', '20'))
+    except ValueError:
+        return Response(util.error('Offset and limit must be integers'))
+    return Response(lobby.list_games(offset, limit))
+
+
+def create_new_game(request: Request) -> Response:
+    post_data = request.get_json()
+    try:
+        name: str = post_data['name']
+    except (KeyError, TypeError):
+        return Response(util.error('Name not supplied'))
+    if 'game_type' not in post_data:
+        return Response(util.error('Game type not supplied'))
+    result: Dict = lobby.create_game(name, post_data['game_type'], post_data.get('seed'))
+    if result.get('error'):
+        return Response(result)
+    return Response({'game': result['game'].id}, token=result['player'].token)
+
+
+def game_request(request: Request, game_id: str, move: str) -> Response:
+    '''Handles every route under /api/game/<game_id>'''
+    if route_name(request.path) == 'unmatched':
+        return Response(util.error('Not found'), 404)
+    # The game's view is the only GET route, every move is a POST
+    if request.method != ('GET' if move == '' else 'POST'):
+        return Response(util.error('Method not allowed'), 405)
+    if not routing.is_local(game_id):
+        return owner_redirect(request, routing.owner(game_id))
+    result: Dict = lobby.authorize(game_id, request.cookies.get('tbg_token'))
+    if result.get('error'):
+        return Response(result)
+    game: Game = result['game']
+    with game.lock:
+        version: int = game.version
+        with profiler.span(route_name(request.path)), profiler.sample():
+            response: Response = game_action(request, game, result['player'], move)
+        if game.version != version:
+            response.save = game
+    return response
+
+
+def game_action(request: Request, game: Game, player, move: str) -> Response:
+    if move == '':
+        return Response({}, encoded=serializer.encode_view(game, player))
+    if move == 'leave':
+        result = lobby.leave_game(game, player)
+        if not result.get('error'):
+            asyncio.ensure_future(move_rooms(game, player, player.socket_sid, ''))
+        return Response(result, token='' if not result.get('error') else None, update=game)
+    if move == 'moves':
+        post_data = request.get_json()
+        if not isinstance(post_data, dict) or 'moves' not in post_data:
+            return Response(util.error('Incorrect JSON data'))
+        return Response(moves.apply_moves(game, player, post_data['moves']), update=game)
+    return Response(moves.apply_move(game, player, move, request.get_json()), update=game)
+
+
+def route_name(path: str) -> str:
+    '''Returns path as the matching route in TBG.py, to label request metrics the same way'''
+    if path in ('/api/access', '/api/login', '/api/games', '/api/create', '/metrics'):
+        return path
+    if path.startswith('/api/game/'):
+        move: str = path[len('/api/game/'):].partition('/')[2]
+        if move == '':
+            return '/api/game/<game_id>'
+        if move in moves.MOVES or move in ('leave', 'moves'):
+            return '/api/game/<game_id>/' + move
+    return 'unmatched'
+
+
+def route(request: Request) -> Response:
+    if request.method == 'OPTIONS':
+        return Response({})
+    if request.path == '/metrics' and request.method == 'GET':
+        return Response({}, encoded=metrics.render(), content_type=metrics.CONTENT_TYPE)
+    if request.path == '/api/access' and request.method == 'GET':
+        return access(request)
+    if request.path == '/api/login' and request.method == 'POST':
+        return login(request)
+    if request.path == '/api/games' and request.method == 'GET':
+        return list_games(request)
+    if request.path == '/api/create' and request.method == 'POST':
+        return create_new_game(request)
+    if request.path.startswith('/api/game/'):
+        game_id, _, move = request.path[len('/api/game/'):].partition('/')
+        return game_request(request, game_id, move)
+    return Response(util.error('Not found'), 404)
+
+
+async def http_app(scope: Dict, receive, send) -> None:
+    '''ASGI application serving the REST API'''
+    global loop
+    if scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                loop = asyncio.get_event_loop()
+                lobby.start()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+    if scope['type'] != 'http':
+        return
+
+    body: bytes = b''
+    more_body: bool = True
+    while more_body:
+        message = await receive()
+        body += message.get('body', b'')
+        more_body = message.get('more_body', False)
+
+    start: float = time.perf_counter()
+    response: Response = route(Request(scope, body))
+    if response.save is not None:
+        await save(response.save)
+    metrics.requests.observe(time.perf_counter() - start, route_name(scope['path']), scope['method'])
+    await send({'type': 'http.response.start', 'status': response.status, 'headers': response.headers()})
+    await send({'type': 'http.response.body', 'body': response.body})
+    if response.update is not None:
+        await update_client(response.update)
+
+
+async def save(game: Game) -> None:
+    '''Saves game after a request changed it, on another thread if saving waits on a server'''
+    def save_locked() -> None:
+        with game.lock:
+            lobby.save(game)
+    if lobby.store.blocking:
+        await asyncio.get_event_loop().run_in_executor(None, save_locked)
+    else:
+        save_locked()
+
+
+async def send_updates(game: Game) -> None:
+    '''Sends each player a JSON patch of the changes made since the last update'''
+    async with update_locks[game.id]:
+        with game.lock:
+            updates: List[Tuple[str, str]] = lobby.client_updates(game)
+        with profiler.span('update.emit'):
+            for room, patch in updates:
+                await sio.emit('client update', patch, room=room)
+
+
+def call_later(delay: float, flush) -> None:
+    '''Runs flush, and the update it may start, after delay seconds on the event loop'''
+    async def later() -> None:
+        await asyncio.sleep(delay)
+        sending = flush()
+        if sending is not None:
+            await sending
+    asyncio.ensure_future(later())
+
+
+coalescer: Coalescer = Coalescer(UPDATE_WINDOW_MS / 1000, send_updates, call_later)
+
+
+async def update_client(game: Game) -> None:
+    '''Updates players on the changes made since the last update, now or merged with later moves'''
+    sending = coalescer.update(game)
+    if sending is not None:
+        await sending
+
+
+async def move_rooms(game: Game, player, previous_sid: str, sid: str) -> None:
+    '''Moves player's rooms from socket previous_sid to socket sid, either of which may be blank'''
+    for room in lobby.rooms(game, player):
+        if previous_sid:
+            await sio.leave_room(previous_sid, room)
+        if sid:
+            await sio.enter_room(sid, room)
+
+
+async def close_rooms(game: Game) -> None:
+    '''Empties the rooms of a removed game'''
+    await sio.close_room(game.id)
+    for player in game.players:
+        await sio.close_room(lobby.rooms(game, player)[1])
+
+
+def forget_game(game: Game) -> None:
+    '''Drops what the server keeps for a removed game and closes its rooms'''
+    update_locks.pop(game.id, None)
+    coalescer.forget(game)
+    asyncio.ensure_future(close_rooms(game))
+
+
+def on_remove(game: Game) -> None:
+    '''Hands a game the reaper removed, from the reaper's thread, to the event loop to forget'''
+    if loop is not None:
+        loop.call_soon_threadsafe(forget_game, game)
+
+
+lobby.on_remove.append(on_remove)
+
+
+@sio.on('connect')
+async def on_connect(sid: str, environ: Dict, auth=None) -> None:
+    metrics.sockets.inc()
+
+
+@sio.on('disconnect')
+async def on_disconnect(sid: str, reason=None) -> None:
+    metrics.sockets.inc(amount=-1)
+
+
+@sio.on('login')
+async def on_login(sid: str, login_info: Dict) -> None:
+    result: Dict = lobby.socket_login(login_info, sid)
+    if result.get('redirect'):
+        # The client logs in again on a socket to the node serving the game
+        await sio.emit('redirect', result['redirect'], room=sid)
+        return
+    if result.get('error'):
+        await sio.emit('error', result['error'], room=sid)
+        return
+    game: Game = result['game']
+    player = result['player']
+    await move_rooms(game, player, result['previous_sid'], sid)
+    async with update_locks[game.id]:
+        patches: Optional[List[str]] = lobby.missed_updates(game, player, login_info.get('version'))
+        if patches is None:
+            await sio.emit('client full', serializer.encode_view(game, player), room=sid)
+            metrics.emits.inc('client full')
+            return
+        for patch in patches:
+            await sio.emit('client update', patch, room=sid)
+        metrics.emits.inc('client update', amount=len(patches))
+
+
+app = socketio.ASGIApp(sio, other_asgi_app=http_app)
+
+if __name__ == '__main__':
+    print("ASGI server starting {}:{}".format(HOST, PORT))
+    uvicorn.run(app, host=HOST, port=PORT)
@@ -1,29 +1,132 @@
 import random
-from typing import List, Dict, Tuple
+from collections import OrderedDict, abc
+from typing import List, Dict, FrozenSet, Tuple, Iterable, Iterator, Optional
 import uuid
 import constants
 
 
-class Card:
-    '''Represents one card in game'''
+class CardType:
+    '''Represents one kind of bean. Shared by every card of that kind in every game.'''
+    __slots__ = ('index', 'name', 'count', 'values', 'img_src', 'public', 'payouts')
 
-    def __init__(self, name: str, count: int, values: tuple, img_src: str) -> None:
+    def __init__(self, index: int, name: str, count: int, values: tuple, img_src: str) -> None:
+        self.index: int = index
         self.name: str = name
         self.count: int = count
         self.values: tuple = values
         self.img_src: str = img_src
-        self.id: str = str(uuid.uuid4())[:6]
+        self.public: Dict = {
+            "name": name,
+            "count": count,
+            "values": [val if val != constants.MAX_CARDS else 0 for val in values],
+            "img": img_src
+        }
+        # Coins paid for a field of this type, indexed by field size
+        self.payouts: Tuple[int, ...] = tuple(self.coins_for(size) for size in range(constants.MAX_CARDS + 1))
+
+    def __reduce__(self):
+        # Pickled cards refer back to the shared catalog entry
+        return (get_card_type, (self.index,))
+
+    def coins_for(self, size: int) -> int:
+        '''Returns coins paid for a field of this size. A value of MAX_CARDS means the payout is unreachable.'''
+        bounds: tuple = self.values + (constants.MAX_CARDS,)
+        for coins in range(len(self.values)):
+            if bounds[coins] <= size < bounds[coins + 1]:
+                return coins + 1
+        return 0
+
+
+# Catalog of every card type, built once from constants.CARD_TYPES
+CARD_CATALOG: Tuple[CardType, ...] = tuple(
+    CardType(index, *card_type) for index, card_type in enumerate(constants.CARD_TYPES)
+)
+
+
+CARD_NAMES: FrozenSet[str] = frozenset(card_type.name for card_type in CARD_CATALOG)
+
+
+def get_card_type(index: int) -> CardType:
+    '''Returns card type from catalog'''
+    return CARD_CATALOG[index]
+
+
+class Card:
+    '''Represents one card in game'''
+    __slots__ = ('type', 'id')
+
+    def __init__(self, card_type: CardType, card_id: Optional[str] = None) -> None:
+        self.type: CardType = card_type
+        self.id: str = card_id or str(uuid.uuid4())[:6]
+
+    @property
+    def name(self) -> str:
+        return self.type.name
+
+    @property
+    def count(self) -> int:
+        return self.type.count
+
+    @property
+    def values(self) -> tuple:
+        return self.type.values
+
+    @property
+    def img_src(self) -> str:
+        return self.type.img_src
 
     def to_dict(self) -> Dict:
         '''Returns Card as dictionary'''
-        return {
-            "name": self.name,
-            "count": self.count,
-            "values": [val if val != 24 else 0 for val in self.values],
-            "img": self.img_src,
-            "id": self.id
-        }
-    
+        card: Dict = dict(self.type.public)
+        card["id"] = self.id
+        return card
+
+
+class CardPile(abc.Sized, abc.Iterable):
+    '''
+    Ordered collection of cards indexed by id. Appending, removing the first card and
+    removing any card by id are all O(1). Used for hands, pending cards, fields and the market.
+    '''
+
+    def __init__(self, cards: Iterable[Card] = ()) -> None:
+        self.cards: 'OrderedDict[str, Card]' = OrderedDict((card.id, card) for card in cards)
+
+    def __len__(self) -> int:
+        return len(self.cards)
+
+    def __iter__(self) -> Iterator[Card]:
+        return iter(self.cards.values())
+
+    def __contains__(self, card_id: str) -> bool:
+        return card_id in self.cards
+
+    def append(self, card: Card) -> None:
+        self.cards[card.id] = card
+
+    def extend(self, cards: Iterable[Card]) -> None:
+        for card in cards:
+            self.cards[card.id] = card
+
+    def first(self) -> Card:
+        '''Returns first card without removing it. Raises IndexError if pile is empty.'''
+        for card in self.cards.values():
+            return card
+        raise IndexError('Card pile is empty')
+
+    def get(self, card_id: str) -> Optional[Card]:
+        '''Returns card by id, or None if card isn't in pile'''
+        return self.cards.get(card_id)
+
+    def popleft(self) -> Card:
+        '''Removes first card and returns it'''
+        return self.cards.popitem(last=False)[1]
+
+    def pop(self, card_id: str) -> Card:
+        '''Removes card by id and returns it. Raises KeyError if card isn't in pile.'''
+        return self.cards.pop(card_id)
+
+    def clear(self) -> None:
+        self.cards.clear()
 
 
 class Deck:
@@ -31,22 +134,34 @@ class Deck:
 
     def __init__(self) -> None:
         self.cards: List[Card] = []
+        self.changed: bool = False
 
-    def build_deck(self) -> None:
-        '''Builds deck from standard cards'''
-        for card_type in constants.CARD_TYPES:
-            for _ in range(card_type[1]):
-                new_card: Card = Card(*card_type)
-                self.cards.append(new_card)
+    def build_deck(self, rng: Optional[random.Random] = None) -> None:
+        '''Builds deck from standard cards with distinct ids, drawn from rng if given'''
+        card_count: int = sum(card_type.count for card_type in CARD_CATALOG)
+        population: range = range(1 << 24)
+        ids: Iterator[int] = iter(rng.sample(population, card_count) if rng else random.sample(population, card_count))
+        for card_type in CARD_CATALOG:
+            for _ in range(card_type.count):
+                self.cards.append(Card(card_type, '{:06x}'.format(next(ids))))
 
     def pop(self) -> Card:
-        card: Card = self.cards[-1]
-        self.cards = self.cards[:-1]
+        '''Removes top card of deck and returns it'''
+        card: Card = self.cards.pop()
+        self.changed = True
         return card
 
-    def shuffle(self) -> None:
-        '''Shuffles card in deck'''
-        random.shuffle(self.cards)
+    def add_cards(self, cards: List[Card]) -> None:
+        '''Adds cards to top of deck'''
+        self.cards += cards
+        self.changed = True
+
+    def shuffle(self, rng: Optional[random.Random] = None) -> None:
+        '''Shuffles card in deck, with the given random number generator if any'''
+        if rng:
+            rng.shuffle(self.cards)
+        else:
+            random.shuffle(self.cards)
 
     def get_length(self) -> int:
         '''Returns number of cards in deck'''
@@ -54,8 +169,9 @@ class Deck:
 
     def take_all(self) -> List[Card]:
         '''Removes card from deck and returns them'''
-        all_cards: List[Card] = [card for card in self.cards]
+        all_cards: List[Card] = self.cards
         self.cards = []
+        self.changed = True
         return all_cards
 
 
@@ -63,8 +179,10 @@ class Field:
     '''Represents a field in front of a player'''
 
     def __init__(self, enabled: bool) -> None:
-        self.cards: List[Card] = []
+        self.cards: CardPile = CardPile()
+        self.card_type: Optional[CardType] = None
         self.enabled: bool = enabled
+        self.changed: bool = False
 
     def to_dict(self) -> Dict:
         '''Returns card as dictionary'''
@@ -78,47 +196,42 @@ class Field:
 
     @property
     def name(self) -> str:
-        try:
-            name = self.cards[0].name
-        except IndexError:
-            name = 'Empty'
-        return name
+        return self.card_type.name if self.card_type else 'Empty'
 
     @property
     def image(self) -> str:
-        try:
-            img = self.cards[0].img_src
-        except IndexError:
-            img = ''
-        return img
+        return self.card_type.img_src if self.card_type else ''
 
     @property
     def values(self) -> Tuple:
-        try:
-            values = self.cards[0].values
-        except IndexError:
-            values = ()
-        return values
+        if self.card_type is None:
+            return ()
+        return self.card_type.values
 
     def add_card(self, card: Card) -> bool:
-        if card.name != self.name and self.name != 'Empty':
+        if self.card_type is None:
+            self.card_type = card.type
+        elif card.type is not self.card_type:
             return False
         self.cards.append(card)
+        self.changed = True
         return True
 
+    def enable(self) -> None:
+        '''Makes field available for planting'''
+        self.enabled = True
+        self.changed = True
+
+    def take_all(self) -> List[Card]:
+        '''Removes all cards from field and returns them'''
+        cards: List[Card] = list(self.cards)
+        self.cards.clear()
+        self.card_type = None
+        self.changed = True
+        return cards
+
     def get_trade_value(self) -> int:
         '''Returns coins gained from cashing in cards'''
-        try:
-            first_card: Card = self.cards[0]
-        except IndexError:
+        if self.card_type is None:
             return 0
-        value_ranges: Tuple[List[int], ...] = (
-            list(range(first_card.values[0], first_card.values[1])),
-            list(range(first_card.values[1], first_card.values[2])),
-            list(range(first_card.values[2], first_card.values[3])),
-            list(range(first_card.values[3], constants.MAX_CARDS))
-        )
-        for value, value_range in enumerate(value_ranges):
-            if len(self.cards) in value_range:
-                return value + 1
-        return 0
+        return self.card_type.payouts[min(len(self.cards), constants.MAX_CARDS)]
@@ -0,0 +1,71 @@
+'''
+Optional coalescing of player updates, enabled by setting TBG_UPDATE_WINDOW_MS.
+
+Without it every move sends each player a patch straight away. With it, the first move after
+an update schedules the next one window seconds later, and moves made until then are merged
+into it: collect_patches already diffs everything changed since the last update, so a burst
+such as a trade accept and the pending plays after it costs one collect, encode and emit per
+player. Updates are sent at once when the turn passes, the game's status changes or a player
+joins or leaves, so players never wait on the window to see their turn begin.
+'''
+from typing import Any, Callable, Dict, Tuple
+
+from game import Game
+import metrics
+
+coalesced = metrics.Counter('tbg_updates_coalesced_total', 'Player updates merged into a pending update')
+flushes = metrics.Counter('tbg_update_flushes_total', 'Player updates sent by what triggered them', ('reason',))
+
+
+class Coalescer:
+    '''
+    Sends a game's updates with send, now or after window seconds merged with those of later
+    moves. call_later(delay, f) must call f after delay seconds, holding whatever send needs.
+    '''
+
+    def __init__(self, window: float, send: Callable[[Game], Any],
+                 call_later: Callable[[float, Callable[[], Any]], Any]) -> None:
+        self.window: float = window
+        self.send: Callable[[Game], Any] = send
+        self.call_later: Callable[[float, Callable[[], Any]], Any] = call_later
+        # Games with an update scheduled, by id
+        self.pending: Dict[str, Game] = {}
+        # Turn of each game when its last update was sent, by id
+        self.turns: Dict[str, Tuple[str, int, int]] = {}
+
+    @staticmethod
+    def turn(game: Game) -> Tuple[str, int, int]:
+        return game.status, game.current_player_index, len(game.players)
+
+    def update(self, game: Game) -> Any:
+        '''
+        Called after moves change game. Returns what send returns if the update is sent now,
+        otherwise None.
+        '''
+        if self.window <= 0:
+            flushes.inc('immediate')
+            return self.send(game)
+        turn: Tuple[str, int, int] = self.turn(game)
+        if turn != self.turns.get(game.id):
+            self.turns[game.id] = turn
+            self.pending.pop(game.id, None)
+            flushes.inc('turn')
+            return self.send(game)
+        if game.id in self.pending:
+            coalesced.inc()
+            return None
+        self.pending[game.id] = game
+        self.call_later(self.window, lambda: self.flush(game))
+        return None
+
+    def flush(self, game: Game) -> Any:
+        '''Sends game's scheduled update, unless one was sent since it was scheduled'''
+        if self.pending.pop(game.id, None) is None:
+            return None
+        flushes.inc('window')
+        return self.send(game)
+
+    def forget(self, game: Game) -> None:
+        '''Drops state kept for game, once it's removed'''
+        self.pending.pop(game.id, None)
+        self.turns.pop(game.id, None)
@@ -0,0 +1,56 @@
+'''Server settings read from environment variables'''
+import os
+from typing import List, Optional
+
+# Domain and port of the client, required for cross origin requests
+CLIENT_ORIGIN: Optional[str] = os.getenv('TBG_CLIENT_ORIGIN')
+
+# Construct host and port from environment variables
+HOST: str = os.getenv('TBG_HOST', '0.0.0.0')
+PORT: int = int(os.getenv('TBG_PORT', '8080'))
+
+COOKIE_MAX_AGE: int = 6000
+
+# Where games are stored: "memory", a redis:// URL or "fakeredis"
+STORE: str = os.getenv('TBG_STORE', 'memory')
+
+# Socket.IO message queue (e.g. redis://host:6379/0) so broadcasts reach players on every node
+MESSAGE_QUEUE: Optional[str] = os.getenv('TBG_MESSAGE_QUEUE')
+
+# Base URLs of every server node (comma separated) and the URL of this node
+NODES: List[str] = [node for node in os.getenv('TBG_NODES', '').split(',') if node]
+NODE: str = os.getenv('TBG_NODE', '')
+
+# Seeds every new game from one generator so a whole server run can be replayed
+SEED: Optional[int] = int(os.environ['TBG_SEED']) if os.getenv('TBG_SEED') else None
+# Whether /api/create accepts a seed. Off by default since whoever picks the seed knows the deck.
+ALLOW_CLIENT_SEED: bool = os.getenv('TBG_ALLOW_CLIENT_SEED', '') == '1'
+
+# Open trades a player may have offered at once, bounding the trades sent with every update
+MAX_OPEN_TRADES: int = int(os.getenv('TBG_MAX_OPEN_TRADES', '10'))
+
+# Milliseconds player updates are held to merge those of moves made in quick succession (see
+# coalescing.py). Off when 0.
+UPDATE_WINDOW_MS: float = float(os.getenv('TBG_UPDATE_WINDOW_MS', 0))
+
+# Updates kept per game to replay to clients that reconnect (see history.py)
+UPDATE_HISTORY: int = int(os.getenv('TBG_UPDATE_HISTORY', '64'))
+
+# Opt-in profiling (see profiler.py): fraction of game requests profiled in full, where
+# profiles are written, and their format, "pstats" or "collapsed"
+PROFILE: bool = os.getenv('TBG_PROFILE', '') == '1'
+PROFILE_SAMPLE: float = float(os.getenv('TBG_PROFILE_SAMPLE', 0.01))
+PROFILE_DIR: str = os.getenv('TBG_PROFILE_DIR', 'profiles')
+PROFILE_FORMAT: str = os.getenv('TBG_PROFILE_FORMAT', 'pstats')
+
+# Seconds a game may go without actions before it's evicted, by status, and seconds between
+# checks for such games
+TTL_AWAITING: float = float(os.getenv('TBG_TTL_AWAITING', 3600))
+TTL_RUNNING: float = float(os.getenv('TBG_TTL_RUNNING', 6 * 3600))
+TTL_COMPLETED: float = float(os.getenv('TBG_TTL_COMPLETED', 600))
+REAP_SECONDS: float = float(os.getenv('TBG_REAP_SECONDS', 30))
+
+# Directory of the move journal used for crash recovery. Journaling is off when unset.
+JOURNAL_DIR: Optional[str] = os.getenv('TBG_JOURNAL_DIR')
+JOURNAL_FLUSH_MS: float = float(os.getenv('TBG_JOURNAL_FLUSH_MS', 5))
+CHECKPOINT_SECONDS: float = float(os.getenv('TBG_CHECKPOINT_SECONDS', 300))
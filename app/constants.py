@@ -9,6 +9,9 @@ STAGES: Tuple[str, ...] = (
 MAX_PLAYERS: int = 7
 MAX_CARDS: int = 24
 MIN_CARDS: int = 0
+MAX_NAME_LENGTH: int = 32
+# Most cards a trade may ask for
+MAX_WANTS: int = 20
 CARD_TYPES: Tuple[Tuple[str, int, Tuple[int, int, int, int], str], ...] = (
     ("Cocoa Bean", 4, (MAX_CARDS, 2, 3, 4), "assets/beans/cocoa.png"),
     ("Garden Bean", 6, (MAX_CARDS, 2, 3, MAX_CARDS), "assets/beans/garden.png"),
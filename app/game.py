@@ -1,18 +1,26 @@
-from card import Card, Deck, Field
+from card import Card, CardPile, Deck, Field, CARD_NAMES
 from player import Player
-import uuid
 import json
 import asyncio
+import os
+import random
+import threading
+import time
+from functools import wraps
 import util
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Optional, Set, Callable, Iterable
 from trade import Trade, TradingCard
+from config import MAX_OPEN_TRADES
 import constants
 
 
 def check_stage(stages: Tuple[int, ...]):
     '''Verifies it's the right stage for an action'''
     def decorator(f):
+        @wraps(f)
         def wrapper(self, *args, **kwargs):
+            if self.status != 'Running':
+                return util.error('Game is not running')
             if self.stage_index not in stages:
                 return util.error('Invalid move')
             return f(self, *args, **kwargs)
@@ -21,6 +29,7 @@ def check_stage(stages: Tuple[int, ...]):
 
 def check_turn(f):
     '''Verifys that it's the requesting player's turn'''
+    @wraps(f)
     def wrapper(self, *args, **kwargs):
         if args[0] != self.players[self.current_player_index]:
             return util.error('It is not your turn')
@@ -32,44 +41,121 @@ def check_pending(f):
     Checks that a player has no cards in pending.
     NOTE: This must always follow a check_turn to verify that current player is requesting player
     '''
+    @wraps(f)
     def wrapper(self, *args, **kwargs):
         if self.players[self.current_player_index].pending_cards:
             return util.error('Must play pending cards first')
         return f(self, *args, **kwargs)
     return wrapper
 
+# Called with the action name and seconds taken after every Game action (see metrics.py)
+action_timers: List[Callable[[str, float], None]] = []
+
+def changes_state(f):
+    '''
+    Marks game state as changed so cached views are rebuilt, and reports the action to the
+    game's recorder, unless the action was rejected with an error, which leaves the game as it
+    was. Every action, rejected or not, is timed by action_timers.
+    '''
+    @wraps(f)
+    def wrapper(self, *args, **kwargs):
+        start: float = time.perf_counter() if action_timers else 0.0
+        try:
+            result = f(self, *args, **kwargs)
+        except Exception:
+            # The state may be half changed, so cached views are rebuilt
+            self.version += 1
+            raise
+        finally:
+            if action_timers:
+                elapsed: float = time.perf_counter() - start
+                for timer in action_timers:
+                    timer(f.__name__, elapsed)
+        if isinstance(result, dict) and result.get('error'):
+            return result
+        self.version += 1
+        self.last_active = time.monotonic()
+        if self.recorder:
+            self.recorder(self, f.__name__, args)
+        return result
+    return wrapper
+
 class Game:
-    def __init__(self, game_type: str) -> None:
+    def __init__(self, game_type: str, new_deck: bool = True, seed: Optional[int] = None) -> None:
         self.players: List[Player] = []
         self.deck: Deck = Deck()
         self.playthrough: int = 0
         self.discards: Deck = Deck()
         self.current_player_index: int = 0
         self.status: str = 'Awaiting'  # Awaiting, Running, Completed
-        self.id: str = str(uuid.uuid4())[:6]
+        self.id: str = ''
         self.stage_index: int = 0
-        self.market: List[Card] = []
-        self.trades: List[Trade] = []
-        self.winner = None
+        self.market: CardPile = CardPile()
+        # Open trades by id in the order they were made, and the open trades each player is in,
+        # as either side, by player token
+        self.trades: Dict[str, Trade] = {}
+        self.player_trades: Dict[str, Dict[str, Trade]] = {}
+        # Ids of the open trades offering each card, by card id
+        self.card_trades: Dict[str, Set[str]] = {}
+        self.winner: Optional[str] = None
         self.game_type: str = game_type
-        self.last_updates: List[Dict] = []
-
-        self.deck.build_deck()
-        self.deck.shuffle()
-
+        self.changes: Set[str] = set()
+        self.tokens: Dict[str, Player] = {}
+        # Held while a request reads or changes this game. Moves on one game are serialized,
+        # different games proceed in parallel.
+        self.lock: threading.RLock = threading.RLock()
+        self.version: int = 0
+        # Version when updates were last collected, sent to clients as the version of their view
+        self.update_version: int = 0
+        # time.monotonic() of the last action, for evicting idle games (see reaper.py)
+        self.last_active: float = time.monotonic()
+        self.snapshot_version: int = -1
+        self.snapshot: Dict = {}
+        self.public_players: List[Dict] = []
+        # Called with game, action name and arguments after every action not rejected with an error
+        self.recorder: Optional[Callable] = None
+        # Every random choice is made by self.rng, reseeded from seed and epoch before each use
+        # so the game replays exactly from its seed and can be snapshotted in a few bytes
+        self.seed: int = seed if seed is not None else int.from_bytes(os.urandom(8), 'big')
+        self.rng_epoch: int = 0
+        self.rng: random.Random = random.Random()
+        self.id = self.next_id()
+
+        if new_deck:
+            self.deck.build_deck(self.reseed())
+            self.deck.shuffle(self.reseed())
+
+    def __getstate__(self) -> Dict:
+        '''Drops the lock and cached views when pickling'''
+        state: Dict = dict(self.__dict__)
+        del state['lock']
+        state.update(snapshot_version=-1, snapshot={}, public_players=[], recorder=None)
+        return state
+
+    def __setstate__(self, state: Dict) -> None:
+        self.__dict__.update(state)
+        self.lock = threading.RLock()
+        self.last_active = time.monotonic()
+
+    @changes_state
     def add_player(self, player: Player) -> None:
         '''Adds new player to current game'''
         # First player is host
         if not self.players:
             player.is_host = True
         self.players.append(player)
+        self.tokens[player.token] = player
+        self.changes.add('players')
 
+    @changes_state
     def leave_game(self, player: Player) -> Dict[str, str]:
         '''Removes player from game and progresses game if it's that players turn'''
         current_player = self.players[self.current_player_index]
         current_stage = self.stage_index
+        self.changes.update(('players', 'current_player', 'stage'))
         if len(self.players) == 1:
             self.status = "Completed"
+            self.changes.add('status')
             return util.success("Successfully ended game")
         if player == current_player:
             next_player = self.players[(self.current_player_index + 1) % len(self.players)]
@@ -79,14 +165,40 @@ class Game:
         else:
             self.players = [_player for _player in self.players if _player != player]
             self.current_player_index = self.players.index(current_player)
+        self.tokens.pop(player.token, None)
+        for trade in list(self.player_trades.pop(player.token, {}).values()):
+            self.remove_trade(trade)
         return util.success("Successfully left game")
 
+    def restore(self, saved: 'Game') -> None:
+        '''
+        Puts the game back in the state of saved, a snapshot of it loaded by snapshot.loads,
+        undoing every action since. The game keeps its lock, recorder and the changes not yet
+        sent, moves on to a new version and reports the restore to its recorder as the action
+        "restore". Everything is marked changed, so the next update brings every view in line.
+        '''
+        kept: Dict = {key: self.__dict__[key] for key in ('lock', 'recorder', 'version', 'update_version', 'changes')}
+        self.__dict__.update(saved.__dict__)
+        self.__dict__.update(kept)
+        self.version += 1
+        self.changes.update(('players', 'market', 'stage', 'current_player', 'status', 'playthrough', 'winner'))
+        self.deck.changed = self.discards.changed = True
+        for player in self.players:
+            player.changes.add('trades')
+        if self.recorder:
+            self.recorder(self, 'restore', ())
+
+    def get_player(self, token: str) -> Optional[Player]:
+        '''Returns player owning token, or None if token isn't in this game'''
+        return self.tokens.get(token)
+
     def is_full(self) -> bool:
         '''Checks if max players have been reached'''
         if len(self.players) < constants.MAX_PLAYERS:
             return False
         return True
 
+    @changes_state
     def start_game(self, player: Player) -> Dict[str, str]:
         '''Starts game by dealing cards to players and setting status'''
         if self.status != 'Awaiting':
@@ -95,34 +207,132 @@ class Game:
             return util.error('Only host can start game')
         self.deal_cards()
         self.status = 'Running'
+        self.changes.add('status')
         return util.success('Successfully started game')
 
+    def public_snapshot(self) -> Dict:
+        '''Returns game info visible to every player. Rebuilt at most once per state version.'''
+        if self.snapshot_version != self.version:
+            self.public_players = [player.to_dict_public() for player in self.players]
+            self.snapshot = {
+                'deck_count': self.deck.get_length(),
+                'playthrough': self.playthrough,
+                'discard_count': self.discards.get_length(),
+                'current_player': self.players[self.current_player_index].name,
+                'status': self.status,
+                'game_id': self.id,
+                'stage': constants.STAGES[self.stage_index],
+                'market': self.market_to_dict(),
+                'game_type': self.game_type,
+                'winner': self.winner
+            }
+            self.snapshot_version = self.version
+        return self.snapshot
+
     def retrieve_game(self, player: Player) -> Dict:
-        return {
-            'player_info': player.to_dict_private(),
-            'players': [other_player.to_dict_public() for other_player in self.players if other_player != player],
-            'deck_count': self.deck.get_length(),
-            'playthrough': self.playthrough,
-            'discard_count': self.discards.get_length(),
-            'current_player': self.players[self.current_player_index].name,
-            'status': self.status,
-            'game_id': self.id,
-            'stage': constants.STAGES[self.stage_index],
-            'market': self.market_to_dict(),
-            'trades': [trade.to_public_dict() for trade in self.trades],
-            'game_type': self.game_type,
-            'winner': self.winner
+        '''Returns the shared public snapshot overlaid with player's private info'''
+        snapshot: Dict = self.public_snapshot()
+        index: int = self.players.index(player)
+        view: Dict = {
+            'player_info': player.to_dict_private(self.public_players[index]),
+            'players': self.public_players[:index] + self.public_players[index + 1:],
+            'trades': self.trades_to_dict(player),
+            'version': self.update_version
         }
+        view.update(snapshot)
+        return view
 
+    def collect_patches(self) -> List[Tuple[Player, List[Dict]]]:
+        '''
+        Returns an RFC 6902 patch per player describing everything changed since the
+        last call, relative to the view returned by retrieve_game. Clears all change logs.
+        Operations that are identical for several players are shared between their patches.
+        '''
+        shared, patches = self.collect_updates()
+        return [(player, shared + patch) for player, patch in patches]
+
+    def collect_updates(self) -> Tuple[List[Dict], List[Tuple[Player, List[Dict]]]]:
+        '''
+        Like collect_patches, but split into one patch of the changes every player sees the
+        same way, followed by a patch per player of the rest. Applying both to a player's
+        view in either order gives the same result. If anything changed, the update version
+        is set to the current version and the shared patch sets it at /version, otherwise
+        both are empty.
+        '''
+        if self.deck.changed:
+            self.changes.add('deck_count')
+        if self.discards.changed:
+            self.changes.add('discard_count')
+        snapshot: Dict = self.public_snapshot()
+        shared: List[Dict] = [
+            {'op': 'replace', 'path': '/' + key, 'value': snapshot[key]}
+            for key in sorted(self.changes) if key in snapshot
+        ]
+        changes: List[Tuple[List[str], List[str]]] = [player.collect_changes() for player in self.players]
+        players_changed: bool = 'players' in self.changes
+        self.changes.clear()
+        self.deck.changed = False
+        self.discards.changed = False
+
+        # Ops for a player's public changes, keyed by the index the player has in a viewer's list
+        public_ops: Dict[Tuple[int, int], List[Dict]] = {}
+
+        def ops_for(index: int, list_index: int) -> List[Dict]:
+            if (index, list_index) not in public_ops:
+                public_ops[index, list_index] = [
+                    self.replace_op('/players/{}/'.format(list_index), self.public_players[index], key)
+                    for key in changes[index][0]
+                ]
+            return public_ops[index, list_index]
+
+        patches: List[Tuple[Player, List[Dict]]] = []
+        for index, player in enumerate(self.players):
+            patch: List[Dict] = []
+            if 'trades' in changes[index][1]:
+                patch.append({'op': 'replace', 'path': '/trades', 'value': self.trades_to_dict(player)})
+            if players_changed:
+                view: Dict = self.retrieve_game(player)
+                patch.append({'op': 'replace', 'path': '/player_info', 'value': view['player_info']})
+                patch.append({'op': 'replace', 'path': '/players', 'value': view['players']})
+            else:
+                for other_index in range(len(self.players)):
+                    if other_index != index and changes[other_index][0]:
+                        patch += ops_for(other_index, other_index if other_index < index else other_index - 1)
+                public, private = changes[index]
+                for key in public:
+                    patch.append(self.replace_op('/player_info/', self.public_players[index], key))
+                for key in private:
+                    if key == 'trades':
+                        continue
+                    cards: CardPile = player.hand if key == 'hand' else player.pending_cards
+                    patch.append({'op': 'replace', 'path': '/player_info/' + key,
+                                  'value': [card.to_dict() for card in cards]})
+            patches.append((player, patch))
+        if shared or any(patch for _, patch in patches):
+            self.update_version = self.version
+            shared.append({'op': 'replace', 'path': '/version', 'value': self.update_version})
+        return shared, patches
+
+    @staticmethod
+    def replace_op(prefix: str, public: Dict, key: str) -> Dict:
+        '''Builds a replace operation for a public player key such as "coins" or "fields/1"'''
+        value = public
+        for part in key.split('/'):
+            value = value[int(part)] if isinstance(value, list) else value[part]
+        return {'op': 'replace', 'path': prefix + key, 'value': value}
+
+    @changes_state
     @check_stage((1, 2))
     @check_turn
     @check_pending
     def deck_to_market(self, player: Player) -> Dict[str, str]:
         '''Draws top 2 cards from deck and places them in market'''
-        self.market += self.draw_cards(2)
+        self.market.extend(self.draw_cards(2))
         self.stage_index = 3
+        self.changes.update(('market', 'stage'))
         return util.success('Cards drawn into market')
 
+    @changes_state
     @check_stage((3,))
     @check_turn
     @check_pending
@@ -130,11 +340,12 @@ class Game:
         '''Draws three cards from market to players hand'''
         if self.market:
             return util.error("Cannot draw cards until market is empty")
-        player.hand = player.hand + self.draw_cards(3)
+        player.add_to_hand(self.draw_cards(3))
         self.go_next_stage()
         self.go_next_player()
         return util.success('Successfully drew two cards for hand')
 
+    @changes_state
     @check_stage((0,1))
     @check_turn
     @check_pending
@@ -142,13 +353,16 @@ class Game:
         '''
         Plays card from users hand to field. No confirmation.
         '''
+        if not player.hand:
+            return util.error('No cards in hand')
         result = self.verify_field(player, field_index)
         if result.get('error'):
             return result
-        card: Card = player.hand[0]
-        player.hand = player.hand[1:]
+        card: Card = player.get_first_card()
+        self.invalidate_trades((card,))
         return self.play_card(player, result['field'], card)
 
+    @changes_state
     @check_stage((3,))
     @check_turn
     @check_pending
@@ -157,9 +371,17 @@ class Game:
         result = self.verify_field(player, field_index)
         if result.get('error'):
             return result
-        card: Card = self.pop_card_from_list(card_id, self.market)
+        if not isinstance(card_id, str):
+            return util.error('Card id must be a string')
+        card: Card = self.market.get(card_id)
+        if not card:
+            return util.error('Card is not in market')
+        self.market.pop(card_id)
+        self.changes.add('market')
+        self.invalidate_trades((card,))
         return self.play_card(player, result['field'], card)
 
+    @changes_state
     def pending_to_field(self, player: Player, field_index: int, card_id: str) -> Dict[str, str]:
         '''
         Plays card from pending to field. No confirmation.
@@ -167,7 +389,13 @@ class Game:
         result = self.verify_field(player, field_index)
         if result.get('error'):
             return result
-        card: Card = self.pop_card_from_list(card_id, player.pending_cards)
+        if not isinstance(card_id, str):
+            return util.error('Card id must be a string')
+        card: Card = player.pending_cards.get(card_id)
+        if not card:
+            return util.error('Card is not in pending cards')
+        player.pending_cards.pop(card_id)
+        player.changes.add('pending_cards')
         return self.play_card(player, result['field'], card)
     
     def play_card(self, player: Player, field: Field, card: Card) -> Dict[str, str]:
@@ -185,51 +413,106 @@ class Game:
             self.go_next_stage()   
         return util.success('Card successfully played')
 
+    @changes_state
     @check_stage((3,))
     def create_trade(self, p1: Player, p2_name: str, card_ids: List[str], wants: List[str]):
-        tcs: List[TradingCard] = self.ids_to_tcs(p1, card_ids)
-        new_trades: List[Trade] = []
+        if not isinstance(p2_name, str):
+            return util.error("Player name must be a string")
+        if not isinstance(wants, list) or len(wants) > constants.MAX_WANTS or \
+                not all(isinstance(want, str) and want in CARD_NAMES for want in wants):
+            return util.error("Wants must be a list of at most {} card names".format(constants.MAX_WANTS))
+        result = self.ids_to_tcs(p1, card_ids)
+        if result.get('error'):
+            return result
+        tcs: List[TradingCard] = result['tcs']
         p2: Player = util.shrink([player for player in self.players if player.name == p2_name])
         if not p2:
             return util.error("Player chosen is not in game")
-        new_trades += [Trade(p1, p2, tcs, wants)]
-        self.trades += new_trades
+        if p2 is p1:
+            return util.error("Cannot trade with yourself")
+        offered: int = sum(trade.p1 is p1 for trade in self.player_trades.get(p1.token, {}).values())
+        if offered >= MAX_OPEN_TRADES:
+            return util.error("Cannot have more than {} open trades".format(MAX_OPEN_TRADES))
+        trade_id: str = '{:06x}'.format(self.reseed().getrandbits(24))
+        while trade_id in self.trades:
+            trade_id = '{:06x}'.format(self.rng.getrandbits(24))
+        self.add_trade(Trade(p1, p2, tcs, wants, trade_id))
         return util.success('Successfully created trade')
 
+    @changes_state
     def accept_trade(self, player: Player, trade_id: str, card_ids: List[str]):
-        tcs: List[TradingCard] = self.ids_to_tcs(player, card_ids)
-        trade: Trade = util.shrink([trade for trade in self.trades if trade.id == trade_id])
+        result = self.ids_to_tcs(player, card_ids)
+        if result.get('error'):
+            return result
+        tcs: List[TradingCard] = result['tcs']
+        trade: Optional[Trade] = self.trades.get(trade_id) if isinstance(trade_id, str) else None
         if not trade:
             return util.error("Trade does not exist")
         if player is not trade.p2:
             return util.error("You are not in this trade")
         result = trade.accept(tcs)
-        if not result.get('error'):
-            self.trades = [trade for trade in self.trades if trade.id != trade_id]
+        if result.get('error'):
+            return result
+        self.changes.add('market')
+        self.remove_trade(trade)
+        self.invalidate_trades(tc.card for tc in trade.p1_trades + trade.p2_trades)
         return result
 
+    @changes_state
     def reject_trade(self, player: Player, trade_id: str):
-        trade: Trade = util.shrink([trade for trade in self.trades if trade.id == trade_id])
+        trade: Optional[Trade] = self.trades.get(trade_id) if isinstance(trade_id, str) else None
         if not trade:
             return util.error("Trade does not exist")
         if player is not trade.p2:
             return util.error("You are not in this trade")
-        # Remove trade from trades
-        self.trades = [trade for trade in self.trades if trade.id != trade_id]
+        self.remove_trade(trade)
         return util.success("Trade successfully rejected")
 
+    def add_trade(self, trade: Trade) -> None:
+        '''Opens trade, indexing it by id, by both players and by the cards offered'''
+        self.trades[trade.id] = trade
+        for player in (trade.p1, trade.p2):
+            self.player_trades.setdefault(player.token, {})[trade.id] = trade
+            player.changes.add('trades')
+        for tc in trade.p1_trades:
+            self.card_trades.setdefault(tc.card.id, set()).add(trade.id)
+
+    def remove_trade(self, trade: Trade) -> None:
+        '''Closes trade and drops it from every index'''
+        del self.trades[trade.id]
+        for player in (trade.p1, trade.p2):
+            self.player_trades.get(player.token, {}).pop(trade.id, None)
+            player.changes.add('trades')
+        for tc in trade.p1_trades:
+            trade_ids: Set[str] = self.card_trades[tc.card.id]
+            trade_ids.discard(trade.id)
+            if not trade_ids:
+                del self.card_trades[tc.card.id]
+
+    def invalidate_trades(self, cards: Iterable[Card]) -> None:
+        '''Closes the open trades offering any of cards, called as cards leave the market or a hand'''
+        for card in cards:
+            for trade_id in list(self.card_trades.get(card.id, ())):
+                self.remove_trade(self.trades[trade_id])
+
+    def trades_to_dict(self, player: Player) -> List[Dict]:
+        '''Returns the open trades player is in'''
+        return [trade.to_public_dict() for trade in self.player_trades.get(player.token, {}).values()]
+
+    @changes_state
     def buy_field(self, player: Player):
         '''Buy third field for 3 coins'''
         if player.coins < 3:
             return util.error("Not enough coins to purchase third field")
         if player.fields[2].enabled:
             return util.error("Field already purchased")
-        player.coins -= 3
-        player.fields[2].enabled = True
+        player.add_coins(-3)
+        player.fields[2].enable()
         return util.success("Successfully purchased third field")
         
     def go_next_stage(self) -> None:
         self.stage_index = (self.stage_index + 1) % len(constants.STAGES)
+        self.changes.add('stage')
         current_player = self.players[self.current_player_index]
         # If the player has an empty hand and is expected to play from hand, skip to next phase.
         if not current_player.hand and self.stage_index in (0, 1):
@@ -238,11 +521,11 @@ class Game:
 
     def go_next_player(self) -> None:
         self.current_player_index = (self.current_player_index + 1) % len(self.players)
+        self.changes.add('current_player')
 
     def deal_cards(self) -> None:
         for player in self.players:
-            for _ in range(5):
-                player.hand.append(self.deck.pop())
+            player.add_to_hand([self.deck.pop() for _ in range(5)])
 
     def market_to_dict(self) -> List[Dict]:
         return [card.to_dict() for card in self.market]
@@ -250,24 +533,21 @@ class Game:
     def cash_in(self, field: Field, player: Player) -> None:
         '''Adds coins to player and clears field'''
         value: int = field.get_trade_value()
-        player.coins += value
-        field.cards = field.cards[value:]
-        for card in field.cards:
-            self.discards.cards.append(card)
-        field.cards = []
+        player.add_coins(value)
+        self.discards.add_cards(field.take_all()[value:])
 
     def draw_cards(self, card_count: int) -> List[Card]:
         '''Draws card for user and shuffles if necessary'''
         cards: List[Card] = []
-        #TODO There is a bug in here at end game. Fix it.
         for i in range(card_count):
             if self.deck.get_length() == 0:
-                if self.playthrough == 2:
+                if self.playthrough == 2 or self.discards.get_length() == 0:
                     self.end_game()
-                    return None
+                    return cards
                 self.playthrough += 1
-                self.deck.cards = self.discards.take_all()
-                self.deck.shuffle()
+                self.changes.add('playthrough')
+                self.deck.add_cards(self.discards.take_all())
+                self.deck.shuffle(self.reseed())
             cards.append(self.deck.pop())
         return cards
 
@@ -275,13 +555,27 @@ class Game:
         '''End the game'''
         # Make game completed
         self.status = "Completed"
+        self.changes.update(('status', 'winner'))
         for player in self.players:
             for field in player.fields:
                 self.cash_in(field, player)
 
-        player_ranks = sorted(self.players, key=getattr('coins'), reverse=True)
+        player_ranks = sorted(self.players, key=lambda player: player.coins, reverse=True)
         self.winner = player_ranks[0].name
 
+    def next_id(self) -> str:
+        '''
+        Draws another game id, chained from the seed and the current id. Ids don't use
+        self.rng so picking a new one doesn't change the cards dealt.
+        '''
+        return '{:06x}'.format(random.Random('{}:id:{}'.format(self.seed, self.id)).getrandbits(24))
+
+    def reseed(self) -> random.Random:
+        '''Starts the next epoch of the game's random number generator and returns it'''
+        self.rng_epoch += 1
+        self.rng.seed('{}:{}'.format(self.seed, self.rng_epoch))
+        return self.rng
+
     def verify_field(self, player: Player, field_index: int):
         if field_index not in range(0, len(player.fields)):
             return util.error('Invalid field index')
@@ -289,23 +583,20 @@ class Game:
             return util.error('Field not yet bought')
         return {'field': player.fields[field_index]}
 
-    def ids_to_tcs(self, player: Player, card_ids: List[str]) -> List[TradingCard]:
+    def ids_to_tcs(self, player: Player, card_ids: List[str]) -> Dict:
         '''Call with a player and the ids they want to trade'''
+        if not isinstance(card_ids, list) or not all(isinstance(card_id, str) for card_id in card_ids):
+            return util.error('Card ids must be a list of strings')
         tcs: List[TradingCard] = []
-        market_cards = [card for card in self.market if card.id in  card_ids]
-        hand_cards = [card for card in player.hand if card.id in card_ids]
-        tcs += [TradingCard(card, self.market, 'Market') for card in market_cards]
         player_hand_name: str = "{}'s hand".format(player.name)
-        tcs += [TradingCard(card, player.hand, player_hand_name) for card in hand_cards]
-        return tcs
-
-    def pop_card_from_list(self, card_id: str, location: List[Card]):
-        card = util.shrink([card for card in location if card.id == card_id])
-        other_cards = [card for card in location if card.id != card_id]
-        location.clear()
-        for other_card in other_cards:
-            location.append(other_card)
-        return card
+        for card_id in dict.fromkeys(card_ids):
+            if card_id in self.market:
+                tcs.append(TradingCard(self.market.get(card_id), self.market, 'Market'))
+            elif card_id in player.hand:
+                tcs.append(TradingCard(player.hand.get(card_id), player.hand, player_hand_name))
+            else:
+                return util.error('Card {} is not in market or your hand'.format(card_id))
+        return {'tcs': tcs}
 
     def check_if_pending_cards(self, player: Player):
         if player.pending_cards:
@@ -314,4 +605,5 @@ class Game:
 
     def add_to_market(self, cards: List[Card]):
         '''Adds card to market'''
-        self.market += cards
+        self.market.extend(cards)
+        self.changes.add('market')
@@ -0,0 +1,61 @@
+'''
+Recent updates of a game, so a client whose socket reconnects is sent only the patches it
+missed rather than its whole view again.
+
+Each update is numbered with the game's version when it was collected, which the update
+also sets at /version in the client's view. A client logging in with the version of its
+view is replayed every later update from a ring of the last TBG_UPDATE_HISTORY: the game's
+shared patch of each, and the player's own where they had one. Only when an update it needs
+has left the ring, or the version isn't one this process can account for, does it get the
+full view.
+'''
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+
+class UpdateHistory:
+    '''The encoded patches of a game's last size updates'''
+
+    def __init__(self, size: int, floor: int) -> None:
+        self.size: int = size
+        # Views at this version or later can be brought up to date: the version of the newest
+        # update dropped from the ring, or of the game's view when recording started
+        self.floor: int = floor
+        # (version, patch) of the patch every player gets
+        self.shared: Deque[Tuple[int, str]] = deque(maxlen=size)
+        # Player token -> (version, patch) of the player's own patches
+        self.private: Dict[str, Deque[Tuple[int, str]]] = {}
+
+    def add(self, version: int, shared: str, private: List[Tuple[str, str]]) -> None:
+        '''Keeps the patches of the update to version, private ones as (player token, patch)'''
+        if len(self.shared) == self.size:
+            self.floor = self.shared[0][0]
+        self.shared.append((version, shared))
+        for token, patch in private:
+            patches: Optional[Deque[Tuple[int, str]]] = self.private.get(token)
+            if patches is None:
+                patches = self.private[token] = deque(maxlen=self.size)
+            patches.append((version, patch))
+
+    def forget(self, token: str) -> None:
+        '''Drops the patches of a player who left'''
+        self.private.pop(token, None)
+
+    def since(self, version: int, token: str, current: int) -> Optional[List[str]]:
+        '''
+        Returns the patches, in the order sent, that bring the view of player token from
+        version to current, or None if they are no longer all kept.
+        '''
+        if version == current:
+            return []
+        if not self.floor <= version < current:
+            return None
+        # A player's own ring spans at least as many updates as the shared one
+        own: Dict[int, str] = dict(self.private.get(token, ()))
+        patches: List[str] = []
+        for update_version, shared in self.shared:
+            if update_version > version:
+                if update_version in own:
+                    patches.append(own[update_version])
+                patches.append(shared)
+        return patches
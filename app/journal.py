@@ -0,0 +1,227 @@
+'''
+Journal of game actions for crash recovery.
+
+Every successful Game action is appended as a JSON line by Game.recorder. A background
+thread writes and fsyncs the buffered lines every few milliseconds (group commit), so
+recording a move costs microseconds rather than an fsync. The journal is not write-ahead:
+a move is answered as soon as it is buffered, so a crash loses the moves of the last
+flush interval (TBG_JOURNAL_FLUSH_MS) even though their players saw them succeed. New games are journaled as a
+snapshot, which carries the seed behind every shuffle and id drawn later. Under gevent's
+monkey patching that thread is a greenlet sharing the hub with every request, so file
+writes are handed to the hub's threadpool to block a real OS thread instead.
+
+Checkpoints write a snapshot of every game and start a new journal segment, after which
+older segments are deleted. Recovery loads the latest checkpoint and replays the journal
+after it, skipping any action the checkpoint already contains by comparing game versions.
+'''
+import base64
+import json
+import os
+import struct
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+try:
+    from gevent import monkey as gevent_monkey
+except ImportError:
+    gevent_monkey = None
+
+from game import Game
+from player import Player
+import serializer
+import snapshot
+
+SEGMENT_PREFIX: str = 'journal-'
+CHECKPOINT_PREFIX: str = 'checkpoint-'
+LENGTH = struct.Struct('>I')
+
+
+def run_blocking(task: Callable[[], None]) -> None:
+    '''Runs task, which blocks on file IO, on an OS thread rather than the gevent hub'''
+    if gevent_monkey is not None and gevent_monkey.is_module_patched('threading'):
+        import gevent
+        gevent.get_hub().threadpool.apply(task)
+    else:
+        task()
+
+
+class Journal:
+    '''Append-only journal stored as numbered segment and checkpoint files in a directory'''
+
+    def __init__(self, directory: str, flush_interval: float = 0.005, segment_bytes: int = 16 * 1024 * 1024) -> None:
+        os.makedirs(directory, exist_ok=True)
+        self.directory: str = directory
+        self.flush_interval: float = flush_interval
+        self.segment_bytes: int = segment_bytes
+        self.buffer: List[str] = []
+        # Lock order is always file_lock then buffer_lock. Appending only takes buffer_lock so
+        # it never waits on an fsync.
+        self.buffer_lock: threading.Lock = threading.Lock()
+        self.file_lock: threading.Lock = threading.Lock()
+        segments: List[int] = self.numbers(SEGMENT_PREFIX)
+        self.segment: int = segments[-1] if segments else 1
+        self.file = open(self.path(SEGMENT_PREFIX, self.segment), 'a')
+        self.stopped: threading.Event = threading.Event()
+        self.threads: List[threading.Thread] = []
+        self.start(self.flush, flush_interval)
+
+    def path(self, prefix: str, number: int) -> str:
+        return os.path.join(self.directory, '{}{:08d}'.format(prefix, number))
+
+    def numbers(self, prefix: str) -> List[int]:
+        '''Returns sorted numbers of the files with prefix'''
+        return sorted(int(name[len(prefix):]) for name in os.listdir(self.directory)
+                      if name.startswith(prefix) and name[len(prefix):].isdigit())
+
+    def start(self, task: Callable[[], None], interval: float) -> None:
+        '''Runs task every interval seconds on a daemon thread until closed'''
+        def loop() -> None:
+            while not self.stopped.wait(interval):
+                task()
+        thread = threading.Thread(target=loop, daemon=True)
+        thread.start()
+        self.threads.append(thread)
+
+    def close(self) -> None:
+        self.stopped.set()
+        for thread in self.threads:
+            thread.join()
+        self.flush()
+        self.file.close()
+
+    def append(self, record: Dict) -> None:
+        '''Queues record for the next group commit'''
+        line: str = serializer.dumps(record) + '\n'
+        with self.buffer_lock:
+            self.buffer.append(line)
+
+    def record(self, game: Game, action: str, args: tuple) -> None:
+        '''Game.recorder: journals an action with its player given by token, or a restored game whole'''
+        if action == 'restore':
+            self.record_snapshot(game, action)
+            return
+        record: Dict = {'g': game.id, 'v': game.version, 'a': action, 't': args[0].token, 'p': list(args[1:])}
+        if action == 'add_player':
+            record['n'] = args[0].name
+        self.append(record)
+
+    def record_created(self, game: Game) -> None:
+        '''Journals a new game as a snapshot'''
+        self.record_snapshot(game, 'create')
+
+    def record_snapshot(self, game: Game, action: str) -> None:
+        self.append({'g': game.id, 'v': game.version, 'a': action,
+                     's': base64.b64encode(snapshot.dumps(game)).decode()})
+
+    def record_removed(self, game: Game) -> None:
+        '''Journals that a game was deleted'''
+        self.append({'g': game.id, 'v': game.version + 1, 'a': 'remove'})
+
+    def flush(self) -> None:
+        '''Writes and fsyncs every queued record, starting a new segment when this one is full'''
+        with self.file_lock:
+            self.write_buffer()
+            if self.file.tell() >= self.segment_bytes:
+                self.next_segment()
+
+    def write_buffer(self) -> None:
+        with self.buffer_lock:
+            batch: List[str] = self.buffer
+            self.buffer = []
+        if batch:
+            run_blocking(lambda: self.write(''.join(batch)))
+
+    def write(self, data: str) -> None:
+        self.file.write(data)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def next_segment(self) -> None:
+        self.file.close()
+        self.segment += 1
+        self.file = open(self.path(SEGMENT_PREFIX, self.segment), 'a')
+
+    def checkpoint(self, list_games: Callable[[], Iterable[Game]]) -> None:
+        '''
+        Snapshots every game list_games returns, then deletes the journal segments and
+        checkpoints it replaces. Games are listed once the new segment is started, so a game
+        journaled in an older segment is always in the checkpoint. list_games must not return
+        while a game is being created, between journaling the game and storing it.
+        '''
+        with self.file_lock:
+            self.write_buffer()
+            self.next_segment()
+            segment: int = self.segment
+            games: Iterable[Game] = list_games()
+        parts: List[bytes] = []
+        for game in games:
+            with game.lock:
+                data: bytes = snapshot.dumps(game)
+            parts += [LENGTH.pack(len(data)), data]
+            # Lets requests run between games, which under gevent share this greenlet's thread
+            time.sleep(0)
+        run_blocking(lambda: self.write_checkpoint(segment, b''.join(parts)))
+        for number in self.numbers(SEGMENT_PREFIX):
+            if number < segment:
+                os.remove(self.path(SEGMENT_PREFIX, number))
+        for number in self.numbers(CHECKPOINT_PREFIX):
+            if number < segment:
+                os.remove(self.path(CHECKPOINT_PREFIX, number))
+
+    def write_checkpoint(self, segment: int, data: bytes) -> None:
+        path: str = self.path(CHECKPOINT_PREFIX, segment)
+        with open(path + '.tmp', 'wb') as checkpoint_file:
+            checkpoint_file.write(data)
+            checkpoint_file.flush()
+            os.fsync(checkpoint_file.fileno())
+        os.replace(path + '.tmp', path)
+
+    def recover(self) -> Dict[str, Game]:
+        '''Rebuilds every game from the latest checkpoint and the journal after it'''
+        games: Dict[str, Game] = {}
+        checkpoints: List[int] = self.numbers(CHECKPOINT_PREFIX)
+        first_segment: int = 0
+        if checkpoints:
+            first_segment = checkpoints[-1]
+            with open(self.path(CHECKPOINT_PREFIX, first_segment), 'rb') as checkpoint_file:
+                data: bytes = checkpoint_file.read()
+            offset: int = 0
+            while offset < len(data):
+                length: int = LENGTH.unpack_from(data, offset)[0]
+                game: Game = snapshot.loads(data[offset + LENGTH.size:offset + LENGTH.size + length])
+                games[game.id] = game
+                offset += LENGTH.size + length
+        for number in self.numbers(SEGMENT_PREFIX):
+            if number < first_segment:
+                continue
+            with open(self.path(SEGMENT_PREFIX, number)) as segment_file:
+                for line in segment_file:
+                    try:
+                        record: Dict = json.loads(line)
+                    except ValueError:
+                        # Torn write at the end of the journal
+                        break
+                    replay(games, record)
+        return games
+
+
+def replay(games: Dict[str, Game], record: Dict) -> None:
+    '''Applies one journal record unless the game already contains it'''
+    game: Optional[Game] = games.get(record['g'])
+    if 's' in record:
+        if game is None or game.version < record['v']:
+            games[record['g']] = snapshot.loads(base64.b64decode(record['s']))
+        return
+    if game is None or record['v'] <= game.version:
+        return
+    if record['a'] == 'remove':
+        del games[game.id]
+        return
+    if record['a'] == 'add_player':
+        player: Player = Player(record['n'])
+        player.token = record['t']
+        game.add_player(player)
+    else:
+        getattr(game, record['a'])(game.get_player(record['t']), *record['p'])
+    game.version = record['v']
@@ -0,0 +1,340 @@
+'''
+Server state shared by the Flask-SocketIO server (TBG.py) and the ASGI server
+(asgi_server.py): every game, the client tokens mapped to them and the actions both
+servers expose around games. Results follow the game engine's convention of returning
+util.error dicts on failure, and hold a "redirect" to the node serving the game when
+it's another node, where the client must repeat the request.
+'''
+import random
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from config import STORE, SEED, ALLOW_CLIENT_SEED, JOURNAL_DIR, JOURNAL_FLUSH_MS, CHECKPOINT_SECONDS
+from config import TTL_AWAITING, TTL_RUNNING, TTL_COMPLETED, REAP_SECONDS, UPDATE_HISTORY
+from game import Game
+from history import UpdateHistory
+from journal import Journal
+from matchmaking import Matchmaker
+from player import Player
+from reaper import Reaper
+from store import GameStore, from_url
+import constants
+import metrics
+import profiler
+import routing
+import serializer
+import util
+
+store: GameStore = from_url(STORE)
+
+# Guards adding games to and searching games. Each game's own lock guards its players and moves.
+lock: threading.Lock = threading.Lock()
+
+journal: Optional[Journal] = None
+
+# Recent updates of each game this process sent, by game id
+histories: Dict[str, UpdateHistory] = {}
+resumes = metrics.Counter('tbg_socket_resumes_total', 'Socket logins by how the view was brought up to date',
+                          ('kind',))
+
+# Draws game seeds when the server is seeded, otherwise every game seeds itself from os.urandom
+seeds: Optional[random.Random] = random.Random(SEED) if SEED is not None else None
+
+
+def start_journal(directory: str) -> None:
+    '''Restores games from the journal in directory, then journals every action from now on'''
+    global journal
+    journal = Journal(directory, JOURNAL_FLUSH_MS / 1000)
+    for game in journal.recover().values():
+        store.add(game)
+        for player in game.players:
+            store.add_client(player.token, game.id)
+        game.recorder = journal.record
+    journal.start(lambda: journal.checkpoint(all_games), CHECKPOINT_SECONDS)
+
+
+def all_games() -> Iterable[Game]:
+    '''Returns every game held, waiting out any game being created'''
+    with lock:
+        return store.games()
+
+
+def check_name(name: str) -> Optional[Dict]:
+    '''Returns an error if name can't be a player's name'''
+    if not isinstance(name, str) or len(name) > constants.MAX_NAME_LENGTH:
+        return util.error('Name must be a string of at most {} characters'.format(constants.MAX_NAME_LENGTH))
+    return None
+
+
+def create_game(name: str, game_type: str, seed: Optional[int] = None) -> Dict:
+    '''Creates new game hosted by a new player, seeded with seed if given. Returns game and player.'''
+    invalid: Optional[Dict] = check_name(name)
+    if invalid:
+        return invalid
+    if game_type not in ('public', 'private'):
+        return util.error('Invalid game type parameter')
+    if seed is not None:
+        if not ALLOW_CLIENT_SEED:
+            return util.error('Seeding games is disabled')
+        if type(seed) is not int or not 0 <= seed < 1 << 64:
+            return util.error('Seed must be an integer from 0 to 2**64 - 1')
+    elif seeds:
+        with lock:
+            seed = seeds.getrandbits(64)
+    player: Player = Player(name)
+    game: Game = Game(game_type, seed=seed)
+    game.add_player(player)
+    with lock:
+        # Pick an unused id routed to this node so it keeps serving the game
+        while not routing.is_local(game.id) or store.get(game.id):
+            game.id = game.next_id()
+        if journal:
+            journal.record_created(game)
+            game.recorder = journal.record
+        store.add(game)
+        store.add_client(player.token, game.id)
+    return {'game': game, 'player': player}
+
+
+def join_game(name: str, game_id: str) -> Dict:
+    '''
+    Adds new player to the requested game, or to the public game picked by matchmaking if
+    game_id is blank. Returns game and player.
+    '''
+    if game_id:
+        if not routing.is_local(game_id):
+            return redirect_to_owner(game_id)
+        game: Optional[Game] = store.get(game_id)
+        if not game:
+            return util.error('Game does not exist')
+        return add_player(game, name)
+    # Another player may fill the picked game first, which takes it out of matchmaking
+    for _ in range(constants.MAX_PLAYERS):
+        game = matchmaker.find()
+        if not game:
+            return util.error('No public games are waiting for players')
+        result: Dict = add_player(game, name)
+        if not result.get('error') or matchmaker.is_joinable(game):
+            return result
+    return result
+
+
+def add_player(game: Game, name: str) -> Dict:
+    '''Adds new player named name to game. Returns game and player.'''
+    invalid: Optional[Dict] = check_name(name)
+    if invalid:
+        return invalid
+    with game.lock:
+        if name in [player.name for player in game.players]:
+            return util.error('User already exists with that name')
+        if game.status != 'Awaiting':
+            return util.error('Game has already started or ended')
+        if game.is_full():
+            return util.error('Game is full')
+
+        player: Player = Player(name)
+        game.add_player(player)
+        save(game)
+        store.add_client(player.token, game.id)
+    return {'game': game, 'player': player}
+
+
+def list_games(offset: int, limit: int) -> Dict:
+    '''Returns a page of the public games waiting for players, in the order matchmaking picks them'''
+    if offset < 0 or not 1 <= limit <= 100:
+        return util.error('Offset must not be negative and limit must be from 1 to 100')
+    games, total = matchmaker.page(offset, limit)
+    return {
+        'games': [{
+            'game_id': game.id,
+            'host': game.players[0].name if game.players else '',
+            'player_count': len(game.players),
+            'max_players': constants.MAX_PLAYERS
+        } for game in games],
+        'total': total
+    }
+
+
+def access(token: str) -> Dict:
+    '''Returns game id and player name of a logged in client'''
+    game_id: Optional[str] = store.get_game_id(token)
+    if game_id and not routing.is_local(game_id):
+        return redirect_to_owner(game_id)
+    game: Optional[Game] = store.get(game_id) if game_id else None
+    if not game:
+        return util.error('Access denied')
+    if game.status == 'Completed':
+        return util.error('Game already completed')
+    return {'game': game.id, 'player_name': game.get_player(token).name}
+
+
+def authorize(game_id: str, token: str) -> Dict:
+    '''Verifies game exists and token belongs to one of its players. Returns game and player.'''
+    game: Optional[Game] = store.get(game_id)
+    if not game:
+        return util.error('Game does not exist')
+    player: Player = game.get_player(token)
+    if not player:
+        return util.error('Not authorized to view game')
+    return {'game': game, 'player': player}
+
+
+def redirect_to_owner(game_id: str) -> Dict:
+    '''
+    Result sending the client to the node serving game. Only that node loads the game, so
+    no other node holds a copy that goes stale and overwrites the owner's when saved.
+    '''
+    return {'redirect': routing.owner(game_id)}
+
+
+def save(game: Game) -> None:
+    '''Persists game after a request changed it, if this node serves it'''
+    if not routing.is_local(game.id):
+        return
+    store.save(game)
+    matchmaker.update(game)
+    reaper.reschedule(game)
+
+
+def leave_game(game: Game, player: Player) -> Dict:
+    '''Removes player from game and forgets their token'''
+    result: Dict = game.leave_game(player)
+    if not result.get('error'):
+        store.remove_client(player.token)
+        if game.id in histories:
+            histories[game.id].forget(player.token)
+    return result
+
+
+def remove_game(game: Game) -> None:
+    '''Forgets game and the tokens of its players, if this node serves it'''
+    if not routing.is_local(game.id):
+        return
+    with lock, game.lock:
+        for player in game.players:
+            store.remove_client(player.token)
+        store.remove(game.id)
+        matchmaker.remove(game)
+        histories.pop(game.id, None)
+        if journal:
+            journal.record_removed(game)
+    for listener in on_remove:
+        listener(game)
+
+
+# Called with every game removed, to drop anything else kept per game
+on_remove: List[Callable[[Game], None]] = []
+
+reaper: Reaper = Reaper({'Awaiting': TTL_AWAITING, 'Running': TTL_RUNNING, 'Completed': TTL_COMPLETED}, remove_game)
+matchmaker: Matchmaker = Matchmaker()
+
+
+def track(game: Game) -> None:
+    '''
+    Starts reaping and matchmaking a game this process now holds. A game served by another
+    node is left alone: it sees no activity here, and evicting it would delete the game
+    the owner is still serving from a shared store.
+    '''
+    if routing.is_local(game.id):
+        reaper.track(game)
+        matchmaker.update(game)
+
+
+store.on_add = track
+
+
+def socket_login(login_info: Dict, sid: str) -> Dict:
+    '''
+    Attaches socket to the player owning token. Returns game, player and the socket the
+    player was attached to before, if any, which the caller moves out of the player's rooms.
+    '''
+    try:
+        if not routing.is_local(login_info['game']):
+            return redirect_to_owner(login_info['game'])
+        game: Game = store.get(login_info['game'])
+        player: Player = game.get_player(login_info['token'])
+    except (KeyError, TypeError, AttributeError):
+        return util.error('Socket connection must start with sending of token (cookie) and game (id) in JSON format')
+    if not player:
+        return util.error('User does not exist')
+    previous_sid: str = player.socket_sid
+    player.socket_sid = sid
+    save(game)
+    return {'game': game, 'player': player, 'previous_sid': previous_sid if previous_sid != sid else ''}
+
+
+def rooms(game: Game, player: Player) -> Tuple[str, str]:
+    '''Returns the Socket.IO rooms of player's socket: one shared by the game's players and one of their own'''
+    return game.id, '{}/{}'.format(game.id, player.name)
+
+
+def missed_updates(game: Game, player: Player, version: Optional[int]) -> Optional[List[str]]:
+    '''
+    Returns the patches that bring player's view at version up to date, or None if player
+    must be sent the full view instead
+    '''
+    if type(version) is not int or game.id not in histories:
+        patches: Optional[List[str]] = None
+    else:
+        patches = histories[game.id].since(version, player.token, game.update_version)
+    resumes.inc('full' if patches is None else 'replay')
+    return patches
+
+
+def client_updates(game: Game) -> List[Tuple[str, str]]:
+    '''
+    Returns room and encoded patch of every update to send for the changes since the last
+    one: each player's own changes to their room, then the changes every player sees to
+    the game's room. The game's patch sets the view's version and comes last, so a client
+    whose view has version n has every patch up to n. Callers hold the game's lock until
+    the patches are sent so players receive them in order.
+    '''
+    history: Optional[UpdateHistory] = histories.get(game.id)
+    if history is None:
+        history = histories[game.id] = UpdateHistory(UPDATE_HISTORY, game.update_version)
+    with profiler.span('update.collect'):
+        shared, patches = game.collect_updates()
+    if not shared:
+        return []
+    with profiler.span('update.encode'):
+        encoded: List[Tuple[Player, str]] = serializer.encode_patches(
+            [(player, patch) for player, patch in patches if patch] + [(None, shared)])
+    history.add(game.update_version, encoded[-1][1], [(player.token, patch) for player, patch in encoded[:-1]])
+    if not any(player.socket_sid for player in game.players):
+        return []
+    updates: List[Tuple[str, str]] = [
+        (rooms(game, player)[1], patch) for player, patch in encoded[:-1] if player.socket_sid
+    ] + [(game.id, encoded[-1][1])]
+    for _, patch in updates:
+        metrics.patch_bytes.observe(len(patch))
+    metrics.emits.inc('client update', amount=len(updates))
+    return updates
+
+
+@metrics.gauge('tbg_games', 'Games held by this process by status', ('status',))
+def count_games() -> Dict[Tuple[str, ...], float]:
+    counts: Dict[Tuple[str, ...], float] = {(status,): 0 for status in ('Awaiting', 'Running', 'Completed')}
+    for game in store.games():
+        counts[game.status,] += 1
+    return counts
+
+
+@metrics.gauge('tbg_open_lobbies', 'Public games waiting for players')
+def count_open_lobbies() -> Dict[Tuple[str, ...], float]:
+    return {(): len(matchmaker)}
+
+
+@metrics.gauge('tbg_clients', 'Client tokens known to this process')
+def count_clients() -> Dict[Tuple[str, ...], float]:
+    return {(): store.client_count()}
+
+
+def start() -> None:
+    '''
+    Restores and journals games if a journal is configured, and starts evicting idle games.
+    Servers call it once at startup; importing the lobby starts nothing, so tests, benchmarks
+    and the simulator don't get a reaper thread or a journal.
+    '''
+    if JOURNAL_DIR:
+        start_journal(JOURNAL_DIR)
+    reaper.start(REAP_SECONDS)
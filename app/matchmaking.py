@@ -0,0 +1,68 @@
+'''
+Index of the public games players can join: public, Awaiting and not full. Joining without
+a game id picks the fullest such game, oldest first among equally full games, so lobbies
+fill and start rather than spreading players thin.
+
+Each node indexes the games it holds. Lookups and updates take constant time: games sit in a
+bucket per player count, and a game moves bucket when lobby.save sees it change.
+'''
+import threading
+from collections import OrderedDict, abc
+from itertools import chain, islice
+from typing import Dict, List, Optional, Tuple
+
+from game import Game
+import constants
+
+
+class Matchmaker(abc.Sized):
+    '''Joinable public games, bucketed by player count'''
+
+    def __init__(self) -> None:
+        # Bucket i holds games with i players in the order they reached i players
+        self.lobbies: List['OrderedDict[str, Game]'] = [OrderedDict() for _ in range(constants.MAX_PLAYERS)]
+        # Game id -> player count bucket it's in
+        self.buckets: Dict[str, int] = {}
+        self.lock: threading.Lock = threading.Lock()
+
+    @staticmethod
+    def is_joinable(game: Game) -> bool:
+        return game.game_type == 'public' and game.status == 'Awaiting' and not game.is_full()
+
+    def update(self, game: Game) -> None:
+        '''Files game under its player count, or drops it if it can no longer be joined'''
+        bucket: Optional[int] = len(game.players) if self.is_joinable(game) else None
+        with self.lock:
+            current: Optional[int] = self.buckets.get(game.id)
+            if current == bucket:
+                return
+            if current is not None:
+                del self.lobbies[current][game.id]
+                del self.buckets[game.id]
+            if bucket is not None:
+                self.lobbies[bucket][game.id] = game
+                self.buckets[game.id] = bucket
+
+    def remove(self, game: Game) -> None:
+        with self.lock:
+            bucket: Optional[int] = self.buckets.pop(game.id, None)
+            if bucket is not None:
+                del self.lobbies[bucket][game.id]
+
+    def find(self) -> Optional[Game]:
+        '''Returns the game a player without a game id should join'''
+        with self.lock:
+            for lobbies in reversed(self.lobbies):
+                if lobbies:
+                    return next(iter(lobbies.values()))
+        return None
+
+    def page(self, offset: int, limit: int) -> Tuple[List[Game], int]:
+        '''Returns limit joinable games from offset in the order find picks them, and the total'''
+        with self.lock:
+            games: List[Game] = list(islice(chain.from_iterable(
+                lobbies.values() for lobbies in reversed(self.lobbies)), offset, offset + limit))
+            return games, len(self.buckets)
+
+    def __len__(self) -> int:
+        return len(self.buckets)
@@ -0,0 +1,148 @@
+'''
+Server metrics, rendered in the Prometheus text format for the /metrics endpoint of both
+servers.
+
+Recording is cheap enough to leave on under full load. Histograms have fixed buckets and
+each label set gets its counts preallocated on first use, so an observation is a bisect and
+two list increments. Nothing takes a lock: both servers handle requests on one OS thread
+(gevent or asyncio), so increments made by requests never interleave. In asyncio mode the
+reaper runs on an OS thread of its own, and the metric it records, tbg_evictions_total, is
+recorded by nothing else. With one writer no increment is lost, and a scrape copies its
+values in one step under the GIL. Gauges derived from the game store are computed when
+scraped rather than kept up to date on every move.
+'''
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Tuple
+
+import game
+
+CONTENT_TYPE: str = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Seconds
+LATENCY_BUCKETS: Tuple[float, ...] = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                                      0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+# Bytes
+SIZE_BUCKETS: Tuple[float, ...] = (64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384, 65536)
+
+Labels = Tuple[str, ...]
+
+
+def format_labels(names: Tuple[str, ...], values: Labels, extra: str = '') -> str:
+    pairs: List[str] = ['{}="{}"'.format(name, value.replace('\\', '\\\\').replace('"', '\\"'))
+                        for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Metric:
+    '''A named metric with one series per combination of label values'''
+    kind: str = 'untyped'
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()) -> None:
+        self.name: str = name
+        self.help_text: str = help_text
+        self.labels: Tuple[str, ...] = labels
+        REGISTRY.append(self)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return ['# HELP {} {}'.format(self.name, self.help_text),
+                '# TYPE {} {}'.format(self.name, self.kind)] + self.samples()
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()) -> None:
+        super().__init__(name, help_text, labels)
+        self.values: Dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self) -> List[str]:
+        return ['{}{} {}'.format(self.name, format_labels(self.labels, labels), value)
+                for labels, value in sorted(self.values.items())]
+
+
+class Gauge(Metric):
+    '''Gauge set directly, or computed by collect when scraped'''
+    kind = 'gauge'
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = (),
+                 collect: Optional[Callable[[], Dict[Labels, float]]] = None) -> None:
+        super().__init__(name, help_text, labels)
+        self.values: Dict[Labels, float] = {}
+        self.collect = collect
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self) -> List[str]:
+        values: Dict[Labels, float] = self.collect() if self.collect else self.values
+        return ['{}{} {}'.format(self.name, format_labels(self.labels, labels), value)
+                for labels, value in sorted(values.items())]
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...], labels: Tuple[str, ...] = ()) -> None:
+        super().__init__(name, help_text, labels)
+        self.buckets: Tuple[float, ...] = buckets
+        self.bounds: List[str] = [str(bucket) for bucket in buckets] + ['+Inf']
+        # Per label set: a count per bucket, the count above the last bucket, then the sum
+        self.series: Dict[Labels, List[float]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series: List[float] = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [0] * (len(self.buckets) + 2)
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def samples(self) -> List[str]:
+        lines: List[str] = []
+        for labels, series in sorted(self.series.items()):
+            total: float = 0
+            for bound, count in zip(self.bounds, series):
+                total += count
+                lines.append('{}_bucket{} {}'.format(
+                    self.name, format_labels(self.labels, labels, 'le="{}"'.format(bound)), total))
+            lines.append('{}_sum{} {}'.format(self.name, format_labels(self.labels, labels), series[-1]))
+            lines.append('{}_count{} {}'.format(self.name, format_labels(self.labels, labels), total))
+        return lines
+
+
+REGISTRY: List[Metric] = []
+
+requests = Histogram('tbg_request_seconds', 'HTTP request latency by route', LATENCY_BUCKETS, ('route', 'method'))
+actions = Histogram('tbg_game_action_seconds', 'Time taken by each Game action', LATENCY_BUCKETS, ('action',))
+patch_bytes = Histogram('tbg_patch_bytes', 'Size of each encoded patch sent to a player', SIZE_BUCKETS)
+emits = Counter('tbg_emits_total', 'Socket.IO messages sent to players', ('event',))
+sockets = Gauge('tbg_connected_sockets', 'Socket.IO connections open to this process')
+
+
+def time_action(action: str, seconds: float) -> None:
+    actions.observe(seconds, action)
+
+
+game.action_timers.append(time_action)
+
+
+def gauge(name: str, help_text: str, labels: Tuple[str, ...] = ()):
+    '''Decorator. Registers a gauge whose values are returned by the decorated function.'''
+    def decorator(collect: Callable[[], Dict[Labels, float]]) -> Callable[[], Dict[Labels, float]]:
+        Gauge(name, help_text, labels, collect)
+        return collect
+    return decorator
+
+
+def render() -> str:
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines += metric.render()
+    return '\n'.join(lines) + '\n'
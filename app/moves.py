@@ -0,0 +1,62 @@
+'''
+Table of game moves clients can make, shared by servers that dispatch moves generically
+rather than through one route per move, and batches of moves made in one request.
+'''
+from typing import Dict, List, Tuple
+
+from game import Game
+from player import Player
+import snapshot
+import util
+
+# Move name (as in the REST route /api/game/<game_id>/<move>) -> Game method and parameters
+MOVES: Dict[str, Tuple[str, Tuple[str, ...]]] = {
+    'start': ('start_game', ()),
+    'play/hand': ('hand_to_field', ('field_index',)),
+    'play/market': ('market_to_field', ('field_index', 'card_id')),
+    'play/pending': ('pending_to_field', ('field_index', 'card_id')),
+    'draw/market': ('deck_to_market', ()),
+    'draw/hand': ('deck_to_hand', ()),
+    'trade/create': ('create_trade', ('other_player', 'card_ids', 'wants')),
+    'trade/accept': ('accept_trade', ('trade_id', 'card_ids')),
+    'trade/reject': ('reject_trade', ('trade_id',)),
+    'buy': ('buy_field', ())
+}
+
+# Moves a client may send in one request to /api/game/<game_id>/moves
+MAX_BATCH: int = 32
+
+
+def apply_move(game: Game, player: Player, move: str, data: Dict) -> Dict:
+    '''Makes move for player with parameters taken from data'''
+    if move not in MOVES:
+        return util.error('Invalid move')
+    method, params = MOVES[move]
+    try:
+        args = [data[param] for param in params]
+    except (KeyError, TypeError):
+        return util.error('Incorrect JSON data')
+    return getattr(game, method)(player, *args)
+
+
+def apply_moves(game: Game, player: Player, batch: List[Dict]) -> Dict:
+    '''
+    Makes each move in batch, a list of move parameters with the move name under "move", in
+    order. Either every move is made or none: if one fails, the game is restored to its state
+    before the batch and the error is returned with the index of the move that "failed".
+    Otherwise returns the result of each move, and the number made as "applied".
+    '''
+    if not isinstance(batch, list) or not batch:
+        return util.error('Incorrect JSON data')
+    if len(batch) > MAX_BATCH:
+        return util.error('Cannot make more than {} moves at once'.format(MAX_BATCH))
+    saved: bytes = snapshot.dumps(game)
+    results: List[Dict] = []
+    for index, data in enumerate(batch):
+        result: Dict = apply_move(game, player, data.get('move') if isinstance(data, dict) else None, data)
+        if result.get('error'):
+            if index:
+                game.restore(snapshot.loads(saved))
+            return {'error': result['error'], 'failed': index}
+        results.append(result)
+    return {'success': 'Successfully made {} moves'.format(len(results)), 'applied': len(results), 'results': results}
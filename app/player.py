@@ -1,6 +1,6 @@
-from card import Field, Card
+from card import Field, Card, CardPile
 import uuid
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Set, Tuple
 
 
 class Player:
@@ -8,14 +8,14 @@ class Player:
 
     def __init__(self, name: str) -> None:
         self.name: str = name
-        self.hand: List[Card] = []
+        self.hand: CardPile = CardPile()
         self.fields: List[Field] = []
         self.coins: int = 0
         self.is_host: bool = False
         self.token: str = str(uuid.uuid4())
-        self.pending_cards: List[Card] = []
+        self.pending_cards: CardPile = CardPile()
         self.socket_sid: str = ""
-        self.last_update: Dict = {}
+        self.changes: Set[str] = set()
 
         # Create 3 fields
         self.fields.append(Field(True))
@@ -24,10 +24,42 @@ class Player:
 
     def get_first_card(self) -> Card:
         '''Removes first card from hand and returns it'''
-        first_card: Card = self.hand[0]
-        self.hand = self.hand[1:]
+        first_card: Card = self.hand.popleft()
+        self.changes.add('hand')
         return first_card
 
+    def add_to_hand(self, cards: List[Card]) -> None:
+        '''Adds cards to the back of hand'''
+        self.hand.extend(cards)
+        self.changes.add('hand')
+
+    def add_coins(self, coins: int) -> None:
+        '''Adds coins, or removes them if negative'''
+        self.coins += coins
+        self.changes.add('coins')
+
+    def collect_changes(self) -> Tuple[List[str], List[str]]:
+        '''
+        Returns keys of the public and private dicts changed since last call and clears them.
+        Changed fields are reported as "fields/<index>", and a change to the player's open
+        trades as the private key "trades".
+        '''
+        public: List[str] = []
+        private: List[str] = []
+        for key in sorted(self.changes):
+            if key == 'hand':
+                public.append('hand_count')
+            if key in ('hand', 'pending_cards', 'trades'):
+                private.append(key)
+            else:
+                public.append(key)
+        for index, field in enumerate(self.fields):
+            if field.changed:
+                public.append('fields/{}'.format(index))
+                field.changed = False
+        self.changes.clear()
+        return public, private
+
     def to_dict_public(self) -> Dict:
         '''Returns all public knowledge as dictionary'''
         return {
@@ -38,9 +70,9 @@ class Player:
             "is_host": self.is_host
         }
 
-    def to_dict_private(self) -> Dict:
-        '''Returns all private knowledge as dictionary'''
-        knowledge: Dict = self.to_dict_public()
+    def to_dict_private(self, public: Optional[Dict] = None) -> Dict:
+        '''Returns all private knowledge as dictionary, optionally extending an existing public dict'''
+        knowledge: Dict = dict(public) if public is not None else self.to_dict_public()
         knowledge["hand"] = [card.to_dict() for card in self.hand]
         knowledge["pending_cards"] = [card.to_dict() for card in self.pending_cards]
         return knowledge
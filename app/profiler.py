@@ -0,0 +1,167 @@
+'''
+Opt-in profiling of the request and broadcast pipeline, enabled with TBG_PROFILE=1.
+
+Spans time the stages a request passes through (each game request, then collecting, encoding
+and emitting the updates it causes) into the tbg_span_seconds histogram at /metrics, next to
+tbg_game_action_seconds which already times every Game action. A fraction of game requests
+(TBG_PROFILE_SAMPLE, default 0.01) is also profiled in full and accumulated into a file in
+TBG_PROFILE_DIR, written every DUMP_EVERY samples and on exit:
+- pstats: profile.pstats, cProfile stats for pstats or snakeviz
+- collapsed: profile.collapsed, stacks weighted by microseconds for flamegraph.pl or speedscope
+Under gevent, work other greenlets do while a sampled request waits is included.
+
+When disabled, span() and sample() return a shared no-op context manager, so instrumented
+code costs one function call per span.
+'''
+import atexit
+import cProfile
+import os
+import random
+import sys
+from time import perf_counter
+from typing import Dict, List, Optional, Union
+
+from config import PROFILE, PROFILE_SAMPLE, PROFILE_DIR, PROFILE_FORMAT
+import metrics
+
+DUMP_EVERY: int = 20
+
+# Declared ahead of the functions that assign them, which Python 3.6 requires of annotated globals
+sampling: bool = False
+sample_count: int = 0
+
+
+class NoSpan:
+    '''Context manager that does nothing, used when profiling is off'''
+
+    def __enter__(self) -> None:
+        pass
+
+    def __exit__(self, *exc_info) -> None:
+        pass
+
+
+NO_SPAN: NoSpan = NoSpan()
+
+
+class Span:
+    '''Times its block into the tbg_span_seconds histogram'''
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name: str) -> None:
+        self.name: str = name
+        self.start: float = 0.0
+
+    def __enter__(self) -> None:
+        self.start = perf_counter()
+
+    def __exit__(self, *exc_info) -> None:
+        spans.observe(perf_counter() - self.start, self.name)
+
+
+class PstatsCollector:
+    '''Accumulates sampled requests in one cProfile profile'''
+    file_name: str = 'profile.pstats'
+
+    def __init__(self, path: str) -> None:
+        self.path: str = path
+        self.profile = cProfile.Profile()
+
+    def start(self) -> None:
+        self.profile.enable()
+
+    def stop(self) -> None:
+        self.profile.disable()
+
+    def dump(self) -> None:
+        self.profile.dump_stats(self.path)
+
+
+class CollapsedCollector:
+    '''Accumulates the self time of every call stack seen in sampled requests, via sys.setprofile'''
+    file_name: str = 'profile.collapsed'
+
+    def __init__(self, path: str) -> None:
+        self.path: str = path
+        self.stacks: Dict[str, float] = {}
+        # Each entry is the whole stack down to that frame, joined with ";"
+        self.stack: List[str] = []
+        self.last: float = 0.0
+
+    def trace(self, frame, event: str, arg) -> None:
+        now: float = perf_counter()
+        if self.stack:
+            self.stacks[self.stack[-1]] = self.stacks.get(self.stack[-1], 0.0) + now - self.last
+        if event == 'call':
+            name: str = '{}:{}'.format(os.path.basename(frame.f_code.co_filename), frame.f_code.co_name)
+            self.stack.append(self.stack[-1] + ';' + name if self.stack else name)
+        elif event == 'c_call':
+            name = getattr(arg, '__qualname__', None) or getattr(arg, '__name__', 'builtin')
+            self.stack.append(self.stack[-1] + ';' + name if self.stack else name)
+        elif self.stack:
+            # return, c_return or c_exception. Returns from frames entered before sampling
+            # started find the stack already empty.
+            self.stack.pop()
+        self.last = perf_counter()
+
+    def start(self) -> None:
+        self.stack = []
+        self.last = perf_counter()
+        sys.setprofile(self.trace)
+
+    def stop(self) -> None:
+        sys.setprofile(None)
+
+    def dump(self) -> None:
+        with open(self.path + '.tmp', 'w') as collapsed_file:
+            for stack, seconds in sorted(self.stacks.items()):
+                if seconds >= 1e-6:
+                    collapsed_file.write('{} {}\n'.format(stack, int(seconds * 1e6)))
+        os.replace(self.path + '.tmp', self.path)
+
+
+class Sample:
+    '''Profiles its block with the collector'''
+
+    def __enter__(self) -> None:
+        global sampling
+        sampling = True
+        collector.start()
+
+    def __exit__(self, *exc_info) -> None:
+        global sampling, sample_count
+        collector.stop()
+        sampling = False
+        sample_count += 1
+        if sample_count % DUMP_EVERY == 0:
+            collector.dump()
+
+
+def span(name: str):
+    '''Returns a context manager timing its block as span name'''
+    return Span(name) if PROFILE else NO_SPAN
+
+
+def sample():
+    '''Returns a context manager profiling its block for a sampled fraction of calls'''
+    if not PROFILE or sampling or random.random() >= PROFILE_SAMPLE:
+        return NO_SPAN
+    return Sample()
+
+
+spans: Optional[metrics.Histogram] = None
+collector: Union[PstatsCollector, CollapsedCollector, None] = None
+
+if PROFILE:
+    spans = metrics.Histogram('tbg_span_seconds', 'Time taken by each profiled stage of handling requests',
+                              metrics.LATENCY_BUCKETS, ('span',))
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    if PROFILE_FORMAT == 'collapsed':
+        collector = CollapsedCollector(os.path.join(PROFILE_DIR, CollapsedCollector.file_name))
+    else:
+        collector = PstatsCollector(os.path.join(PROFILE_DIR, PstatsCollector.file_name))
+
+    @atexit.register
+    def dump_on_exit() -> None:
+        if sample_count:
+            collector.dump()
@@ -0,0 +1,86 @@
+'''
+Evicts games left idle longer than the time to live for their status, so completed,
+abandoned and never started games don't stay in memory forever.
+
+Every game held in memory has one entry in a heap keyed by the time it may expire: its last
+action plus the TTL for its status. Reaping pops only the entries that are due, so it never
+scans every game. A due game that has had actions since its entry was pushed is pushed back
+with its new expiry instead of evicted. A game whose status changes is pushed again by
+reschedule, as the TTL of its new status may make it due sooner; only its newest entry
+counts, older ones are dropped as they come up.
+'''
+import heapq
+import threading
+import time
+from typing import Callable, Dict, List, Tuple
+
+from game import Game
+import metrics
+
+evictions = metrics.Counter('tbg_evictions_total', 'Games evicted by the reaper by status', ('status',))
+
+
+class Reaper:
+    '''Tracks games and evicts them with evict once idle past ttls[game.status] seconds'''
+
+    def __init__(self, ttls: Dict[str, float], evict: Callable[[Game], None],
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        self.ttls: Dict[str, float] = ttls
+        self.evict: Callable[[Game], None] = evict
+        self.clock: Callable[[], float] = clock
+        self.heap: List[Tuple[float, str]] = []
+        self.games: Dict[str, Game] = {}
+        # Expiry of each game's newest heap entry and the status it was computed for
+        self.entries: Dict[str, Tuple[float, str]] = {}
+        self.lock: threading.Lock = threading.Lock()
+
+    def expiry(self, game: Game) -> float:
+        return game.last_active + self.ttls[game.status]
+
+    def track(self, game: Game) -> None:
+        '''Starts tracking game, once'''
+        with self.lock:
+            if game.id not in self.games:
+                self.games[game.id] = game
+                self.push(game)
+
+    def reschedule(self, game: Game) -> None:
+        '''Pushes a tracked game again if its status changed since its newest entry was pushed'''
+        with self.lock:
+            if self.games.get(game.id) is game and self.entries[game.id][1] != game.status:
+                self.push(game)
+
+    def push(self, game: Game) -> None:
+        expiry: float = self.expiry(game)
+        self.entries[game.id] = (expiry, game.status)
+        heapq.heappush(self.heap, (expiry, game.id))
+
+    def reap(self) -> List[Game]:
+        '''Evicts every game past its expiry and returns them'''
+        now: float = self.clock()
+        expired: List[Game] = []
+        with self.lock:
+            while self.heap and self.heap[0][0] <= now:
+                entry_expiry, game_id = heapq.heappop(self.heap)
+                if game_id not in self.entries or self.entries[game_id][0] != entry_expiry:
+                    # Replaced by a newer entry
+                    continue
+                game: Game = self.games[game_id]
+                if self.expiry(game) > now:
+                    self.push(game)
+                else:
+                    del self.games[game_id]
+                    del self.entries[game_id]
+                    expired.append(game)
+        for game in expired:
+            self.evict(game)
+            evictions.inc(game.status)
+        return expired
+
+    def start(self, interval: float) -> None:
+        '''Reaps every interval seconds on a daemon thread'''
+        def loop() -> None:
+            while True:
+                time.sleep(interval)
+                self.reap()
+        threading.Thread(target=loop, daemon=True).start()
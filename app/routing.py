@@ -0,0 +1,23 @@
+'''
+Sticky routing of games to server processes. Every process is configured with the same
+TBG_NODES list and its own TBG_NODE; each game id hashes to exactly one node, which
+serves all requests for that game. A load balancer can apply the same hash to the game
+id in the URL, any request that still lands on the wrong node is redirected to the owner.
+'''
+import hashlib
+from typing import List, Optional
+
+from config import NODES, NODE
+
+
+def owner(game_id: str, nodes: List[str] = NODES) -> Optional[str]:
+    '''Returns node serving game using rendezvous hashing, or None when running a single node'''
+    if not nodes:
+        return None
+    return max(nodes, key=lambda node: hashlib.md5('{}/{}'.format(node, game_id).encode()).digest())
+
+
+def is_local(game_id: str) -> bool:
+    '''Checks whether this node serves game'''
+    node: Optional[str] = owner(game_id)
+    return node is None or node == NODE
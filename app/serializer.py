@@ -0,0 +1,79 @@
+'''
+JSON encoding for everything sent to clients. Uses orjson or ujson when installed and
+falls back to the standard library. Set TBG_JSON_ENCODER to force a specific encoder.
+'''
+import json
+import os
+import weakref
+from typing import Callable, Dict, List, Tuple, Any
+
+ENCODERS: Dict[str, Callable[[Any], str]] = {
+    'json': lambda obj: json.dumps(obj, separators=(',', ':'))
+}
+
+try:
+    import ujson
+    ENCODERS['ujson'] = lambda obj: ujson.dumps(obj, ensure_ascii=False)
+except ImportError:
+    pass
+
+try:
+    import orjson
+    ENCODERS['orjson'] = lambda obj: orjson.dumps(obj).decode()
+except ImportError:
+    pass
+
+encoder_name: str = ''
+dumps: Callable[[Any], str] = ENCODERS['json']
+
+# Encoded public parts of each game's view: game -> (version, snapshot, public players)
+view_cache: 'weakref.WeakKeyDictionary' = weakref.WeakKeyDictionary()
+
+
+def use(name: str) -> None:
+    '''Switches encoder to one of ENCODERS'''
+    global encoder_name, dumps
+    dumps = ENCODERS[name]
+    encoder_name = name
+    view_cache.clear()
+
+
+def encode_patches(patches: List[Tuple[Any, List[Dict]]]) -> List[Tuple[Any, str]]:
+    '''
+    Encodes a patch per recipient. Operations shared between patches, like the ones built
+    by Game.collect_patches, are encoded once and the encoded text reused for every recipient.
+    '''
+    encoded_ops: Dict[int, str] = {}
+    encoded: List[Tuple[Any, str]] = []
+    for recipient, patch in patches:
+        parts: List[str] = []
+        for op in patch:
+            try:
+                parts.append(encoded_ops[id(op)])
+            except KeyError:
+                encoded_ops[id(op)] = dumps(op)
+                parts.append(encoded_ops[id(op)])
+        encoded.append((recipient, '[' + ','.join(parts) + ']'))
+    return encoded
+
+
+def encode_view(game, player) -> str:
+    '''
+    Encodes game.retrieve_game(player). The public snapshot and public player dicts are
+    encoded once per game version and shared by every player's view.
+    '''
+    snapshot: Dict = game.public_snapshot()
+    cached = view_cache.get(game)
+    if cached is None or cached[0] != game.version:
+        cached = (game.version, dumps(snapshot), [dumps(public) for public in game.public_players])
+        view_cache[game] = cached
+    _, encoded_snapshot, encoded_players = cached
+    index: int = game.players.index(player)
+    private: str = dumps(player.to_dict_private(game.public_players[index]))
+    others: str = ','.join(encoded_players[:index] + encoded_players[index + 1:])
+    trades: str = dumps(game.trades_to_dict(player))
+    return '{{"player_info":{},"players":[{}],"trades":{},"version":{},{}'.format(
+        private, others, trades, game.update_version, encoded_snapshot[1:])
+
+
+use(os.getenv('TBG_JSON_ENCODER') or next(name for name in ('orjson', 'ujson', 'json') if name in ENCODERS))
@@ -0,0 +1,298 @@
+'''
+Headless self-play: bots play complete games straight through the Game engine, with no
+server or sockets in between. Used for load generation, balance analysis of the payouts in
+constants.CARD_TYPES and checking engine performance between releases.
+
+Each seat is played by a policy from POLICIES. Game i of a run uses seed start_seed + i for
+both the deck and the bots, so any game in a run can be replayed on its own.
+
+Usage: python app/simulator.py [--games N] [--processes N] [--seed N] [--json] [policy ...]
+'''
+import argparse
+import json
+import multiprocessing
+import random
+import time
+from functools import partial
+from typing import Callable, Dict, List, Optional, Tuple, cast
+
+from card import Card, Field, CARD_CATALOG
+from game import Game
+from player import Player
+from trade import Trade
+import constants
+
+# Engine calls allowed per game before it counts as stalled
+MAX_MOVES: int = 10000
+
+
+class TalliedGame(Game):
+    '''Game that tallies the coins paid out for each bean type'''
+
+    def __init__(self, game_type: str, seed: Optional[int] = None) -> None:
+        super().__init__(game_type, seed=seed)
+        self.payouts: Dict[str, int] = {}
+
+    def cash_in(self, field: Field, player: Player) -> None:
+        value: int = field.get_trade_value()
+        if value:
+            self.payouts[field.name] = self.payouts.get(field.name, 0) + value
+        super().cash_in(field, player)
+
+
+class RandomBot:
+    '''Makes every choice at random'''
+    name: str = 'random'
+
+    def __init__(self, rng: random.Random) -> None:
+        self.rng: random.Random = rng
+
+    def choose_field(self, player: Player, card: Card) -> int:
+        '''Returns the index of the field to plant card in'''
+        return self.rng.choice([index for index, field in enumerate(player.fields) if field.enabled])
+
+    def plays_second_card(self, player: Player) -> bool:
+        return self.rng.random() < 0.5
+
+    def buys_field(self, game: Game, player: Player) -> bool:
+        return player.coins >= 3 and not player.fields[2].enabled and self.rng.random() < 0.2
+
+    def offer_trades(self, game: Game, player: Player) -> List[Tuple[str, List[str], List[str]]]:
+        '''Returns trades to create as (other player name, card ids, wanted card names)'''
+        return []
+
+    def answer_trade(self, player: Player, trade: Trade) -> Optional[List[str]]:
+        '''Returns ids of the cards to give to accept trade, or None to reject it'''
+        return None
+
+
+class GreedyBot(RandomBot):
+    '''Grows beans where they match, and when forced to cash in, cashes the most valuable field'''
+    name: str = 'greedy'
+
+    def choose_field(self, player: Player, card: Card) -> int:
+        enabled: List[int] = [index for index, field in enumerate(player.fields) if field.enabled]
+        for index in enabled:
+            if player.fields[index].card_type is card.type:
+                return index
+        for index in enabled:
+            if not player.fields[index].cards:
+                return index
+        return max(enabled, key=lambda index: player.fields[index].get_trade_value())
+
+    def fits(self, player: Player, card: Card) -> bool:
+        '''Checks card can be planted without cashing in a field'''
+        return any(field.enabled and (field.card_type is card.type or not field.cards) for field in player.fields)
+
+    def plays_second_card(self, player: Player) -> bool:
+        return bool(player.hand) and self.fits(player, player.hand.first())
+
+    def buys_field(self, game: Game, player: Player) -> bool:
+        return player.coins >= 3 and not player.fields[2].enabled and game.playthrough == 0
+
+
+class TradingBot(GreedyBot):
+    '''
+    Greedy, and offers market cards it can't plant to players already growing them, asking
+    for a bean it grows in return. Accepts offers of beans it can plant.
+    '''
+    name: str = 'trader'
+
+    def offer_trades(self, game: Game, player: Player) -> List[Tuple[str, List[str], List[str]]]:
+        growing: List[str] = [field.name for field in player.fields if field.cards]
+        if not growing:
+            return []
+        offers: List[Tuple[str, List[str], List[str]]] = []
+        for card in game.market:
+            if self.fits(player, card):
+                continue
+            for other in game.players:
+                if other is not player and any(field.card_type is card.type for field in other.fields):
+                    offers.append((other.name, [card.id], [self.rng.choice(growing)]))
+                    break
+        return offers
+
+    def answer_trade(self, player: Player, trade: Trade) -> Optional[List[str]]:
+        if not all(self.fits(player, tc.card) for tc in trade.p1_trades):
+            return None
+        card_ids: List[str] = []
+        # Keep the front of the hand, it's the next card to plant
+        cards: List[Card] = list(player.hand)[1:]
+        for want in trade.wants:
+            card: Optional[Card] = next((card for card in cards if card.name == want and card.id not in card_ids), None)
+            if not card:
+                return None
+            card_ids.append(card.id)
+        return card_ids
+
+
+POLICIES: Dict[str, Callable[[random.Random], RandomBot]] = {
+    bot.name: bot for bot in (RandomBot, GreedyBot, TradingBot)
+}
+
+
+def play_game(policies: List[str], seed: int, prepare: Optional[Callable[[Game], None]] = None) -> Dict:
+    '''
+    Plays one game with a bot per seat, policies naming each seat's policy. prepare is called
+    with the game once its players have joined. Returns the game's stats.
+    '''
+    game: TalliedGame = TalliedGame('private', seed=seed)
+    for seat in range(len(policies)):
+        game.add_player(Player('seat{}'.format(seat)))
+    bots: List[RandomBot] = [POLICIES[policy](random.Random('{}:{}'.format(seed, seat)))
+                             for seat, policy in enumerate(policies)]
+    if prepare:
+        prepare(game)
+    game.start_game(game.players[0])
+    moves: int = 1
+    turns: int = 0
+    trades: int = 0
+
+    def plant_pending() -> int:
+        count: int = 0
+        for seat, player in enumerate(game.players):
+            while player.pending_cards:
+                card: Card = player.pending_cards.first()
+                game.pending_to_field(player, bots[seat].choose_field(player, card), card.id)
+                count += 1
+        return count
+
+    while game.status == 'Running' and moves < MAX_MOVES:
+        current_seat: int = game.current_player_index
+        player: Player = game.players[current_seat]
+        bot: RandomBot = bots[current_seat]
+        if bot.buys_field(game, player):
+            game.buy_field(player)
+            moves += 1
+        if player.hand:
+            game.hand_to_field(player, bot.choose_field(player, player.hand.first()))
+            moves += 1
+            if game.stage_index == 1 and bot.plays_second_card(player):
+                game.hand_to_field(player, bot.choose_field(player, player.hand.first()))
+                moves += 1
+        game.deck_to_market(player)
+        moves += 1
+        for other_name, card_ids, wants in bot.offer_trades(game, player):
+            game.create_trade(player, other_name, card_ids, wants)
+            moves += 1
+        for trade in list(game.trades.values()):
+            answer_ids: Optional[List[str]] = bots[game.players.index(trade.p2)].answer_trade(trade.p2, trade)
+            if answer_ids is None or game.accept_trade(trade.p2, trade.id, answer_ids).get('error'):
+                game.reject_trade(trade.p2, trade.id)
+            else:
+                trades += 1
+            moves += 1
+        moves += plant_pending()
+        for card in list(game.market):
+            if game.status != 'Running':
+                break
+            game.market_to_field(player, bot.choose_field(player, card), card.id)
+            moves += 1
+        game.deck_to_hand(player)
+        moves += 1
+        turns += 1
+
+    coins: List[int] = [player.coins for player in game.players]
+    return {
+        'seed': seed,
+        'policies': policies,
+        'completed': game.status == 'Completed',
+        'moves': moves,
+        'turns': turns,
+        'playthroughs': game.playthrough,
+        'trades': trades,
+        'coins': coins,
+        'winner': coins.index(max(coins)),
+        'payouts': game.payouts
+    }
+
+
+def simulate(game_count: int, policies: List[str], processes: int = 1, start_seed: int = 0) -> Dict:
+    '''Plays game_count games, across a pool of processes if more than one, and returns aggregate stats'''
+    start: float = time.perf_counter()
+    seeds: range = range(start_seed, start_seed + game_count)
+    play: Callable[[int], Dict] = cast(Callable[[int], Dict], partial(play_game, policies))
+    if processes > 1:
+        with multiprocessing.Pool(processes) as pool:
+            results: List[Dict] = pool.map(play, seeds, chunksize=max(1, game_count // (processes * 4)))
+    else:
+        results = [play(seed) for seed in seeds]
+    return summarize(results, time.perf_counter() - start)
+
+
+def mean(values: List[float]) -> float:
+    return sum(values) / len(values) if values else 0.0
+
+
+def percentiles(values: List[int]) -> Dict[str, int]:
+    ordered: List[int] = sorted(values)
+    return {'p{}'.format(p): ordered[min(len(ordered) - 1, len(ordered) * p // 100)] for p in (0, 10, 50, 90, 100)}
+
+
+def summarize(results: List[Dict], elapsed: float) -> Dict:
+    '''Aggregates the stats of games played with the same policies'''
+    seats: int = len(results[0]['policies'])
+    policies: List[str] = results[0]['policies']
+    moves: int = sum(result['moves'] for result in results)
+    wins: List[int] = [0] * seats
+    for result in results:
+        wins[result['winner']] += 1
+    policy_wins: Dict[str, float] = {}
+    for seat, policy in enumerate(policies):
+        policy_wins[policy] = policy_wins.get(policy, 0) + wins[seat] / len(results) / policies.count(policy)
+    payouts: Dict[str, int] = {}
+    for result in results:
+        for name, value in result['payouts'].items():
+            payouts[name] = payouts.get(name, 0) + value
+    return {
+        'games': len(results),
+        'stalled': sum(not result['completed'] for result in results),
+        'seconds': elapsed,
+        'games_per_second': len(results) / elapsed,
+        'moves_per_second': moves / elapsed,
+        'mean_moves': moves / len(results),
+        'mean_turns': mean([result['turns'] for result in results]),
+        'mean_playthroughs': mean([result['playthroughs'] for result in results]),
+        'mean_trades': mean([result['trades'] for result in results]),
+        'policies': policies,
+        'mean_coins_by_seat': [mean([result['coins'][seat] for result in results]) for seat in range(seats)],
+        'coins': percentiles([coins for result in results for coins in result['coins']]),
+        'win_rate_by_seat': [count / len(results) for count in wins],
+        'win_rate_by_policy': policy_wins,
+        # Coins each card of a bean type earned, on average, for comparing payout tables
+        'coins_per_card': {card_type.name: payouts.get(card_type.name, 0) / (card_type.count * len(results))
+                           for card_type in CARD_CATALOG}
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Plays bot games through the game engine')
+    parser.add_argument('policies', nargs='*', default=['greedy'] * 4,
+                        help='policy of each seat: {}'.format(', '.join(POLICIES)))
+    parser.add_argument('--games', type=int, default=1000)
+    parser.add_argument('--processes', type=int, default=multiprocessing.cpu_count())
+    parser.add_argument('--seed', type=int, default=0, help='seed of the first game')
+    parser.add_argument('--json', action='store_true', help='print stats as JSON')
+    args = parser.parse_args()
+    unknown: List[str] = [policy for policy in args.policies if policy not in POLICIES]
+    if unknown:
+        parser.error('unknown policy {}'.format(unknown[0]))
+    if not 2 <= len(args.policies) <= constants.MAX_PLAYERS:
+        parser.error('between 2 and {} seats are needed'.format(constants.MAX_PLAYERS))
+
+    stats: Dict = simulate(args.games, args.policies, args.processes, args.seed)
+    if args.json:
+        print(json.dumps(stats, indent=2))
+        return
+    for key, value in stats.items():
+        if isinstance(value, float):
+            value = round(value, 2)
+        elif isinstance(value, list):
+            value = [round(item, 2) if isinstance(item, float) else item for item in value]
+        elif isinstance(value, dict):
+            value = {name: round(item, 2) for name, item in value.items()}
+        print('{:<20} {}'.format(key, value))
+
+
+if __name__ == '__main__':
+    main()
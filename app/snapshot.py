@@ -0,0 +1,241 @@
+'''
+Compact, versioned binary snapshots of a whole game: deck order, discards, market, players
+with their hands, pending cards and fields, and open trades.
+
+Cards are written as their index in constants.CARD_TYPES plus their 6 hex digit id packed
+into 3 bytes, so a full game takes well under a kilobyte and is saved or loaded in
+microseconds. Used to persist games and move them between nodes.
+'''
+import os
+import random
+import struct
+import uuid
+from typing import Dict, List, Optional, Type, TypeVar
+
+from card import Card, CardPile, Deck, Field, CARD_CATALOG
+from game import Game
+from player import Player
+from trade import Trade, TradingCard
+
+MAGIC: bytes = b'TBG'
+# Version 2 added the game's random seed and epoch, version 3 widened the player and trade
+# counts from one byte to two
+VERSION: int = 3
+
+STATUSES = ('Awaiting', 'Running', 'Completed')
+GAME_TYPES = ('public', 'private')
+# Location of a traded card that sits in the market rather than a player's hand
+MARKET: int = 255
+
+GAME_HEADER = struct.Struct('>BBBBBBI')
+RNG = struct.Struct('>QI')
+PLAYER_HEADER = struct.Struct('>16sHB')
+TRADE_HEADER = struct.Struct('>3sBB')
+CARD = struct.Struct('>B3s')
+
+
+class SnapshotError(ValueError):
+    '''Raised when data isn't a snapshot this version can read'''
+
+
+class Writer:
+    def __init__(self) -> None:
+        self.data: bytearray = bytearray()
+
+    def pack(self, fmt: struct.Struct, *values) -> None:
+        self.data += fmt.pack(*values)
+
+    def byte(self, value: int) -> None:
+        self.data.append(value)
+
+    def count(self, value: int) -> None:
+        self.data += struct.pack('>H', value)
+
+    def text(self, value: Optional[str]) -> None:
+        '''Writes length prefixed UTF-8, with 0xFFFF standing for None'''
+        if value is None:
+            self.data += b'\xff\xff'
+            return
+        encoded: bytes = value.encode()
+        self.data += struct.pack('>H', len(encoded)) + encoded
+
+    def cards(self, cards) -> None:
+        packed: List[bytes] = [CARD.pack(card.type.index, bytes.fromhex(card.id)) for card in cards]
+        self.data += struct.pack('>H', len(packed))
+        self.data += b''.join(packed)
+
+
+class Reader:
+    def __init__(self, data: bytes) -> None:
+        self.data: memoryview = memoryview(data)
+        self.offset: int = 0
+
+    def unpack(self, fmt: struct.Struct) -> tuple:
+        values: tuple = fmt.unpack_from(self.data, self.offset)
+        self.offset += fmt.size
+        return values
+
+    def byte(self) -> int:
+        value: int = self.data[self.offset]
+        self.offset += 1
+        return value
+
+    def count(self, version: int) -> int:
+        '''Reads a count of players or trades, a single byte before version 3'''
+        if version < 3:
+            return self.byte()
+        value: int = struct.unpack_from('>H', self.data, self.offset)[0]
+        self.offset += 2
+        return value
+
+    def text(self) -> Optional[str]:
+        length: int = struct.unpack_from('>H', self.data, self.offset)[0]
+        self.offset += 2
+        if length == 0xFFFF:
+            return None
+        value: str = self.data[self.offset:self.offset + length].tobytes().decode()
+        self.offset += length
+        return value
+
+    def cards(self) -> List[Card]:
+        count: int = struct.unpack_from('>H', self.data, self.offset)[0]
+        start: int = self.offset + 2
+        self.offset = start + CARD.size * count
+        return [
+            Card(CARD_CATALOG[type_index], packed_id.hex())
+            for type_index, packed_id in CARD.iter_unpack(self.data[start:self.offset])
+        ]
+
+
+def dumps(game: Game) -> bytes:
+    '''Encodes game as a snapshot'''
+    writer = Writer()
+    writer.data += MAGIC
+    writer.pack(GAME_HEADER, VERSION, GAME_TYPES.index(game.game_type), STATUSES.index(game.status),
+                game.stage_index, game.current_player_index, game.playthrough, game.version)
+    writer.pack(RNG, game.seed, game.rng_epoch)
+    writer.text(game.id)
+    writer.text(game.winner)
+    writer.cards(game.deck.cards)
+    writer.cards(game.discards.cards)
+    writer.cards(game.market)
+
+    writer.count(len(game.players))
+    for player in game.players:
+        writer.pack(PLAYER_HEADER, uuid.UUID(player.token).bytes, player.coins,
+                    player.is_host | player.fields[2].enabled << 1)
+        writer.text(player.name)
+        writer.text(player.socket_sid)
+        writer.cards(player.hand)
+        writer.cards(player.pending_cards)
+        for field in player.fields:
+            writer.cards(field.cards)
+
+    # Trades with a player who has left can never complete and are dropped
+    player_indexes: Dict[int, int] = {id(player): index for index, player in enumerate(game.players)}
+    locations: Dict[int, int] = {id(player.hand): index for index, player in enumerate(game.players)}
+    locations[id(game.market)] = MARKET
+    trades: List[Trade] = [
+        trade for trade in game.trades.values()
+        if id(trade.p1) in player_indexes and id(trade.p2) in player_indexes and
+        all(id(tc.location) in locations for tc in trade.p1_trades + trade.p2_trades)
+    ]
+    writer.count(len(trades))
+    for trade in trades:
+        writer.pack(TRADE_HEADER, bytes.fromhex(trade.id), player_indexes[id(trade.p1)], player_indexes[id(trade.p2)])
+        writer.data += struct.pack('>H', len(trade.wants))
+        for name in trade.wants:
+            writer.text(name)
+        for tcs in (trade.p1_trades, trade.p2_trades):
+            writer.cards(tc.card for tc in tcs)
+            writer.data += bytes(locations[id(tc.location)] for tc in tcs)
+    return bytes(writer.data)
+
+
+T = TypeVar('T')
+
+
+def blank(cls: Type[T]) -> T:
+    '''Returns an instance of cls that __init__ hasn't set up'''
+    return object.__new__(cls)
+
+
+def load_field(cards: List[Card], enabled: bool) -> Field:
+    field: Field = blank(Field)
+    field.__dict__.update(cards=CardPile(cards), card_type=cards[0].type if cards else None, enabled=enabled,
+                          changed=False)
+    return field
+
+
+def loads(data: bytes) -> Game:
+    '''Decodes snapshot made by dumps'''
+    if data[:len(MAGIC)] != MAGIC:
+        raise SnapshotError('Not a game snapshot')
+    reader = Reader(data)
+    reader.offset = len(MAGIC)
+    version, game_type, status, stage_index, current_player_index, playthrough, state_version = \
+        reader.unpack(GAME_HEADER)
+    if not 1 <= version <= VERSION:
+        raise SnapshotError('Unsupported snapshot version {}'.format(version))
+
+    # Objects are built without their constructors, which would draw ids and seeds only to
+    # have them replaced, and restored the way unpickling restores them
+    game: Game = blank(Game)
+    # Games from before version 2 are seeded afresh, as a new game would be
+    seed: int = int.from_bytes(os.urandom(8), 'big')
+    rng_epoch: int = 0
+    if version >= 2:
+        seed, rng_epoch = reader.unpack(RNG)
+    game_id: Optional[str] = reader.text()
+    winner: Optional[str] = reader.text()
+    deck: Deck = Deck()
+    deck.cards = reader.cards()
+    discards: Deck = Deck()
+    discards.cards = reader.cards()
+    market: CardPile = CardPile(reader.cards())
+
+    players: List[Player] = []
+    for _ in range(reader.count(version)):
+        token, coins, flags = reader.unpack(PLAYER_HEADER)
+        player: Player = blank(Player)
+        player.__dict__.update(
+            name=reader.text(), token=str(uuid.UUID(bytes=token)), coins=coins, is_host=bool(flags & 1),
+            socket_sid=reader.text(), hand=CardPile(reader.cards()), pending_cards=CardPile(reader.cards()),
+            fields=[load_field(reader.cards(), enabled) for enabled in (True, True, bool(flags & 2))],
+            changes=set())
+        players.append(player)
+
+    game.__setstate__(dict(
+        id=game_id, game_type=GAME_TYPES[game_type], status=STATUSES[status], winner=winner,
+        players=players, tokens={player.token: player for player in players},
+        current_player_index=current_player_index, stage_index=stage_index, playthrough=playthrough,
+        deck=deck, discards=discards, market=market, trades={}, player_trades={}, card_trades={},
+        # Changes since the snapshot reach clients with the next update
+        version=state_version, update_version=state_version, changes=set(),
+        snapshot_version=-1, snapshot={}, public_players=[], recorder=None,
+        # Any state will do, as the game reseeds its generator before every use
+        seed=seed, rng_epoch=rng_epoch, rng=random.Random(0)))
+
+    trade_count: int = reader.count(version)
+    if trade_count:
+        # Traded cards are the same objects as the ones in the market and hands
+        cards_by_id: Dict[str, Card] = {card.id: card for card in game.market}
+        for player in game.players:
+            cards_by_id.update((card.id, card) for card in player.hand)
+    for _ in range(trade_count):
+        trade_id, p1_index, p2_index = reader.unpack(TRADE_HEADER)
+        want_count: int = struct.unpack_from('>H', reader.data, reader.offset)[0]
+        reader.offset += 2
+        wants: List[str] = [reader.text() for _ in range(want_count)]
+        trade = Trade(game.players[p1_index], game.players[p2_index], [], wants, trade_id.hex())
+        for tcs in (trade.p1_trades, trade.p2_trades):
+            cards: List[Card] = [cards_by_id.get(card.id, card) for card in reader.cards()]
+            for card in cards:
+                location: int = reader.byte()
+                if location == MARKET:
+                    tcs.append(TradingCard(card, game.market, 'Market'))
+                else:
+                    owner: Player = game.players[location]
+                    tcs.append(TradingCard(card, owner.hand, "{}'s hand".format(owner.name)))
+        game.add_trade(trade)
+    return game
@@ -0,0 +1,173 @@
+'''
+Storage for games and the client tokens mapped to them.
+
+MemoryStore keeps everything in this process. RedisStore keeps games in anything speaking
+the Redis protocol so several server processes can share them, while each process caches
+the games routed to it (see routing.py). Set TBG_STORE to "memory" (default), a redis://
+URL, or "fakeredis" for a local stand-in.
+'''
+import threading
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from game import Game
+import snapshot
+
+
+class GameStore:
+    '''Interface every store implements'''
+    # Called with every game this process starts holding in memory
+    on_add: Optional[Callable[[Game], None]] = None
+    # Whether saving waits on a server, so asyncio callers save off the event loop
+    blocking: bool = False
+
+    def get(self, game_id: str) -> Optional[Game]:
+        '''Returns game, or None if it doesn't exist'''
+        raise NotImplementedError
+
+    def add(self, game: Game) -> None:
+        '''Stores new game'''
+        raise NotImplementedError
+
+    def save(self, game: Game) -> None:
+        '''Persists changes made to a stored game'''
+        raise NotImplementedError
+
+    def remove(self, game_id: str) -> None:
+        '''Deletes game'''
+        raise NotImplementedError
+
+    def games(self) -> Iterable[Game]:
+        '''Returns every game this process can serve'''
+        raise NotImplementedError
+
+    def get_game_id(self, token: str) -> Optional[str]:
+        '''Returns id of the game a client token belongs to'''
+        raise NotImplementedError
+
+    def client_count(self) -> int:
+        '''Returns number of client tokens this process knows'''
+        raise NotImplementedError
+
+    def add_client(self, token: str, game_id: str) -> None:
+        raise NotImplementedError
+
+    def remove_client(self, token: str) -> None:
+        raise NotImplementedError
+
+
+class MemoryStore(GameStore):
+    '''Keeps games and clients in process memory'''
+
+    def __init__(self) -> None:
+        self.game_map: Dict[str, Game] = {}
+        self.clients: Dict[str, str] = {}
+
+    def get(self, game_id: str) -> Optional[Game]:
+        return self.game_map.get(game_id)
+
+    def add(self, game: Game) -> None:
+        self.game_map[game.id] = game
+        if self.on_add:
+            self.on_add(game)
+
+    def save(self, game: Game) -> None:
+        # Games are live objects, nothing to write back
+        pass
+
+    def remove(self, game_id: str) -> None:
+        self.game_map.pop(game_id, None)
+
+    def games(self) -> Iterable[Game]:
+        return list(self.game_map.values())
+
+    def get_game_id(self, token: str) -> Optional[str]:
+        return self.clients.get(token)
+
+    def client_count(self) -> int:
+        return len(self.clients)
+
+    def add_client(self, token: str, game_id: str) -> None:
+        self.clients[token] = game_id
+
+    def remove_client(self, token: str) -> None:
+        self.clients.pop(token, None)
+
+
+class RedisStore(MemoryStore):
+    '''
+    Writes games through to a Redis protocol server and caches them in memory. Each game
+    is served by the process it's routed to, so the cache never goes stale; a process only
+    reads a game back from Redis when it first gets routed to it, e.g. after a restart.
+    Client tokens read back are only cached for games held here, which forget them when
+    their players leave or the game is removed.
+    '''
+    blocking: bool = True
+
+    def __init__(self, client, prefix: str = 'tbg:',
+                 dumps: Callable[[Game], bytes] = snapshot.dumps,
+                 loads: Callable[[bytes], Game] = snapshot.loads) -> None:
+        super().__init__()
+        self.redis = client
+        self.prefix: str = prefix
+        self.dumps: Callable[[Game], bytes] = dumps
+        self.loads: Callable[[bytes], Game] = loads
+        # Held while reading a game back, so requests racing for it share the one copy
+        self.load_lock: threading.Lock = threading.Lock()
+
+    def key(self, kind: str, name: str) -> str:
+        return '{}{}:{}'.format(self.prefix, kind, name)
+
+    def get(self, game_id: str) -> Optional[Game]:
+        game: Optional[Game] = super().get(game_id)
+        if game is None and game_id:
+            with self.load_lock:
+                game = super().get(game_id)
+                if game is None:
+                    data: Optional[bytes] = self.redis.get(self.key('game', game_id))
+                    if data is not None:
+                        game = self.loads(data)
+                        super().add(game)
+        return game
+
+    def add(self, game: Game) -> None:
+        # Written first, so a game that fails to save isn't left served from the cache alone
+        self.save(game)
+        super().add(game)
+
+    def save(self, game: Game) -> None:
+        self.redis.set(self.key('game', game.id), self.dumps(game))
+
+    def remove(self, game_id: str) -> None:
+        super().remove(game_id)
+        self.redis.delete(self.key('game', game_id))
+
+    def get_game_id(self, token: str) -> Optional[str]:
+        game_id: Any = super().get_game_id(token)
+        if game_id is None:
+            game_id = self.redis.get(self.key('client', token))
+            if game_id is not None:
+                game_id = game_id.decode() if isinstance(game_id, bytes) else game_id
+                # Tokens of games served by other nodes are only looked up to redirect their
+                # clients, and would never be forgotten here
+                if super().get(game_id) is not None:
+                    super().add_client(token, game_id)
+        return game_id
+
+    def add_client(self, token: str, game_id: str) -> None:
+        self.redis.set(self.key('client', token), game_id)
+        super().add_client(token, game_id)
+
+    def remove_client(self, token: str) -> None:
+        super().remove_client(token)
+        self.redis.delete(self.key('client', token))
+
+
+def from_url(url: str) -> GameStore:
+    '''Builds store from a TBG_STORE setting'''
+    if url == 'memory':
+        return MemoryStore()
+    if url == 'fakeredis':
+        import fakeredis
+        return RedisStore(fakeredis.FakeStrictRedis())
+    import redis
+    return RedisStore(redis.StrictRedis.from_url(url))
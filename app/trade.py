@@ -1,28 +1,31 @@
-from typing import List, Dict
+from typing import List, Dict, Optional, Set
 import uuid
 import util
 from player import Player
-from card import Card
+from card import Card, CardPile
 
 class TradingCard:
-    def __init__(self, card: Card, location: List[Card], location_desc: str) -> None:
+    def __init__(self, card: Card, location: CardPile, location_desc: str) -> None:
         self.card: Card = card
-        self.location: List[Card] = location
+        self.location: CardPile = location
         self.location_desc: str = location_desc
-    
-    def remove_from_location(self):
-        safe_cards = [card for card in self.location if card.id != self.card.id]
-        self.location.clear()
-        for card in safe_cards:
-            self.location.append(card)
+
+    def is_available(self) -> bool:
+        '''Checks card is still where it was offered from'''
+        return self.card.id in self.location
+
+    def remove_from_location(self) -> Card:
+        '''Removes card from its location. Raises KeyError if card already left it.'''
+        return self.location.pop(self.card.id)
     
     def to_dict(self):
         return {"card": self.card.to_dict(), 'location': self.location_desc}
 
 class Trade:
     '''Represents a trade between two players'''
-    def __init__(self, p1: Player, p2: Player, p1_trades: List[TradingCard], wants: List[str]) -> None:
-        self.id: str = str(uuid.uuid4())[:6] 
+    def __init__(self, p1: Player, p2: Player, p1_trades: List[TradingCard], wants: List[str],
+                 trade_id: Optional[str] = None) -> None:
+        self.id: str = trade_id or str(uuid.uuid4())[:6]
         self.p1: Player = p1
         self.p2: Player = p2
         self.p1_trades: List[TradingCard] = p1_trades
@@ -30,17 +33,26 @@ class Trade:
         self.wants: List[str] = wants
 
     def accept(self, p2_trades: List[TradingCard]) -> Dict:
-        self.p2_trades = p2_trades
+        # A market card can be listed by both players, and would be taken from the market twice
+        offered: Set[str] = {tc.card.id for tc in self.p1_trades}
+        if any(tc.card.id in offered for tc in p2_trades):
+            return util.error("Cannot trade a card for itself")
         if sorted(self.wants) != sorted([tc.card.name for tc in p2_trades]):
             return util.error("Did not send cards requested")
+        unavailable: List[TradingCard] = [tc for tc in self.p1_trades + p2_trades if not tc.is_available()]
+        if unavailable:
+            return util.error("{} is no longer in {}".format(unavailable[0].card.name, unavailable[0].location_desc))
+        self.p2_trades = p2_trades
         # Add cards to temporary pending
         p1_pending: List[Card] = [tc.card for tc in self.p2_trades]
         p2_pending: List[Card] = [tc.card for tc in self.p1_trades]
         # Remove cards from location
         [tc.remove_from_location() for tc in self.p1_trades + self.p2_trades]
         # Add cards to actual pending
-        self.p1.pending_cards += p1_pending
-        self.p2.pending_cards += p2_pending
+        self.p1.pending_cards.extend(p1_pending)
+        self.p2.pending_cards.extend(p2_pending)
+        for player in (self.p1, self.p2):
+            player.changes.update(('hand', 'pending_cards'))
         return util.success("Successfully traded cards")
     
     def to_public_dict(self) -> Dict:
@@ -10,7 +10,7 @@ def shrink(lst: List):
 
 
 def get_player(game, token: str):
-    return shrink([player for player in game.players if player.token == token])
+    return game.get_player(token)
 
 
 def get_game(game_id: str, games: Dict):
@@ -0,0 +1,61 @@
+'''
+Micro-benchmark for request authorization.
+
+Compares the token index used by check_valid_request against the linear scan it
+replaced, as the number of games and players per game grows.
+
+Usage: python bench/bench_auth.py
+'''
+import os
+import sys
+from typing import Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+
+from game import Game  # noqa: E402
+from player import Player  # noqa: E402
+import constants  # noqa: E402
+from timing import per_call  # noqa: E402
+
+ITERATIONS: int = 20000
+
+
+def build_games(game_count: int, player_count: int) -> Dict[str, Game]:
+    games: Dict[str, Game] = {}
+    for _ in range(game_count):
+        game = Game('private')
+        for i in range(player_count):
+            game.add_player(Player('player{}'.format(i)))
+        games[game.id] = game
+    return games
+
+
+def time_lookup(games: Dict[str, Game], indexed: bool) -> float:
+    '''Returns microseconds per authorization of the last player of the last game'''
+    game_id: str = list(games)[-1]
+    token: str = games[game_id].players[-1].token
+
+    def scan():
+        game = games[game_id]
+        return [player for player in game.players if player.token == token][0]
+
+    def index():
+        return games[game_id].get_player(token)
+
+    return per_call(index if indexed else scan, ITERATIONS) * 1e6
+
+
+def run() -> Dict[str, float]:
+    results: Dict[str, float] = {}
+    for game_count in (1, 100, 1000):
+        for player_count in (1, constants.MAX_PLAYERS):
+            games = build_games(game_count, player_count)
+            for indexed in (False, True):
+                key = 'auth.{}.games{}.players{}_us'.format('index' if indexed else 'scan', game_count, player_count)
+                results[key] = time_lookup(games, indexed)
+    return results
+
+
+if __name__ == '__main__':
+    for name, value in run().items():
+        print('{:<40} {:>8.3f}'.format(name, value))
@@ -0,0 +1,86 @@
+'''
+Broadcast cost per move for each player count (2 to constants.MAX_PLAYERS): building and
+encoding every player's update after a move, through
+- diff: retrieve_game for each player diffed against their last view with jsonpatch.make_patch,
+  the way updates were built before change tracking
+- patches: Game.collect_patches encoded with serializer.encode_patches, as the servers do now
+- coalesced: the same, but once per BURST moves or when the turn passes, as when
+  TBG_UPDATE_WINDOW_MS merges the updates of moves in quick succession (see app/coalescing.py)
+
+Both play the same seeded games with random moves and only the broadcast is timed.
+
+Usage: python bench/bench_broadcast.py
+'''
+import os
+import random
+import sys
+import time
+from typing import Dict, List
+
+import jsonpatch
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tests'))
+
+from game import Game  # noqa: E402
+from player import Player  # noqa: E402
+from coalescing import Coalescer  # noqa: E402
+import constants  # noqa: E402
+from play import random_move  # noqa: E402
+import serializer  # noqa: E402
+from timing import REPEAT  # noqa: E402
+
+MOVES: int = 300
+# Moves merged into one update when coalescing
+BURST: int = 4
+
+
+def broadcast_seconds(player_count: int, mode: str) -> float:
+    '''Plays a seeded game and returns the seconds spent broadcasting each move'''
+    rng = random.Random(player_count)
+    game = Game('public', seed=player_count)
+    for i in range(player_count):
+        game.add_player(Player('player{}'.format(i)))
+    game.start_game(game.players[0])
+    last: List[Dict] = [game.retrieve_game(player) for player in game.players]
+    game.collect_patches()
+    elapsed: float = 0.0
+    moves: int = 0
+    turn = Coalescer.turn(game)
+    while game.status == 'Running' and moves < MOVES:
+        moves += 1
+        random_move(game, rng, leaving=False)
+        start: float = time.process_time()
+        if mode == 'coalesced':
+            if Coalescer.turn(game) != turn or moves % BURST == 0 or game.status != 'Running':
+                turn = Coalescer.turn(game)
+                serializer.encode_patches(game.collect_patches())
+        elif mode == 'diff':
+            for index, player in enumerate(game.players):
+                update: Dict = game.retrieve_game(player)
+                try:
+                    jsonpatch.make_patch(last[index], update).to_string()
+                except IndexError:
+                    # jsonpatch 1.16 fails to diff some changes to lists
+                    pass
+                last[index] = update
+        else:
+            serializer.encode_patches(game.collect_patches())
+        elapsed += time.process_time() - start
+    return elapsed / moves
+
+
+def run() -> Dict[str, float]:
+    results: Dict[str, float] = {}
+    for player_count in range(2, constants.MAX_PLAYERS + 1):
+        for mode in ('diff', 'patches', 'coalesced'):
+            key: str = 'broadcast.{}.players{}_us'.format(mode, player_count)
+            # Every play is of the same seeded game, so take the best of several but for the slow reference
+            plays: int = 1 if mode == 'diff' else REPEAT
+            results[key] = min(broadcast_seconds(player_count, mode) for _ in range(plays)) * 1e6
+    return results
+
+
+if __name__ == '__main__':
+    for name, value in run().items():
+        print('{:<32} {:>10.1f}'.format(name, value))
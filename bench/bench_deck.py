@@ -0,0 +1,50 @@
+'''
+Times building, shuffling and drawing from a full deck.
+
+Usage: python bench/bench_deck.py
+'''
+import os
+import random
+import sys
+from typing import Dict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+
+from card import Deck  # noqa: E402
+from timing import REPEAT, per_call  # noqa: E402
+
+ITERATIONS: int = 2000
+DRAW_DECKS: int = 500
+
+
+def build() -> Deck:
+    deck = Deck()
+    deck.build_deck(random.Random(0))
+    return deck
+
+
+def draw_all(deck: Deck) -> int:
+    '''Draws every card of deck and returns how many were drawn'''
+    count: int = deck.get_length()
+    for _ in range(count):
+        deck.pop()
+    return count
+
+
+def run() -> Dict[str, float]:
+    rng = random.Random(0)
+    deck: Deck = build()
+    card_count: int = deck.get_length()
+    # Each timing of the draws empties DRAW_DECKS decks
+    decks = [build() for _ in range(DRAW_DECKS * REPEAT)]
+    draw_seconds: float = per_call(lambda: draw_all(decks.pop()), DRAW_DECKS)
+    return {
+        'deck.build_us': per_call(build, ITERATIONS) * 1e6,
+        'deck.shuffle_us': per_call(lambda: deck.shuffle(rng), ITERATIONS) * 1e6,
+        'deck.draw_card_us': draw_seconds / card_count * 1e6
+    }
+
+
+if __name__ == '__main__':
+    for name, value in run().items():
+        print('{:<20} {:>8.2f}'.format(name, value))
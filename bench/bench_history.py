@@ -0,0 +1,82 @@
+'''
+Checks and times the update history used to resume socket sessions (app/history.py).
+
+Plays a seeded game, recording every update through lobby.client_updates, then checks that
+the patches replayed for every view the history still covers bring it up to date, and that
+older or unknown versions fall back to the full view. Reports the cost of recording an
+update and of finding the patches for a gap of GAP updates, and their size against the
+full view's.
+
+Usage: python bench/bench_history.py
+'''
+import json
+import os
+import random
+import sys
+from typing import Dict, List, Optional, Tuple
+
+import jsonpatch
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tests'))
+
+from config import UPDATE_HISTORY  # noqa: E402
+from game import Game  # noqa: E402
+from history import UpdateHistory  # noqa: E402
+from player import Player  # noqa: E402
+import constants  # noqa: E402
+import lobby  # noqa: E402
+from play import random_move  # noqa: E402
+import serializer  # noqa: E402
+from timing import per_call  # noqa: E402
+
+MOVES: int = 400
+GAP: int = 10
+ITERATIONS: int = 10000
+
+
+def run() -> Dict[str, float]:
+    rng = random.Random(0)
+    game = Game('public', seed=0)
+    for i in range(constants.MAX_PLAYERS):
+        game.add_player(Player('player{}'.format(i)))
+    game.start_game(game.players[0])
+    player: Player = game.players[0]
+    # View of player at each update version
+    views: Dict[int, Dict] = {}
+    for _ in range(MOVES):
+        random_move(game, rng, leaving=False)
+        lobby.client_updates(game)
+        views[game.update_version] = json.loads(serializer.encode_view(game, player))
+
+    history: UpdateHistory = lobby.histories[game.id]
+    versions: List[int] = sorted(views)
+    current: int = versions[-1]
+    for version in versions:
+        patches: Optional[List[str]] = lobby.missed_updates(game, player, version)
+        if version < history.floor:
+            assert patches is None, version
+            continue
+        assert patches is not None, version
+        view: Dict = views[version]
+        for patch in patches:
+            view = jsonpatch.apply_patch(view, json.loads(patch))
+        assert view == views[current], version
+    assert lobby.missed_updates(game, player, current + 1) is None
+
+    private: List[Tuple[str, str]] = [(other.token, '[]') for other in game.players]
+    add_history = UpdateHistory(UPDATE_HISTORY, 0)
+    gap_version: int = versions[-1 - GAP]
+    replay: List[str] = history.since(gap_version, player.token, current)
+    return {
+        'history.add_us': per_call(lambda: add_history.add(0, '[]', private), ITERATIONS) * 1e6,
+        'history.since.gap{}_us'.format(GAP): per_call(
+            lambda: history.since(gap_version, player.token, current), ITERATIONS) * 1e6,
+        'history.replay.gap{}_bytes'.format(GAP): sum(len(patch) for patch in replay),
+        'history.full_view_bytes': len(serializer.encode_view(game, player))
+    }
+
+
+if __name__ == '__main__':
+    for name, value in run().items():
+        print('{:<32} {:>10.2f}'.format(name, value))
@@ -0,0 +1,65 @@
+'''
+Overhead benchmark for the move journal (app/journal.py). Recovery is checked by
+tests/test_journal.py.
+
+Reports moves per second of games played with and without journaling, and the cost of
+journaling one move, timed on its own as the gap between the two rates is within their
+noise.
+
+Usage: python bench/bench_journal.py
+'''
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Dict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+
+from game import Game  # noqa: E402
+from journal import Journal  # noqa: E402
+from player import Player  # noqa: E402
+from simulator import play_game  # noqa: E402
+from timing import per_call  # noqa: E402
+
+GAME_COUNT: int = 100
+# Rounds of playing GAME_COUNT games, alternating with and without journaling, to take the best of
+ROUNDS: int = 3
+ITERATIONS: int = 100000
+
+
+def moves_per_second(journal: Journal = None) -> float:
+    def prepare(game: Game) -> None:
+        journal.record_created(game)
+        game.recorder = journal.record
+    start: float = time.process_time()
+    moves: int = sum(play_game(['greedy'] * 4, seed, prepare if journal else None)['moves']
+                     for seed in range(GAME_COUNT))
+    return moves / (time.process_time() - start)
+
+
+def run() -> Dict[str, float]:
+    random.seed(0)
+    plain: float = 0.0
+    journaled: float = 0.0
+    with tempfile.TemporaryDirectory() as directory:
+        journal = Journal(directory)
+        for _ in range(ROUNDS):
+            plain = max(plain, moves_per_second())
+            journaled = max(journaled, moves_per_second(journal))
+        game = Game('public', seed=0)
+        game.add_player(Player('player0'))
+        player: Player = game.players[0]
+        record_seconds: float = per_call(lambda: journal.record(game, 'hand_to_field', (player, 0)), ITERATIONS)
+        journal.close()
+    return {
+        'journal.plain_moves_per_second': plain,
+        'journal.journaled_moves_per_second': journaled,
+        'journal.record_us': record_seconds * 1e6
+    }
+
+
+if __name__ == '__main__':
+    for name, value in run().items():
+        print('{:<36} {:>10.1f}'.format(name, value))
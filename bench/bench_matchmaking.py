@@ -0,0 +1,67 @@
+'''
+Checks and times public game matchmaking (app/matchmaking.py) against the linear scan for
+the first public game it replaced, as the number of games grows.
+
+Usage: python bench/bench_matchmaking.py
+'''
+import os
+import random
+import sys
+from typing import Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+
+from game import Game  # noqa: E402
+from matchmaking import Matchmaker  # noqa: E402
+from player import Player  # noqa: E402
+import constants  # noqa: E402
+from timing import per_call  # noqa: E402
+
+ITERATIONS: int = 10000
+
+
+def build_games(game_count: int) -> List[Game]:
+    '''Games of every type, status and fill level, joinable public ones last'''
+    rng = random.Random(game_count)
+    games: List[Game] = []
+    for i in range(game_count):
+        game = Game(rng.choice(('public', 'private')), new_deck=False, seed=i)
+        game.id = '{:06x}'.format(i)
+        for j in range(rng.randint(1, constants.MAX_PLAYERS)):
+            game.add_player(Player('player{}'.format(j)))
+        game.status = 'Running' if i < game_count * 9 // 10 else 'Awaiting'
+        games.append(game)
+    return games
+
+
+def run() -> Dict[str, float]:
+    results: Dict[str, float] = {}
+    for game_count in (100, 10000):
+        games: List[Game] = build_games(game_count)
+        matchmaker = Matchmaker()
+        for game in games:
+            matchmaker.update(game)
+        joinable: List[Game] = [game for game in games if Matchmaker.is_joinable(game)]
+        assert len(matchmaker) == len(joinable)
+        best: Game = matchmaker.find()
+        assert best in joinable and len(best.players) == max(len(game.players) for game in joinable)
+
+        def scan() -> Game:
+            return next(game for game in games if Matchmaker.is_joinable(game))
+
+        def update() -> None:
+            game: Game = joinable[0]
+            game.status = 'Running'
+            matchmaker.update(game)
+            game.status = 'Awaiting'
+            matchmaker.update(game)
+
+        for name, f in (('scan', scan), ('find', matchmaker.find), ('update', update)):
+            key: str = 'matchmaking.{}.games{}_us'.format(name, game_count)
+            results[key] = per_call(f, ITERATIONS) * 1e6
+    return results
+
+
+if __name__ == '__main__':
+    for name, value in run().items():
+        print('{:<36} {:>8.2f}'.format(name, value))
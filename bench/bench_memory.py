@@ -0,0 +1,88 @@
+'''
+Reports memory used per game, measured with tracemalloc over a batch of new games
+with constants.MAX_PLAYERS players each, before and after dealing.
+
+Also measures the cards of one game, a full deck, in the catalog layout (card.py: a slotted
+Card holding its CardType and id) and in the layout it replaced, where every card held its
+own name, count, values, image and id in an instance dict. The game totals for the replaced
+layout are the measured totals with the difference between the two decks added.
+
+Usage: python bench/bench_memory.py [game_count]
+'''
+import gc
+import os
+import random
+import sys
+import tracemalloc
+import uuid
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+
+from card import Deck  # noqa: E402
+from game import Game  # noqa: E402
+from player import Player  # noqa: E402
+import constants  # noqa: E402
+
+
+class PerCardCopy:
+    '''Card in the layout before the catalog, with its type's fields copied into every card'''
+
+    def __init__(self, name: str, count: int, values: tuple, img_src: str) -> None:
+        self.name: str = name
+        self.count: int = count
+        self.values: tuple = values
+        self.img_src: str = img_src
+        self.id: str = str(uuid.uuid4())[:6]
+
+
+def build_game(started: bool) -> Game:
+    game = Game('public')
+    for i in range(constants.MAX_PLAYERS):
+        game.add_player(Player('player{}'.format(i)))
+    if started:
+        game.start_game(game.players[0])
+    return game
+
+
+def build_catalog_deck() -> List[Any]:
+    deck = Deck()
+    deck.build_deck(random.Random(0))
+    return deck.cards
+
+
+def build_copied_deck() -> List[Any]:
+    return [PerCardCopy(*card_type) for card_type in constants.CARD_TYPES for _ in range(card_type[1])]
+
+
+def bytes_each(build: Callable[[], Any], count: int) -> float:
+    '''Returns the memory held by each of count objects made by build'''
+    gc.collect()
+    tracemalloc.start()
+    before: int = tracemalloc.get_traced_memory()[0]
+    built: List[Any] = [build() for _ in range(count)]
+    after: int = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del built
+    return (after - before) / count
+
+
+def run(game_count: int = 200) -> Dict[str, float]:
+    new: float = bytes_each(lambda: build_game(False), game_count)
+    started: float = bytes_each(lambda: build_game(True), game_count)
+    catalog: float = bytes_each(build_catalog_deck, game_count)
+    copied: float = bytes_each(build_copied_deck, game_count)
+    return {
+        'memory.game.new': new,
+        'memory.game.started': started,
+        'memory.cards.catalog': catalog,
+        'memory.cards.per_card_copy': copied,
+        'memory.game.new.per_card_copy': new + copied - catalog,
+        'memory.game.started.per_card_copy': started + copied - catalog
+    }
+
+
+if __name__ == '__main__':
+    count: int = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    for name, size in run(count).items():
+        print('{:<36} {:>10,.0f} bytes/game'.format(name, size))
@@ -0,0 +1,47 @@
+'''
+Times Field.get_trade_value's table lookup against the original range based payout rules
+(tests/test_payouts.py checks the two agree).
+
+Usage: python bench/bench_payouts.py
+'''
+import os
+import sys
+from typing import Dict, List, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+
+from card import CARD_CATALOG, Card, Field  # noqa: E402
+import constants  # noqa: E402
+from timing import per_call  # noqa: E402
+
+ITERATIONS: int = 100000
+
+
+def range_payout(values: tuple, size: int) -> int:
+    '''Payout rules as originally written in Field.get_trade_value'''
+    value_ranges: Tuple[List[int], ...] = (
+        list(range(values[0], values[1])),
+        list(range(values[1], values[2])),
+        list(range(values[2], values[3])),
+        list(range(values[3], constants.MAX_CARDS))
+    )
+    for value, value_range in enumerate(value_ranges):
+        if size in value_range:
+            return value + 1
+    return 0
+
+
+def run() -> Dict[str, float]:
+    field = Field(True)
+    for _ in range(5):
+        field.add_card(Card(CARD_CATALOG[-1]))
+    values: tuple = CARD_CATALOG[-1].values
+    return {
+        'field.get_trade_value_us': per_call(field.get_trade_value, ITERATIONS) * 1e6,
+        'field.get_trade_value.ranges_us': per_call(lambda: range_payout(values, 5), ITERATIONS) * 1e6
+    }
+
+
+if __name__ == '__main__':
+    for name, value in run().items():
+        print('{:<32} {:>8.3f}'.format(name, value))
@@ -0,0 +1,82 @@
+'''
+Benchmark of broadcast encoding for a full game (constants.MAX_PLAYERS players).
+
+For each available JSON encoder it reports how many per-player payloads per second
+can be produced for:
+- update: one move's patches through serializer.encode_patches (shared ops encoded once)
+- full: every player's full view through serializer.encode_view, and through
+  dumps(retrieve_game) per player as the unshared reference
+
+Usage: python bench/bench_serialize.py
+'''
+import os
+import sys
+import time
+from typing import Dict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+
+from game import Game  # noqa: E402
+from player import Player  # noqa: E402
+import constants  # noqa: E402
+import serializer  # noqa: E402
+
+ITERATIONS: int = 2000
+
+
+def build_game() -> Game:
+    game = Game('public', seed=0)
+    for i in range(constants.MAX_PLAYERS):
+        game.add_player(Player('player{}'.format(i)))
+    game.start_game(game.players[0])
+    game.hand_to_field(game.players[0], 0)
+    game.deck_to_market(game.players[0])
+    game.collect_patches()
+    return game
+
+
+def touch(game: Game) -> None:
+    '''Marks the state a typical move changes, without running out of cards'''
+    game.version += 1
+    game.changes.update(('market', 'stage', 'deck_count'))
+    player: Player = game.players[game.current_player_index]
+    player.changes.add('hand')
+    player.fields[0].changed = True
+
+
+def per_second(count: int, start: float) -> float:
+    return count / (time.process_time() - start)
+
+
+def run() -> Dict[str, float]:
+    results: Dict[str, float] = {}
+    game = build_game()
+    payloads: int = ITERATIONS * len(game.players)
+    for name in sorted(serializer.ENCODERS):
+        serializer.use(name)
+
+        start = time.process_time()
+        for _ in range(ITERATIONS):
+            touch(game)
+            serializer.encode_patches(game.collect_patches())
+        results['emit.update.{}.per_second'.format(name)] = per_second(payloads, start)
+
+        start = time.process_time()
+        for _ in range(ITERATIONS):
+            game.version += 1
+            for player in game.players:
+                serializer.encode_view(game, player)
+        results['emit.full.shared.{}.per_second'.format(name)] = per_second(payloads, start)
+
+        start = time.process_time()
+        for _ in range(ITERATIONS):
+            game.version += 1
+            for player in game.players:
+                serializer.dumps(game.retrieve_game(player))
+        results['emit.full.unshared.{}.per_second'.format(name)] = per_second(payloads, start)
+    return results
+
+
+if __name__ == '__main__':
+    for name, rate in run().items():
+        print('{:<32} {:>12,.0f} payloads/s'.format(name, rate))
@@ -0,0 +1,189 @@
+'''
+End-to-end latency through the Flask-SocketIO server (app/TBG.py), run in process with the
+Flask and flask_socketio test clients, for a game of constants.MAX_PLAYERS players:
+- rest: each move and game view request of games played over the REST API
+- turn: whole turns played one request per move, and as one request to the batch moves route
+- fanout: the CPU time of sending one move's updates to the game's and every player's
+  Socket.IO room, and the bytes of patches emitted for it
+
+Importing TBG applies gevent's monkey patching, so run this in its own process. Requests
+are made through the test clients of the Flask and Flask-SocketIO versions in
+requirements.txt.
+
+Usage: python bench/bench_server.py
+'''
+import json
+import os
+import random
+import sys
+import time
+from typing import Dict, List, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+
+import TBG  # noqa: E402
+from game import Game  # noqa: E402
+from player import Player  # noqa: E402
+from simulator import GreedyBot  # noqa: E402
+import constants  # noqa: E402
+import lobby  # noqa: E402
+import metrics  # noqa: E402
+import moves  # noqa: E402
+import snapshot  # noqa: E402
+
+GAME_COUNT: int = 5
+FANOUT_MOVES: int = 200
+# Games the fanout is timed in, taking the best
+FANOUT_GAMES: int = 5
+
+
+def next_move(game: Game, bot: GreedyBot) -> Tuple[Player, str, Dict]:
+    '''Returns the current player's next move with its parameters'''
+    player: Player = game.players[game.current_player_index]
+    if game.stage_index in (0, 1) and player.hand:
+        return player, 'play/hand', {'field_index': bot.choose_field(player, player.hand.first())}
+    if game.stage_index in (0, 1, 2):
+        return player, 'draw/market', {}
+    if game.market:
+        card = game.market.first()
+        return player, 'play/market', {'field_index': bot.choose_field(player, card), 'card_id': card.id}
+    return player, 'draw/hand', {}
+
+
+def post(client, url: str, data: Dict):
+    '''Posts data as JSON, which Flask 0.12's test client has no argument for'''
+    return client.post(url, data=json.dumps(data), content_type='application/json')
+
+
+def response_json(response) -> Dict:
+    return json.loads(response.get_data(as_text=True))
+
+
+def start_game() -> Tuple[Game, Dict[str, object]]:
+    '''Creates and starts a game over the API, returning it and a test client per player name'''
+    clients: Dict[str, object] = {}
+    names: List[str] = ['player{}'.format(i) for i in range(constants.MAX_PLAYERS)]
+    clients[names[0]] = TBG.app.test_client()
+    response = post(clients[names[0]], '/api/create', {'name': names[0], 'game_type': 'private'})
+    game_id: str = response_json(response)['game']
+    for name in names[1:]:
+        clients[name] = TBG.app.test_client()
+        post(clients[name], '/api/login', {'name': name, 'game': game_id})
+    post(clients[names[0]], '/api/game/{}/start'.format(game_id), {})
+    return lobby.store.get(game_id), clients
+
+
+def percentile(values: List[float], p: int) -> float:
+    return sorted(values)[min(len(values) - 1, len(values) * p // 100)]
+
+
+def rest_latencies() -> Tuple[List[float], List[float]]:
+    '''Plays games over the API and returns the seconds taken by each move and view request'''
+    move_times: List[float] = []
+    view_times: List[float] = []
+    bot = GreedyBot(random.Random(0))
+    for _ in range(GAME_COUNT):
+        game, clients = start_game()
+        base: str = '/api/game/{}'.format(game.id)
+        while game.status == 'Running':
+            player, move, data = next_move(game, bot)
+            client = clients[player.name]
+            start: float = time.perf_counter()
+            response = post(client, '{}/{}'.format(base, move), data)
+            move_times.append(time.perf_counter() - start)
+            assert response.status_code == 200, response_json(response)
+            start = time.perf_counter()
+            client.get(base)
+            view_times.append(time.perf_counter() - start)
+    return move_times, view_times
+
+
+def plan_turn(game: Game, bot: GreedyBot) -> List[Dict]:
+    '''Returns the current player's moves for the rest of their turn, found by playing it on a copy of game'''
+    copy: Game = snapshot.loads(snapshot.dumps(game))
+    current: int = copy.current_player_index
+    batch: List[Dict] = []
+    while copy.status == 'Running' and copy.current_player_index == current:
+        player, move, data = next_move(copy, bot)
+        assert not moves.apply_move(copy, player, move, data).get('error')
+        batch.append(dict(data, move=move))
+    return batch
+
+
+def turn_latencies() -> Tuple[float, float]:
+    '''Returns the mean seconds a turn takes played one request per move, then as one batch request'''
+    bot = GreedyBot(random.Random(0))
+    seconds: List[float] = [0.0, 0.0]
+    turns: List[int] = [0, 0]
+    for batched in (False, True):
+        for _ in range(GAME_COUNT):
+            game, clients = start_game()
+            base: str = '/api/game/{}'.format(game.id)
+            while game.status == 'Running':
+                client = clients[game.players[game.current_player_index].name]
+                batch: List[Dict] = plan_turn(game, bot)
+                start: float = time.perf_counter()
+                if batched:
+                    response = post(client, base + '/moves', {'moves': batch})
+                    assert response.status_code == 200, response_json(response)
+                else:
+                    for data in batch:
+                        response = post(client, '{}/{}'.format(base, data['move']), data)
+                        assert response.status_code == 200, response_json(response)
+                seconds[batched] += time.perf_counter() - start
+                turns[batched] += 1
+    return seconds[0] / turns[0], seconds[1] / turns[1]
+
+
+def fanout_latency() -> Tuple[float, float]:
+    '''Returns the seconds taken to send one move's updates to every player's socket, and the bytes emitted'''
+    game, _ = start_game()
+    # Handle events inline, as python-socketio 4 otherwise hands them to greenlets that
+    # haven't run by the time the test client reads its replies
+    TBG.socketio.server.async_handlers = False
+    sockets = []
+    for player in game.players:
+        socket = TBG.socketio.test_client(TBG.app)
+        socket.emit('login', {'game': game.id, 'token': player.token})
+        socket.get_received()
+        sockets.append(socket)
+    bot = GreedyBot(random.Random(0))
+    elapsed: float = 0.0
+    count: int = 0
+    patch_bytes: float = metrics.patch_bytes.series.get((), [0])[-1]
+    while game.status == 'Running' and count < FANOUT_MOVES:
+        player, move, data = next_move(game, bot)
+        with game.lock:
+            moves.apply_move(game, player, move, data)
+            start: float = time.process_time()
+            TBG.update_client(game)
+            elapsed += time.process_time() - start
+        count += 1
+        for socket in sockets:
+            # The game room's update, then the player's own if they have private changes
+            assert [message['name'] for message in socket.get_received()] in (['client update'], ['client update'] * 2)
+    for socket in sockets:
+        socket.disconnect()
+    return elapsed / count, (metrics.patch_bytes.series.get((), [0])[-1] - patch_bytes) / count
+
+
+def run() -> Dict[str, float]:
+    move_times, view_times = rest_latencies()
+    turn_time, batch_turn_time = turn_latencies()
+    fanouts: List[Tuple[float, float]] = [fanout_latency() for _ in range(FANOUT_GAMES)]
+    fanout_time: float = min(seconds for seconds, _ in fanouts)
+    fanout_bytes: float = sum(patch_bytes for _, patch_bytes in fanouts) / FANOUT_GAMES
+    return {
+        'server.rest_move_ms': sum(move_times) / len(move_times) * 1e3,
+        'server.rest_move_p95_ms': percentile(move_times, 95) * 1e3,
+        'server.rest_view_ms': sum(view_times) / len(view_times) * 1e3,
+        'server.rest_turn_ms': turn_time * 1e3,
+        'server.batch_turn_ms': batch_turn_time * 1e3,
+        'server.socket_fanout_us': fanout_time * 1e6,
+        'server.socket_fanout_bytes': fanout_bytes
+    }
+
+
+if __name__ == '__main__':
+    for name, value in run().items():
+        print('{:<28} {:>8.2f}'.format(name, value))
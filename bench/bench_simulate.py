@@ -0,0 +1,28 @@
+'''
+Plays complete games through the Game engine with greedy bots (app/simulator.py) in a
+single process and reports moves and games per second.
+
+Usage: python bench/bench_simulate.py [game_count] [player_count]
+'''
+import os
+import sys
+from typing import Dict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+
+import simulator  # noqa: E402
+
+
+def run(game_count: int = 200, player_count: int = 4) -> Dict[str, float]:
+    stats: Dict = simulator.simulate(game_count, ['greedy'] * player_count)
+    return {
+        'simulate.moves_per_second': stats['moves_per_second'],
+        'simulate.games_per_second': stats['games_per_second']
+    }
+
+
+if __name__ == '__main__':
+    games: int = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    players: int = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    for name, rate in run(games, players).items():
+        print('{:<28} {:>10,.0f}'.format(name, rate))
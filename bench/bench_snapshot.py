@@ -0,0 +1,52 @@
+'''
+Size/speed benchmark for game snapshots (app/snapshot.py): reports snapshot size and
+encode/decode time of a game played with random moves, against pickle. tests/test_snapshot.py
+checks the round trips.
+
+Usage: python bench/bench_snapshot.py
+'''
+import os
+import pickle
+import random
+import sys
+from typing import Dict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tests'))
+
+from game import Game  # noqa: E402
+import constants  # noqa: E402
+from play import new_game, random_move  # noqa: E402
+import snapshot  # noqa: E402
+from timing import per_call  # noqa: E402
+
+ITERATIONS: int = 2000
+
+
+def build_game(player_count: int, moves: int) -> Game:
+    rng = random.Random(player_count)
+    game: Game = new_game(rng, player_count)
+    for _ in range(moves):
+        if game.status != 'Running':
+            break
+        random_move(game, rng, leaving=False)
+    return game
+
+
+def run() -> Dict[str, float]:
+    game: Game = build_game(constants.MAX_PLAYERS, 100)
+    data: bytes = snapshot.dumps(game)
+    pickled: bytes = pickle.dumps(game)
+    return {
+        'snapshot.bytes': len(data),
+        'snapshot.dumps_us': per_call(lambda: snapshot.dumps(game), ITERATIONS) * 1e6,
+        'snapshot.loads_us': per_call(lambda: snapshot.loads(data), ITERATIONS) * 1e6,
+        'pickle.bytes': len(pickled),
+        'pickle.dumps_us': per_call(lambda: pickle.dumps(game), ITERATIONS) * 1e6,
+        'pickle.loads_us': per_call(lambda: pickle.loads(pickled), ITERATIONS) * 1e6
+    }
+
+
+if __name__ == '__main__':
+    for name, value in run().items():
+        print('{:<20} {:>10.1f}'.format(name, value))
@@ -0,0 +1,179 @@
+'''
+Load test comparing the Flask-SocketIO server (app/TBG.py) with the ASGI server
+(app/asgi_server.py). For each mode it starts the server, opens a Socket.IO connection per
+player, then plays games concurrently over the REST API for a fixed duration.
+
+Reports the socket connections held at the end of the run and moves per second.
+
+Usage: python bench/load_test.py [--mode flask|asgi|both] [--games 20] [--players 4] [--duration 10]
+Requires aiohttp and python-socketio's asyncio client.
+'''
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+import aiohttp
+import socketio
+from yarl import URL
+
+ROOT: str = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+SERVERS: Dict[str, str] = {
+    'flask': os.path.join(ROOT, 'app', 'TBG.py'),
+    'asgi': os.path.join(ROOT, 'app', 'asgi_server.py')
+}
+
+
+class Client:
+    '''One player: an HTTP session holding the token cookie and a Socket.IO connection'''
+
+    def __init__(self, url: str, name: str) -> None:
+        self.url: str = url
+        self.name: str = name
+        self.session = aiohttp.ClientSession(cookie_jar=aiohttp.CookieJar(unsafe=True))
+        self.sio = socketio.AsyncClient()
+        self.updates: int = 0
+        self.sio.on('client update', self.on_update)
+
+    async def on_update(self, patch: str) -> None:
+        self.updates += 1
+
+    async def post(self, path: str, data: Dict = None) -> Dict:
+        async with self.session.post(self.url + path, json=data or {}) as response:
+            return await response.json()
+
+    async def get(self, path: str) -> Dict:
+        async with self.session.get(self.url + path) as response:
+            return await response.json()
+
+    async def connect(self, game_id: str) -> None:
+        token: str = self.session.cookie_jar.filter_cookies(URL(self.url))['tbg_token'].value
+        await self.sio.connect(self.url)
+        await self.sio.emit('login', {'game': game_id, 'token': token})
+
+    async def close(self) -> None:
+        if self.sio.connected:
+            await self.sio.disconnect()
+        await self.session.close()
+
+
+def choose_field(fields: List[Dict], name: str) -> int:
+    enabled = [index for index, field in enumerate(fields) if field['enabled']]
+    for index in enabled:
+        if fields[index]['name'] == name:
+            return index
+    for index in enabled:
+        if fields[index]['name'] == 'Empty':
+            return index
+    return enabled[0]
+
+
+async def play(clients: List[Client], game_id: str, deadline: float) -> int:
+    '''Plays turns until deadline, returns number of successful moves'''
+    by_name: Dict[str, Client] = {client.name: client for client in clients}
+    base: str = '/api/game/{}'.format(game_id)
+    moves: int = 0
+    while time.perf_counter() < deadline:
+        state: Dict = await clients[0].get(base)
+        if state.get('status') != 'Running':
+            break
+        client: Client = by_name[state['current_player']]
+        state = await client.get(base)
+        info: Dict = state['player_info']
+        if info['hand'] and state['stage'] in ('First Card', 'Second Card'):
+            field: int = choose_field(info['fields'], info['hand'][0]['name'])
+            moves += 'success' in await client.post(base + '/play/hand', {'field_index': field})
+        moves += 'success' in await client.post(base + '/draw/market')
+        state = await client.get(base)
+        for card in state['market']:
+            field = choose_field(state['player_info']['fields'], card['name'])
+            result: Dict = await client.post(base + '/play/market', {'field_index': field, 'card_id': card['id']})
+            moves += 'success' in result
+            state = await client.get(base)
+        moves += 'success' in await client.post(base + '/draw/hand')
+    return moves
+
+
+async def start_game(url: str, index: int, player_count: int) -> List[Client]:
+    clients: List[Client] = [Client(url, 'g{}p{}'.format(index, i)) for i in range(player_count)]
+    game_id: str = (await clients[0].post('/api/create', {'name': clients[0].name, 'game_type': 'private'}))['game']
+    for client in clients[1:]:
+        await client.post('/api/login', {'name': client.name, 'game': game_id})
+    for client in clients:
+        await client.connect(game_id)
+    await clients[0].post('/api/game/{}/start'.format(game_id))
+    return clients
+
+
+async def run_load(url: str, game_count: int, player_count: int, duration: float) -> Dict[str, float]:
+    games: List[List[Client]] = await asyncio.gather(
+        *[start_game(url, index, player_count) for index in range(game_count)]
+    )
+    start: float = time.perf_counter()
+    deadline: float = start + duration
+    game_ids: List[str] = [(await clients[0].get('/api/access'))['game'] for clients in games]
+    moves: List[int] = await asyncio.gather(
+        *[play(clients, game_id, deadline) for clients, game_id in zip(games, game_ids)]
+    )
+    elapsed: float = time.perf_counter() - start
+    connected: int = sum(client.sio.connected for clients in games for client in clients)
+    updates: int = sum(client.updates for clients in games for client in clients)
+    for clients in games:
+        for client in clients:
+            await client.close()
+    return {
+        'connections_held': connected,
+        'moves_per_second': sum(moves) / elapsed,
+        'updates_per_second': updates / elapsed
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port: int, timeout: float = 15) -> None:
+    deadline: float = time.time() + timeout
+    while time.time() < deadline:
+        with socket.socket() as sock:
+            if sock.connect_ex(('127.0.0.1', port)) == 0:
+                return
+        time.sleep(0.1)
+    raise RuntimeError('Server did not start on port {}'.format(port))
+
+
+def run_mode(mode: str, args: argparse.Namespace) -> Dict[str, float]:
+    port: int = free_port()
+    env: Dict[str, str] = dict(os.environ, TBG_HOST='127.0.0.1', TBG_PORT=str(port))
+    server = subprocess.Popen([sys.executable, SERVERS[mode]], env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_port(port)
+        url: str = 'http://127.0.0.1:{}'.format(port)
+        return asyncio.get_event_loop().run_until_complete(
+            run_load(url, args.games, args.players, args.duration)
+        )
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--mode', choices=('flask', 'asgi', 'both'), default='both')
+    parser.add_argument('--games', type=int, default=20)
+    parser.add_argument('--players', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=10)
+    args = parser.parse_args()
+    modes: List[str] = ['flask', 'asgi'] if args.mode == 'both' else [args.mode]
+    print('{:<8} {:>18} {:>18} {:>20}'.format('mode', 'connections_held', 'moves_per_second', 'updates_per_second'))
+    for mode in modes:
+        result: Dict[str, float] = run_mode(mode, args)
+        print('{:<8} {:>18.0f} {:>18.1f} {:>20.1f}'.format(
+            mode, result['connections_held'], result['moves_per_second'], result['updates_per_second']))
@@ -0,0 +1,177 @@
+'''
+Runs the benchmark suite, writes the results as JSON and compares them with a stored
+baseline, exiting with status 1 if any result regressed by more than the tolerance.
+
+Each benchmark module's run() is called in its own process so that gevent's monkey patching
+(bench_server) and memory tracing (bench_memory) can't skew the others, and repeated to keep
+the best of each result. Result names ending in per_second are rates where higher is better;
+every other result is a cost (time or bytes) where lower is better. Times are in the unit
+their name ends with (_us or _ms), and only regress once they are also NOISE_US slower in
+absolute terms. Results timing REFERENCES are reported but never fail the run. Benchmarks
+with regressed results are rerun up to RETRIES times, keeping the best of every run, before
+the run fails.
+
+Usage: python bench/run_benchmarks.py [--output bench/results.json] [--baseline bench/baseline.json]
+                                      [--tolerance 0.25] [--repeat 3] [--update-baseline] [benchmark ...]
+'''
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, List, Optional, Tuple
+
+BENCH_DIR: str = os.path.dirname(os.path.abspath(__file__))
+BENCHMARKS: List[str] = [
+    'bench_simulate',
+    'bench_deck',
+    'bench_payouts',
+    'bench_auth',
+    'bench_broadcast',
+    'bench_serialize',
+    'bench_snapshot',
+    'bench_memory',
+    'bench_journal',
+    'bench_reaper',
+    'bench_matchmaking',
+    'bench_history',
+    'bench_server'
+]
+
+# Results timing the code an optimization replaced, kept to show the speedup. No change to
+# the server can make them regress.
+REFERENCES: Tuple[str, ...] = (
+    'auth.scan.',
+    'matchmaking.scan.',
+    'broadcast.diff.',
+    'emit.full.unshared.',
+    'field.get_trade_value.ranges',
+    'memory.cards.per_card_copy',
+    'memory.game.new.per_card_copy',
+    'memory.game.started.per_card_copy',
+    'pickle.'
+)
+# Microseconds a time may be slower than its baseline before counting as a regression. Below
+# a microsecond or so, scheduler noise alone takes a result past any relative tolerance.
+NOISE_US: float = 0.5
+UNITS_US: Dict[str, float] = {'us': 1.0, 'ms': 1e3}
+# Times the benchmarks behind regressed results are rerun. A shared machine can run a whole
+# process half again slower for a while, which no repeat within the process evens out, but
+# a real regression shows up in every run.
+RETRIES: int = 2
+
+
+def run_benchmark(name: str) -> Dict[str, float]:
+    '''Runs one benchmark module in a new process and returns its results'''
+    code: str = 'import json, {0}; print(json.dumps({0}.run()))'.format(name)
+    # A fixed hash seed lays out every run's sets and dicts alike, so runs time the same work
+    process = subprocess.run([sys.executable, '-c', code], cwd=BENCH_DIR, env=dict(os.environ, PYTHONHASHSEED='0'),
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    if process.returncode != 0:
+        raise RuntimeError('{} failed:\n{}'.format(name, process.stderr))
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+
+def is_rate(name: str) -> bool:
+    return name.endswith('per_second')
+
+
+def is_reference(name: str) -> bool:
+    return name.startswith(REFERENCES)
+
+
+def unit_us(name: str) -> Optional[float]:
+    '''Returns microseconds per unit of a time result, or None if name isn't a time'''
+    for word in reversed(name.rpartition('.')[2].split('_')):
+        if word in UNITS_US:
+            return UNITS_US[word]
+    return None
+
+
+def best(name: str, values: List[float]) -> float:
+    return max(values) if is_rate(name) else min(values)
+
+
+def regressed(name: str, value: float, baseline: float, tolerance: float) -> bool:
+    '''Checks whether value is worse than baseline by more than tolerance, and by more than noise for times'''
+    if is_reference(name) or regression(name, value, baseline) <= tolerance:
+        return False
+    unit: Optional[float] = unit_us(name)
+    return unit is None or (value - baseline) * unit > NOISE_US
+
+
+def regression(name: str, value: float, baseline: float) -> float:
+    '''Returns how much worse value is than baseline as a fraction of it (negative if better)'''
+    if not baseline:
+        return 0.0
+    change: float = (value - baseline) / baseline
+    return -change if is_rate(name) else change
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Runs the benchmarks and compares them with a baseline')
+    parser.add_argument('benchmarks', nargs='*', default=BENCHMARKS, help='benchmark modules to run')
+    parser.add_argument('--output', default=os.path.join(BENCH_DIR, 'results.json'))
+    parser.add_argument('--baseline', default=os.path.join(BENCH_DIR, 'baseline.json'))
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='fraction a result may be worse than the baseline before failing')
+    parser.add_argument('--repeat', type=int, default=3, help='runs of each benchmark to take the best of')
+    parser.add_argument('--update-baseline', action='store_true',
+                        help='store these results in the baseline, keeping results of benchmarks not run')
+    args = parser.parse_args()
+
+    runs: Dict[str, List[float]] = {}
+    # Result name -> benchmark module it comes from
+    modules: Dict[str, str] = {}
+
+    def measure(name: str) -> None:
+        print('running {}'.format(name), file=sys.stderr)
+        for _ in range(args.repeat):
+            for key, value in run_benchmark(name).items():
+                runs.setdefault(key, []).append(value)
+                modules[key] = name
+
+    for name in args.benchmarks:
+        measure(name)
+    results: Dict[str, float] = {key: best(key, values) for key, values in runs.items()}
+    baseline: Dict[str, float] = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+    for _ in range(0 if args.update_baseline else RETRIES):
+        suspects: List[str] = sorted({modules[name] for name in results if name in baseline and
+                                      regressed(name, results[name], baseline[name], args.tolerance)})
+        if not suspects:
+            break
+        for name in suspects:
+            measure(name)
+        results = {key: best(key, values) for key, values in runs.items()}
+    with open(args.output, 'w') as output:
+        json.dump(results, output, indent=2, sort_keys=True)
+    if args.update_baseline:
+        baseline.update(results)
+        with open(args.baseline, 'w') as output:
+            json.dump(baseline, output, indent=2, sort_keys=True)
+        print('baseline updated: {}'.format(args.baseline))
+        return
+    regressions: List[str] = []
+    print('{:<44} {:>14} {:>14} {:>8}'.format('result', 'baseline', 'value', 'change'))
+    for name in sorted(results):
+        expected: Optional[float] = baseline.get(name)
+        if expected is None:
+            print('{:<44} {:>14} {:>14.4g} {:>8}'.format(name, '-', results[name], 'new'))
+            continue
+        worse: float = regression(name, results[name], expected)
+        flag: str = ' reference' if is_reference(name) else ''
+        if regressed(name, results[name], expected, args.tolerance):
+            regressions.append(name)
+            flag = ' REGRESSION'
+        print('{:<44} {:>14.4g} {:>14.4g} {:>+7.0%}{}'.format(name, expected, results[name], -worse, flag))
+    if regressions:
+        print('{} results regressed more than {:.0%} against {}: {}'.format(
+            len(regressions), args.tolerance, args.baseline, ', '.join(regressions)))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+'''
+Stress test for per-game locking. Worker threads fire random moves at a few shared games
+through moves.apply_move while holding each game's lock, the way both servers do, and a
+checker thread verifies after every round that all 154 cards are still accounted for.
+
+Pass --unlocked to run the same load without taking the locks.
+
+Usage: python bench/stress_concurrency.py [--threads 16] [--games 4] [--seconds 5] [--unlocked]
+'''
+import argparse
+import contextlib
+import os
+import random
+import sys
+import threading
+import time
+from typing import Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+
+from game import Game  # noqa: E402
+from player import Player  # noqa: E402
+from moves import apply_move  # noqa: E402
+import constants  # noqa: E402
+
+TOTAL_CARDS: int = sum(card_type[1] for card_type in constants.CARD_TYPES)
+
+
+def count_cards(game: Game) -> int:
+    '''Counts cards in every location. Coins and bought fields stand for cards removed from play.'''
+    count: int = game.deck.get_length() + game.discards.get_length() + len(game.market)
+    for player in game.players:
+        count += len(player.hand) + len(player.pending_cards) + player.coins
+        count += sum(len(field.cards) for field in player.fields)
+        count += 3 if player.fields[2].enabled else 0
+    return count
+
+
+def random_move(game: Game, player: Player) -> Dict:
+    market: List[str] = [card.id for card in game.market]
+    hand: List[str] = [card.id for card in player.hand]
+    pending: List[str] = [card.id for card in player.pending_cards]
+    field_index: int = random.randint(0, 2)
+    choice: int = random.randint(0, 9)
+    if pending:
+        return apply_move(game, player, 'play/pending', {'field_index': field_index, 'card_id': pending[0]})
+    if choice < 3:
+        return apply_move(game, player, 'play/hand', {'field_index': field_index})
+    if choice == 3:
+        return apply_move(game, player, 'draw/market', {})
+    if choice == 4 and market:
+        return apply_move(game, player, 'play/market', {'field_index': field_index, 'card_id': random.choice(market)})
+    if choice == 5:
+        return apply_move(game, player, 'draw/hand', {})
+    if choice == 6:
+        other: Player = random.choice(game.players)
+        return apply_move(game, player, 'trade/create',
+                          {'other_player': other.name, 'card_ids': hand[:1] + market[:1], 'wants': []})
+    if choice == 7 and game.trades:
+        return apply_move(game, player, 'trade/accept', {'trade_id': next(iter(game.trades)), 'card_ids': []})
+    if choice == 8:
+        return apply_move(game, player, 'buy', {})
+    return {}
+
+
+def run(thread_count: int, game_count: int, seconds: float, locked: bool) -> Dict[str, int]:
+    interval: float = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    games: List[Game] = []
+    for _ in range(game_count):
+        game = Game('private')
+        for i in range(constants.MAX_PLAYERS):
+            game.add_player(Player('player{}'.format(i)))
+        game.start_game(game.players[0])
+        games.append(game)
+
+    stats: Dict[str, int] = {'moves': 0, 'errors': 0, 'exceptions': 0, 'violations': 0, 'checks': 0}
+    stop = threading.Event()
+
+    def guard(game: Game):
+        return game.lock if locked else contextlib.nullcontext()
+
+    def worker() -> None:
+        while not stop.is_set():
+            game: Game = random.choice(games)
+            with guard(game):
+                player: Player = random.choice(game.players)
+                try:
+                    result: Dict = random_move(game, player)
+                    game.collect_patches()
+                except Exception:
+                    stats['exceptions'] += 1
+                    continue
+            stats['errors' if result.get('error') else 'moves'] += 1
+
+    def checker() -> None:
+        while not stop.is_set():
+            for game in games:
+                with guard(game):
+                    if count_cards(game) != TOTAL_CARDS:
+                        stats['violations'] += 1
+                    stats['checks'] += 1
+
+    threads: List[threading.Thread] = [threading.Thread(target=worker) for _ in range(thread_count)]
+    threads.append(threading.Thread(target=checker))
+    try:
+        for thread in threads:
+            thread.start()
+        time.sleep(seconds)
+    finally:
+        stop.set()
+        for thread in threads:
+            if thread.is_alive():
+                thread.join()
+        sys.setswitchinterval(interval)
+    for game in games:
+        if count_cards(game) != TOTAL_CARDS:
+            stats['violations'] += 1
+    return stats
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Concurrent move stress test')
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--games', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--unlocked', action='store_true')
+    args = parser.parse_args()
+    stats: Dict[str, int] = run(args.threads, args.games, args.seconds, not args.unlocked)
+    print(' '.join('{}={}'.format(key, value) for key, value in stats.items()))
+    sys.exit(1 if stats['violations'] or stats['exceptions'] else 0)
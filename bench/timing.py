@@ -0,0 +1,17 @@
+'''
+Timing shared by the micro-benchmarks. One timeit run of a call taking a microsecond or
+less moves by more than the regression tolerance from run to run, whenever a garbage
+collection, a CPU frequency change or another process lands in it, so each result is the
+best of several runs. Runs are timed in CPU time of this process, which leaves out the
+time other processes hold the CPU.
+'''
+import time
+import timeit
+from typing import Callable
+
+REPEAT: int = 7
+
+
+def per_call(f: Callable[[], object], number: int, repeat: int = REPEAT) -> float:
+    '''Returns CPU seconds per call of f, the best of repeat timings of number calls'''
+    return min(timeit.repeat(f, number=number, repeat=repeat, timer=time.process_time)) / number
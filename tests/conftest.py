@@ -0,0 +1,5 @@
+'''Makes the modules in app/ importable by name, the way the servers import each other'''
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
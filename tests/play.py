@@ -0,0 +1,65 @@
+'''
+Random games for the tests and benchmarks, making every kind of move including trades and
+leaving, and the state of a game a snapshot must preserve.
+'''
+import random
+from typing import Dict, List
+
+from game import Game
+from player import Player
+from trade import Trade
+
+
+def new_game(rng: random.Random, player_count: int) -> Game:
+    '''Returns a started public game of player_count players'''
+    game = Game('public', seed=rng.getrandbits(64))
+    for i in range(player_count):
+        game.add_player(Player('player{}'.format(i)))
+    game.start_game(game.players[0])
+    return game
+
+
+def random_move(game: Game, rng: random.Random, leaving: bool = True) -> None:
+    '''Makes a random move for a random player, which the game may reject. Players only leave if leaving.'''
+    player: Player = rng.choice(game.players)
+    roll: float = rng.random()
+    trades: List[Trade] = list(game.trades.values())
+    if player.pending_cards:
+        game.pending_to_field(player, rng.randint(0, 2), player.pending_cards.first().id)
+    elif roll < 0.3 and player.hand:
+        game.hand_to_field(player, rng.randint(0, 2))
+    elif roll < 0.45:
+        game.deck_to_market(player)
+    elif roll < 0.6 and game.market:
+        game.market_to_field(player, rng.randint(0, 2), rng.choice([card.id for card in game.market]))
+    elif roll < 0.7:
+        game.deck_to_hand(player)
+    elif roll < 0.78:
+        other: Player = rng.choice([other for other in game.players if other is not player])
+        offered = [card.id for card in player.hand][:1] + [card.id for card in game.market][:1]
+        game.create_trade(player, other.name, offered, [other.hand.first().name] if other.hand else [])
+    elif roll < 0.86 and trades:
+        trade = rng.choice(trades)
+        game.accept_trade(trade.p2, trade.id, [card.id for card in trade.p2.hand if card.name in trade.wants][:1])
+    elif roll < 0.9 and trades:
+        trade = rng.choice(trades)
+        game.reject_trade(trade.p2, trade.id)
+    elif roll < 0.97 or len(game.players) <= 2 or not leaving:
+        game.buy_field(player)
+    else:
+        game.leave_game(player)
+
+
+def state(game: Game) -> Dict:
+    '''Everything a snapshot must preserve'''
+    return {
+        # A loaded game's update version is its version, as nothing since has been sent
+        'views': [dict(game.retrieve_game(player), version=None) for player in game.players],
+        'deck': [(card.name, card.id) for card in game.deck.cards],
+        'discards': [(card.name, card.id) for card in game.discards.cards],
+        'tokens': [player.token for player in game.players],
+        'trades': [(trade.id, trade.p1.name, trade.p2.name, [tc.location_desc for tc in trade.p1_trades])
+                   for trade in game.trades.values()],
+        'version': game.version,
+        'rng': (game.seed, game.rng_epoch)
+    }
@@ -0,0 +1,101 @@
+'''
+Coalescing of player updates (app/coalescing.py) on a fake call_later: moves within the window
+are merged into one update, a change of turn or status is sent at once, and forgetting a
+removed game cancels its scheduled update.
+'''
+from typing import Any, Callable, List, Tuple
+
+from coalescing import Coalescer
+from game import Game
+from player import Player
+
+
+class Scheduler:
+    '''Fake call_later that runs scheduled calls only when told to'''
+
+    def __init__(self) -> None:
+        self.calls: List[Tuple[float, Callable[[], Any]]] = []
+
+    def __call__(self, delay: float, f: Callable[[], Any]) -> None:
+        self.calls.append((delay, f))
+
+    def run(self) -> None:
+        calls, self.calls = self.calls, []
+        for _, f in calls:
+            f()
+
+
+def started_game() -> Game:
+    game = Game('public', seed=0)
+    for name in ('host', 'guest'):
+        game.add_player(Player(name))
+    game.start_game(game.players[0])
+    return game
+
+
+def coalescer(window: float = 0.05) -> Tuple[Coalescer, Scheduler, List[Game]]:
+    scheduler = Scheduler()
+    sent: List[Game] = []
+    return Coalescer(window, sent.append, scheduler), scheduler, sent
+
+
+def test_first_update_of_a_turn_is_sent_at_once() -> None:
+    updates, scheduler, sent = coalescer()
+    game: Game = started_game()
+    updates.update(game)
+    assert sent == [game] and not scheduler.calls
+
+
+def test_moves_within_window_are_merged() -> None:
+    updates, scheduler, sent = coalescer()
+    game: Game = started_game()
+    updates.update(game)
+    for _ in range(3):
+        updates.update(game)
+    assert sent == [game] and [delay for delay, _ in scheduler.calls] == [0.05]
+    scheduler.run()
+    assert sent == [game, game]
+    # The next move after the flush schedules a new update
+    updates.update(game)
+    assert len(scheduler.calls) == 1
+
+
+def test_turn_change_is_sent_at_once() -> None:
+    updates, scheduler, sent = coalescer()
+    game: Game = started_game()
+    updates.update(game)
+    updates.update(game)
+    game.current_player_index = 1
+    updates.update(game)
+    assert sent == [game, game]
+    # The scheduled update was overtaken and sends nothing
+    scheduler.run()
+    assert sent == [game, game]
+
+
+def test_status_change_is_sent_at_once() -> None:
+    updates, scheduler, sent = coalescer()
+    game: Game = started_game()
+    updates.update(game)
+    updates.update(game)
+    game.status = 'Completed'
+    updates.update(game)
+    assert sent == [game, game]
+
+
+def test_forget_cancels_scheduled_update() -> None:
+    updates, scheduler, sent = coalescer()
+    game: Game = started_game()
+    updates.update(game)
+    updates.update(game)
+    updates.forget(game)
+    scheduler.run()
+    assert sent == [game] and not updates.pending and not updates.turns
+
+
+def test_without_window_every_update_is_sent() -> None:
+    updates, scheduler, sent = coalescer(window=0)
+    game: Game = started_game()
+    for _ in range(3):
+        updates.update(game)
+    assert sent == [game] * 3 and not scheduler.calls
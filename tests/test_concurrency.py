@@ -0,0 +1,20 @@
+'''
+A short run of bench/stress_concurrency.py: threads making random moves on shared games
+under each game's lock never lose or duplicate a card, and no move raises.
+
+The stress test runs in its own process. Collecting test_servers.py imports TBG, whose
+gevent monkey patching would turn the stress test's threads into greenlets here.
+'''
+import os
+import subprocess
+import sys
+
+STRESS_TEST: str = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'bench', 'stress_concurrency.py')
+
+
+def test_locked_moves_keep_every_card() -> None:
+    completed = subprocess.run([sys.executable, STRESS_TEST, '--threads', '8', '--games', '2', '--seconds', '0.5'],
+                               stdout=subprocess.PIPE, universal_newlines=True, timeout=60)
+    stats = dict(item.split('=') for item in completed.stdout.split())
+    assert completed.returncode == 0, completed.stdout
+    assert int(stats['moves']) and int(stats['checks'])
@@ -0,0 +1,65 @@
+'''
+Crash recovery from the move journal: games played with random moves while journaled,
+checkpointed part way through, must be recovered from the journal directory equal to the
+live games.
+'''
+import random
+from typing import Dict, List
+
+import pytest
+
+from game import Game
+from journal import Journal
+from player import Player
+import play
+
+
+def new_games(journal: Journal, count: int, first_seed: int = 0) -> List[Game]:
+    '''Creates and journals count started games of 2 to 5 players'''
+    games: List[Game] = []
+    for i in range(count):
+        game = Game('public', seed=first_seed + i)
+        game.add_player(Player('player0'))
+        journal.record_created(game)
+        game.recorder = journal.record
+        for j in range(1, 2 + i % 4):
+            game.add_player(Player('player{}'.format(j)))
+        game.start_game(game.players[0])
+        games.append(game)
+    return games
+
+
+def check_recovered(directory: str, games: List[Game]) -> None:
+    recovered: Dict[str, Game] = Journal(directory).recover()
+    assert sorted(recovered) == sorted(game.id for game in games)
+    for game in games:
+        assert play.state(recovered[game.id]) == play.state(game), game.id
+
+
+@pytest.mark.parametrize('checkpoint_at', [None, 0, 200])
+def test_recovers_games(tmp_path, checkpoint_at) -> None:
+    rng = random.Random(0)
+    journal = Journal(str(tmp_path))
+    games: List[Game] = new_games(journal, 20)
+    for move in range(400):
+        if move == checkpoint_at:
+            journal.checkpoint(lambda: games)
+        for game in games:
+            if game.status == 'Running':
+                play.random_move(game, rng)
+    journal.record_removed(games.pop())
+    journal.close()
+    check_recovered(str(tmp_path), games)
+
+
+def test_checkpoint_keeps_games_created_while_listing(tmp_path) -> None:
+    journal = Journal(str(tmp_path))
+    games: List[Game] = new_games(journal, 2)
+
+    def list_games() -> List[Game]:
+        # A game created once the checkpoint started its segment is journaled in the new one
+        games.extend(new_games(journal, 1, first_seed=2))
+        return games[:2]
+    journal.checkpoint(list_games)
+    journal.close()
+    check_recovered(str(tmp_path), games)
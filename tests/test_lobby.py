@@ -0,0 +1,102 @@
+'''
+Requests the lobby and games must turn away with an error before anything is stored: names,
+trade wants, trade ids and card ids that aren't strings, or that are too long for a snapshot to hold.
+'''
+import pytest
+
+from game import Game
+from player import Player
+import constants
+import lobby
+import snapshot
+
+BAD_NAMES = [None, 7, ['player'], {'name': 'player'}, 'x' * (constants.MAX_NAME_LENGTH + 1), 'x' * 70000]
+
+
+@pytest.mark.parametrize('name', BAD_NAMES)
+def test_create_game_rejects_name(name) -> None:
+    games: int = len(lobby.store.games())
+    assert lobby.create_game(name, 'public').get('error')
+    assert len(lobby.store.games()) == games
+
+
+@pytest.mark.parametrize('name', BAD_NAMES)
+def test_add_player_rejects_name(name) -> None:
+    game: Game = lobby.create_game('host', 'public')['game']
+    assert lobby.add_player(game, name).get('error')
+    assert len(game.players) == 1
+
+
+@pytest.mark.parametrize('other, wants', [
+    (None, []),
+    (['guest'], []),
+    ('guest', 'Soy Bean'),
+    ('guest', [None]),
+    ('guest', [['Soy Bean']]),
+    ('guest', ['Magic Bean']),
+    ('guest', ['Soy Bean'] * (constants.MAX_WANTS + 1))
+])
+def test_create_trade_rejects(other, wants) -> None:
+    game = Game('public', seed=0)
+    for name in ('host', 'guest'):
+        game.add_player(Player(name))
+    game.start_game(game.players[0])
+    host: Player = game.players[0]
+    assert game.create_trade(host, other, [host.hand.first().id], wants).get('error')
+    assert not game.trades
+    snapshot.dumps(game)
+
+
+def test_longest_names_fit_a_snapshot() -> None:
+    name: str = '\U0001F331' * constants.MAX_NAME_LENGTH
+    game: Game = lobby.create_game(name, 'public')['game']
+    lobby.add_player(game, name[1:])
+    assert [player.name for player in snapshot.loads(snapshot.dumps(game)).players] == [name, name[1:]]
+
+
+@pytest.mark.parametrize('trade_id', [None, 7, ['abc123'], {'id': 'abc123'}])
+def test_answering_trade_rejects_id(trade_id) -> None:
+    game = Game('public', seed=0)
+    for name in ('host', 'guest'):
+        game.add_player(Player(name))
+    game.start_game(game.players[0])
+    guest: Player = game.players[1]
+    assert game.accept_trade(guest, trade_id, []) == {'error': 'Trade does not exist'}
+    assert game.reject_trade(guest, trade_id) == {'error': 'Trade does not exist'}
+
+
+@pytest.mark.parametrize('card_id', [None, 7, ['abc'], {'id': 'abc'}])
+def test_playing_card_rejects_id(card_id) -> None:
+    game = Game('public', seed=0)
+    for name in ('host', 'guest'):
+        game.add_player(Player(name))
+    game.start_game(game.players[0])
+    host, guest = game.players
+    game.stage_index = 3
+    game.market.extend(game.draw_cards(2))
+    guest.pending_cards.extend(game.draw_cards(1))
+    assert game.market_to_field(host, 0, card_id) == {'error': 'Card id must be a string'}
+    assert game.pending_to_field(guest, 0, card_id) == {'error': 'Card id must be a string'}
+    assert len(game.market) == 2 and len(guest.pending_cards) == 1
+
+
+def test_rejected_actions_change_nothing() -> None:
+    game = Game('public', seed=0)
+    for name in ('host', 'guest'):
+        game.add_player(Player(name))
+    game.start_game(game.players[0])
+    host, guest = game.players
+    game.stage_index = 3
+    game.create_trade(host, 'guest', [host.hand.first().id], ['Soy Bean'])
+    trade_id: str = next(iter(game.trades))
+    recorded: list = []
+    game.recorder = lambda game, action, args: recorded.append(action)
+    game.public_snapshot()
+    version, last_active = game.version, game.last_active
+    assert game.buy_field(host).get('error')
+    assert game.deck_to_hand(guest).get('error')
+    assert game.accept_trade(guest, trade_id, [guest.hand.first().id]).get('error')
+    assert game.version == version and game.last_active == last_active and not recorded
+    assert game.snapshot_version == version and not game.trades[trade_id].p2_trades
+    assert not game.deck_to_hand(host).get('error')
+    assert game.version == version + 1 and recorded == ['deck_to_hand']
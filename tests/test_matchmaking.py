@@ -0,0 +1,131 @@
+'''
+Matchmaking (app/matchmaking.py and lobby.join_game/list_games) lists only the games a
+player can join, public, Awaiting and not full, fullest first and oldest first among
+equally full games, and drops a game once it starts, empties or is reaped.
+'''
+from itertools import count
+from typing import Dict, List
+
+import pytest
+
+from game import Game
+from matchmaking import Matchmaker
+from player import Player
+from reaper import Reaper
+import constants
+import lobby
+
+
+@pytest.fixture
+def matchmaker(monkeypatch) -> Matchmaker:
+    '''Matchmaking for the lobby without the games other tests left in it'''
+    fresh = Matchmaker()
+    monkeypatch.setattr(lobby, 'matchmaker', fresh)
+    return fresh
+
+
+# Game ids derive from the seed, so every game gets its own
+seeds = count()
+
+
+def new_game(player_count: int, game_type: str = 'public') -> Game:
+    game = Game(game_type, seed=next(seeds))
+    for i in range(player_count):
+        game.add_player(Player('player{}'.format(i)))
+    return game
+
+
+def lobby_game(players: int) -> Game:
+    '''Returns a public game created through the lobby with players players'''
+    game: Game = lobby.create_game('player0', 'public')['game']
+    for i in range(1, players):
+        lobby.add_player(game, 'player{}'.format(i))
+    return game
+
+
+def listed(matchmaker: Matchmaker) -> List[Game]:
+    return matchmaker.page(0, 100)[0]
+
+
+def test_lists_only_joinable_games() -> None:
+    matchmaker = Matchmaker()
+    joinable: Game = new_game(1)
+    private: Game = new_game(1, 'private')
+    full: Game = new_game(constants.MAX_PLAYERS)
+    running: Game = new_game(2)
+    running.start_game(running.players[0])
+    for game in (joinable, private, full, running):
+        matchmaker.update(game)
+    assert listed(matchmaker) == [joinable] and len(matchmaker) == 1
+
+
+def test_fullest_games_first_then_oldest() -> None:
+    matchmaker = Matchmaker()
+    one, three, two, also_three = new_game(1), new_game(3), new_game(2), new_game(3)
+    for game in (one, three, two, also_three):
+        matchmaker.update(game)
+    assert listed(matchmaker) == [three, also_three, two, one]
+    assert matchmaker.find() is three
+    # A game joins the back of its new player count
+    one.add_player(Player('late'))
+    matchmaker.update(one)
+    assert listed(matchmaker) == [three, also_three, two, one]
+    two.add_player(Player('late'))
+    matchmaker.update(two)
+    assert listed(matchmaker) == [three, also_three, two, one]
+    assert matchmaker.buckets[two.id] == 3
+
+
+def test_join_without_game_id_picks_fullest(matchmaker: Matchmaker) -> None:
+    lobby_game(1)
+    fullest: Game = lobby_game(3)
+    result: Dict = lobby.join_game('joiner', '')
+    assert result['game'] is fullest and len(fullest.players) == 4
+    assert matchmaker.buckets[fullest.id] == 4
+
+
+def test_join_without_game_id_fails_when_none_waiting(matchmaker: Matchmaker) -> None:
+    assert lobby.join_game('joiner', '') == {'error': 'No public games are waiting for players'}
+
+
+def test_started_game_is_dropped(matchmaker: Matchmaker) -> None:
+    game: Game = lobby_game(2)
+    assert listed(matchmaker) == [game]
+    game.start_game(game.players[0])
+    lobby.save(game)
+    assert listed(matchmaker) == []
+
+
+def test_filled_game_is_dropped(matchmaker: Matchmaker) -> None:
+    game: Game = lobby_game(constants.MAX_PLAYERS - 1)
+    lobby.join_game('last', '')
+    assert game.is_full() and listed(matchmaker) == []
+
+
+def test_emptied_game_is_dropped(matchmaker: Matchmaker) -> None:
+    game: Game = lobby_game(2)
+    for player in list(game.players):
+        lobby.leave_game(game, player)
+        lobby.save(game)
+    assert game.status == 'Completed' and listed(matchmaker) == []
+
+
+def test_reaped_game_is_dropped(matchmaker: Matchmaker) -> None:
+    game: Game = lobby_game(2)
+    reaper = Reaper({'Awaiting': 10}, lobby.remove_game, lambda: game.last_active + 10)
+    reaper.track(game)
+    assert reaper.reap() == [game]
+    assert listed(matchmaker) == [] and not matchmaker.buckets
+
+
+def test_list_games_pages(matchmaker: Matchmaker) -> None:
+    games: List[Game] = [lobby_game(players) for players in (1, 2, 3, 2, 1)]
+    page: Dict = lobby.list_games(1, 2)
+    assert page['total'] == 5
+    assert [entry['game_id'] for entry in page['games']] == [games[1].id, games[3].id]
+    assert page['games'][0] == {'game_id': games[1].id, 'host': 'player0', 'player_count': 2,
+                                'max_players': constants.MAX_PLAYERS}
+    assert lobby.list_games(4, 100)['games'][0]['game_id'] == games[4].id
+    assert lobby.list_games(5, 10) == {'games': [], 'total': 5}
+    for offset, limit in ((-1, 10), (0, 0), (0, 101)):
+        assert lobby.list_games(offset, limit).get('error')
@@ -0,0 +1,75 @@
+'''
+Metrics (app/metrics.py) rendered in the Prometheus text format: histogram buckets are
+cumulative and inclusive of their upper bound, and every series is a HELP and TYPE header
+followed by one "name{labels} value" line per sample.
+'''
+import re
+from typing import Iterator, List
+
+import pytest
+
+import metrics
+
+SAMPLE = re.compile(r'^[a-zA-Z_:][a-zA-Z0-9_:]*(\{([a-zA-Z_][a-zA-Z0-9_]*="([^"\\]|\\.)*",?)*\})? \S+$')
+
+
+@pytest.fixture
+def registry() -> Iterator[List[metrics.Metric]]:
+    '''Drops the metrics a test registers, so the servers' /metrics don't show them'''
+    registered: int = len(metrics.REGISTRY)
+    yield metrics.REGISTRY
+    del metrics.REGISTRY[registered:]
+
+
+def check_format(text: str) -> None:
+    '''Checks text is in the Prometheus text format'''
+    assert text.endswith('\n')
+    for line in text.splitlines():
+        assert line.startswith(('# HELP ', '# TYPE ')) or SAMPLE.match(line), line
+
+
+def test_histogram_buckets(registry) -> None:
+    histogram = metrics.Histogram('test_seconds', 'Test latency', (0.1, 1.0), ('route',))
+    for value in (0.05, 0.1, 0.5, 1.0, 3.0):
+        histogram.observe(value, '/a')
+    histogram.observe(0.2, '/b')
+    assert histogram.render() == [
+        '# HELP test_seconds Test latency',
+        '# TYPE test_seconds histogram',
+        'test_seconds_bucket{route="/a",le="0.1"} 2',
+        'test_seconds_bucket{route="/a",le="1.0"} 4',
+        'test_seconds_bucket{route="/a",le="+Inf"} 5',
+        'test_seconds_sum{route="/a"} 4.65',
+        'test_seconds_count{route="/a"} 5',
+        'test_seconds_bucket{route="/b",le="0.1"} 0',
+        'test_seconds_bucket{route="/b",le="1.0"} 1',
+        'test_seconds_bucket{route="/b",le="+Inf"} 1',
+        'test_seconds_sum{route="/b"} 0.2',
+        'test_seconds_count{route="/b"} 1'
+    ]
+
+
+def test_counter_and_gauge(registry) -> None:
+    counter = metrics.Counter('test_total', 'Test events', ('kind',))
+    counter.inc('b')
+    counter.inc('a', amount=2)
+    counter.inc('b')
+    gauge = metrics.Gauge('test_open', 'Test gauge', collect=lambda: {(): 3})
+    assert counter.samples() == ['test_total{kind="a"} 2', 'test_total{kind="b"} 2']
+    assert gauge.render() == ['# HELP test_open Test gauge', '# TYPE test_open gauge', 'test_open 3']
+
+
+def test_label_values_are_escaped(registry) -> None:
+    counter = metrics.Counter('test_total', 'Test events', ('path',))
+    counter.inc('/a"b\\c')
+    assert counter.samples() == ['test_total{path="/a\\"b\\\\c"} 1']
+    check_format(metrics.render())
+
+
+def test_render_is_prometheus_text(registry) -> None:
+    metrics.requests.observe(0.003, '/api/game/<game_id>', 'GET')
+    metrics.emits.inc('client update')
+    text: str = metrics.render()
+    check_format(text)
+    assert '# TYPE tbg_request_seconds histogram' in text
+    assert 'tbg_request_seconds_bucket{route="/api/game/<game_id>",method="GET",le="+Inf"}' in text
@@ -0,0 +1,68 @@
+'''
+Batches of moves (app/moves.py) are made whole or not at all: a batch failing part way
+leaves the game, and the journal's copy of it, as before the batch.
+'''
+import random
+from typing import Dict, List
+
+from game import Game
+from journal import Journal
+from player import Player
+import moves
+import play
+
+
+def new_game() -> Game:
+    game = Game('public', seed=0)
+    for name in ('host', 'guest'):
+        game.add_player(Player(name))
+    game.start_game(game.players[0])
+    return game
+
+
+def without_version(state: Dict) -> Dict:
+    return dict(state, version=None)
+
+
+def test_batch_makes_every_move() -> None:
+    game: Game = new_game()
+    result: Dict = moves.apply_moves(game, game.players[0], [
+        {'move': 'play/hand', 'field_index': 0}, {'move': 'draw/market'}
+    ])
+    assert result['applied'] == 2 and not result.get('error')
+    assert game.stage_index == 3 and len(game.market) == 2
+
+
+def test_failed_batch_makes_no_moves() -> None:
+    game: Game = new_game()
+    before: Dict = play.state(game)
+    version: int = game.version
+    result: Dict = moves.apply_moves(game, game.players[0], [
+        {'move': 'play/hand', 'field_index': 0}, {'move': 'draw/market'}, {'move': 'play/hand', 'field_index': 9}
+    ])
+    assert result == {'error': 'Invalid move', 'failed': 2}
+    assert without_version(play.state(game)) == without_version(before)
+    assert game.version > version
+    # The restored game plays on as if the batch was never sent
+    assert not moves.apply_moves(game, game.players[0], [{'move': 'play/hand', 'field_index': 0}]).get('error')
+
+
+def test_failed_batch_recovers_restored(tmp_path) -> None:
+    rng = random.Random(0)
+    journal = Journal(str(tmp_path))
+    game: Game = new_game()
+    journal.record_created(game)
+    game.recorder = journal.record
+    moves.apply_moves(game, game.players[0], [{'move': 'play/hand', 'field_index': 0}, {'move': 'buy'}])
+    for _ in range(100):
+        play.random_move(game, rng)
+    journal.close()
+    recovered: Dict[str, Game] = Journal(str(tmp_path)).recover()
+    assert play.state(recovered[game.id]) == play.state(game)
+
+
+def test_batch_limits() -> None:
+    game: Game = new_game()
+    batch: List[Dict] = [{'move': 'buy'}] * (moves.MAX_BATCH + 1)
+    assert moves.apply_moves(game, game.players[0], batch).get('error')
+    assert moves.apply_moves(game, game.players[0], []).get('error')
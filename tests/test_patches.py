@@ -0,0 +1,102 @@
+'''
+Wire compatibility of 'client update': the patches sent to players, applied with jsonpatch
+in the order sent the way clients apply them, must bring every player's view to exactly
+the full view GET /api/game/<game_id> returns, after every move of random games including
+joins, trades and players leaving. The same holds for the patches replayed to a client
+resuming its session from an older view.
+'''
+import json
+import random
+from typing import Callable, Dict, List, Tuple
+
+import jsonpatch
+import pytest
+
+from game import Game
+from player import Player
+import constants
+import lobby
+import play
+import serializer
+
+MOVES: int = 300
+
+# Sends a game's pending update, returning each patch with the player it reaches in the order sent
+Send = Callable[[Game], List[Tuple[Player, str]]]
+
+
+def full_view(game: Game, player: Player) -> Dict:
+    return json.loads(serializer.encode_view(game, player))
+
+
+def collected(game: Game) -> List[Tuple[Player, str]]:
+    return serializer.encode_patches(game.collect_patches())
+
+
+def sent_to_rooms(game: Game) -> List[Tuple[Player, str]]:
+    return [(player, patch) for room, patch in lobby.client_updates(game)
+            for player in game.players if room in lobby.rooms(game, player)]
+
+
+def play_game(seed: int, send: Send) -> Tuple[Game, Dict[Tuple[str, int], Dict]]:
+    '''
+    Plays a random game, checking every player's patched view against their full view after
+    each update. Returns the game and every view seen, by player token and view version.
+    '''
+    rng = random.Random(seed)
+    game = Game('public', seed=seed)
+    # Game ids follow the seed, so drop the history an earlier game with this id left
+    lobby.histories.pop(game.id, None)
+    views: Dict[str, Dict] = {}
+    seen: Dict[Tuple[str, int], Dict] = {}
+
+    def update() -> None:
+        for player, patch in send(game):
+            views[player.token] = jsonpatch.apply_patch(views[player.token], json.loads(patch))
+        for token in set(views) - {player.token for player in game.players}:
+            del views[token]
+        for player in game.players:
+            assert views[player.token] == full_view(game, player)
+            seen[player.token, views[player.token]['version']] = views[player.token]
+
+    for i in range(rng.randint(2, constants.MAX_PLAYERS)):
+        player = Player('player{}'.format(i))
+        game.add_player(player)
+        player.socket_sid = 'sid{}'.format(i)
+        # Joining players are sent their full view
+        views[player.token] = full_view(game, player)
+        update()
+    game.start_game(game.players[0])
+    update()
+    for _ in range(MOVES):
+        if game.status != 'Running':
+            break
+        play.random_move(game, rng)
+        update()
+    return game, seen
+
+
+@pytest.mark.parametrize('seed', range(100))
+def test_collected_patches(seed: int) -> None:
+    play_game(seed, collected)
+
+
+@pytest.mark.parametrize('seed', range(50))
+def test_patches_sent_to_rooms(seed: int) -> None:
+    play_game(seed, sent_to_rooms)
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_resumed_views(seed: int) -> None:
+    game, seen = play_game(seed, sent_to_rooms)
+    players: Dict[str, Player] = {player.token: player for player in game.players}
+    for (token, version), view in seen.items():
+        if token not in players:
+            continue
+        patches = lobby.missed_updates(game, players[token], version)
+        if patches is None:
+            assert version < lobby.histories[game.id].floor
+            continue
+        for patch in patches:
+            view = jsonpatch.apply_patch(view, json.loads(patch))
+        assert view == full_view(game, players[token])
@@ -0,0 +1,55 @@
+'''
+Field payouts looked up in the per-type tables built from constants.CARD_TYPES, checked for
+every bean type and field size against the range based rules Field.get_trade_value was
+originally written with.
+'''
+from typing import List, Tuple
+
+import pytest
+
+from card import CARD_CATALOG, Card, CardType, Field
+import constants
+
+
+def range_payout(values: tuple, size: int) -> int:
+    '''Payout rules as originally written in Field.get_trade_value'''
+    value_ranges: Tuple[List[int], ...] = (
+        list(range(values[0], values[1])),
+        list(range(values[1], values[2])),
+        list(range(values[2], values[3])),
+        list(range(values[3], constants.MAX_CARDS))
+    )
+    for value, value_range in enumerate(value_ranges):
+        if size in value_range:
+            return value + 1
+    return 0
+
+
+card_types = pytest.mark.parametrize('card_type', CARD_CATALOG, ids=lambda card_type: card_type.name)
+
+
+@card_types
+def test_table_matches_range_rules(card_type: CardType) -> None:
+    for size in range(constants.MAX_CARDS + 1):
+        assert card_type.payouts[size] == range_payout(card_type.values, size), size
+
+
+@card_types
+def test_payout_never_drops_as_field_grows(card_type: CardType) -> None:
+    # The original last range ends before MAX_CARDS, so the table keeps paying 0 there
+    payouts: Tuple[int, ...] = tuple(card_type.payouts[:constants.MAX_CARDS])
+    assert payouts[0] == 0
+    assert all(smaller <= larger for smaller, larger in zip(payouts, payouts[1:]))
+    assert max(card_type.payouts) <= len(card_type.values)
+
+
+@card_types
+def test_field_pays_table_value(card_type: CardType) -> None:
+    field = Field(True)
+    for size in range(1, card_type.count + 1):
+        field.add_card(Card(card_type))
+        assert field.get_trade_value() == range_payout(card_type.values, size), size
+
+
+def test_empty_field_pays_nothing() -> None:
+    assert Field(True).get_trade_value() == 0
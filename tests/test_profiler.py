@@ -0,0 +1,62 @@
+'''
+Profiling (app/profiler.py), switched on for each test: nested spans each time their own
+block into the span histogram, and a sampled block is recorded by the collector, once even
+when samples nest.
+'''
+import os
+from typing import Iterator, List
+
+import pytest
+
+import metrics
+import profiler
+
+
+def work() -> int:
+    return sum(range(1000))
+
+
+@pytest.fixture
+def profiling(monkeypatch, tmp_path) -> Iterator[profiler.CollapsedCollector]:
+    registered: int = len(metrics.REGISTRY)
+    collector = profiler.CollapsedCollector(os.path.join(str(tmp_path), profiler.CollapsedCollector.file_name))
+    monkeypatch.setattr(profiler, 'PROFILE', True)
+    monkeypatch.setattr(profiler, 'PROFILE_SAMPLE', 1.0)
+    monkeypatch.setattr(profiler, 'DUMP_EVERY', 1)
+    monkeypatch.setattr(profiler, 'sample_count', 0)
+    monkeypatch.setattr(profiler, 'collector', collector)
+    monkeypatch.setattr(profiler, 'spans', metrics.Histogram('test_span_seconds', 'Test spans',
+                                                             metrics.LATENCY_BUCKETS, ('span',)))
+    yield collector
+    del metrics.REGISTRY[registered:]
+
+
+def test_disabled_profiler_does_nothing() -> None:
+    assert not profiler.PROFILE
+    assert profiler.span('request') is profiler.NO_SPAN and profiler.sample() is profiler.NO_SPAN
+
+
+def test_nested_spans_are_timed(profiling) -> None:
+    with profiler.span('outer'):
+        with profiler.span('inner'):
+            work()
+        with profiler.span('inner'):
+            work()
+    series = profiler.spans.series
+    assert sorted(series) == [('inner',), ('outer',)]
+    # Each series holds a count per bucket and above the last, then the sum
+    assert sum(series['inner',][:-1]) == 2 and sum(series['outer',][:-1]) == 1
+    assert series['outer',][-1] >= series['inner',][-1] > 0
+
+
+def test_sample_records_call_stacks(profiling) -> None:
+    with profiler.sample():
+        # Only the outermost sample profiles
+        assert profiler.sample() is profiler.NO_SPAN
+        work()
+    assert not profiler.sampling and profiler.sample_count == 1
+    assert any(stack.endswith('test_profiler.py:work') for stack in profiling.stacks)
+    with open(profiling.path) as collapsed_file:
+        lines: List[str] = collapsed_file.read().splitlines()
+    assert any('test_profiler.py:work' in line for line in lines)
+    assert all(int(line.rsplit(' ', 1)[1]) >= 1 for line in lines)
@@ -0,0 +1,87 @@
+'''
+Games the reaper must evict, and keep, on a fake clock: a game is evicted once idle past the
+TTL for its current status, including a status it reached after being tracked.
+'''
+import time
+from typing import Dict, List
+
+from game import Game
+import config
+import lobby
+from reaper import Reaper
+
+TTLS: Dict[str, float] = {'Awaiting': 100, 'Running': 1000, 'Completed': 10}
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now: float = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def new_game(status: str) -> Game:
+    game = Game('public', new_deck=False, seed=0)
+    game.status = status
+    game.last_active = 0.0
+    return game
+
+
+def test_evicts_idle_games() -> None:
+    clock = Clock()
+    evicted: List[Game] = []
+    reaper = Reaper(TTLS, evicted.append, clock)
+    game: Game = new_game('Awaiting')
+    reaper.track(game)
+    clock.now = 99
+    assert not reaper.reap()
+    clock.now = 100
+    assert reaper.reap() == [game] and evicted == [game]
+    assert not reaper.games and not reaper.entries
+
+
+def test_keeps_active_games() -> None:
+    clock = Clock()
+    reaper = Reaper(TTLS, lambda game: None, clock)
+    game: Game = new_game('Running')
+    reaper.track(game)
+    game.last_active = 900
+    clock.now = 1500
+    assert not reaper.reap()
+    clock.now = 1900
+    assert reaper.reap() == [game]
+
+
+def test_completed_game_evicted_after_completed_ttl() -> None:
+    clock = Clock()
+    reaper = Reaper(TTLS, lambda game: None, clock)
+    game: Game = new_game('Running')
+    reaper.track(game)
+    clock.now = game.last_active = 500
+    game.status = 'Completed'
+    reaper.reschedule(game)
+    clock.now = 509
+    assert not reaper.reap()
+    clock.now = 510
+    assert reaper.reap() == [game]
+    # The game's entry from while it was running is dropped rather than evicting it again
+    clock.now = 2000
+    assert not reaper.reap() and not reaper.heap
+
+
+def test_reschedule_ignores_unchanged_status() -> None:
+    reaper = Reaper(TTLS, lambda game: None, Clock())
+    game: Game = new_game('Running')
+    reaper.track(game)
+    reaper.reschedule(game)
+    assert len(reaper.heap) == 1
+
+
+def test_save_reschedules_completed_game() -> None:
+    game: Game = lobby.create_game('host', 'public')['game']
+    game.status = 'Completed'
+    game.last_active = time.monotonic() - config.TTL_COMPLETED - 1
+    lobby.save(game)
+    assert game in lobby.reaper.reap()
+    assert not lobby.store.get(game.id)
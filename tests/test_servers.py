@@ -0,0 +1,138 @@
+'''
+The Flask-SocketIO server (TBG.py, through Flask's test client) and the ASGI server
+(asgi_server.py, routing parsed requests directly) answer alike: the batch moves route,
+/api/game/<game_id>/moves, makes a batch whole or answers with an error leaving the game
+as it was, /api/games pages through the games waiting for players, /metrics is served in
+the Prometheus text format, and unknown routes and methods get the same status on both.
+
+TBG is imported first: it applies gevent's monkey patching, which must happen before any
+other module creates a lock or thread, as it does for bench/bench_server.py.
+'''
+import TBG
+
+import json
+from typing import Callable, Dict, List, Tuple
+
+import pytest
+
+from game import Game
+from matchmaking import Matchmaker
+import asgi_server
+import lobby
+import metrics
+import play
+
+Post = Callable[[Game, str, Dict], Tuple[int, Dict]]
+Send = Callable[[str, str, str], Tuple[int, Dict]]
+
+
+def post_flask(game: Game, token: str, data: Dict) -> Tuple[int, Dict]:
+    client = TBG.app.test_client()
+    client.set_cookie('localhost', 'tbg_token', token)
+    response = client.post('/api/game/{}/moves'.format(game.id), data=json.dumps(data),
+                           content_type='application/json')
+    return response.status_code, json.loads(response.get_data(as_text=True))
+
+
+def post_asgi(game: Game, token: str, data: Dict) -> Tuple[int, Dict]:
+    scope: Dict = {
+        'method': 'POST',
+        'path': '/api/game/{}/moves'.format(game.id),
+        'headers': [(b'cookie', 'tbg_token={}'.format(token).encode())]
+    }
+    response = asgi_server.route(asgi_server.Request(scope, json.dumps(data).encode()))
+    return response.status, json.loads(response.body)
+
+
+@pytest.fixture(params=[post_flask, post_asgi], ids=['flask', 'asgi'])
+def post(request) -> Post:
+    return request.param
+
+
+def send_flask(method: str, path: str, query: str = '') -> Tuple[int, Dict]:
+    response = TBG.app.test_client().open(path, method=method, query_string=query)
+    # Flask's own 404 and 405 pages are HTML
+    body = json.loads(response.get_data(as_text=True)) if response.mimetype == 'application/json' else None
+    return response.status_code, body
+
+
+def send_asgi(method: str, path: str, query: str = '') -> Tuple[int, Dict]:
+    scope: Dict = {'method': method, 'path': path, 'query_string': query.encode(), 'headers': []}
+    response = asgi_server.route(asgi_server.Request(scope, b''))
+    return response.status, json.loads(response.body)
+
+
+@pytest.fixture(params=[send_flask, send_asgi], ids=['flask', 'asgi'])
+def send(request) -> Send:
+    return request.param
+
+
+def started_game() -> Tuple[Game, str]:
+    '''Returns a started game of two players and the token of the player whose turn it is'''
+    result: Dict = lobby.create_game('host', 'private')
+    game: Game = result['game']
+    lobby.add_player(game, 'guest')
+    game.start_game(result['player'])
+    return game, result['player'].token
+
+
+def test_batch_succeeds(post: Post) -> None:
+    game, token = started_game()
+    status, body = post(game, token, {'moves': [{'move': 'play/hand', 'field_index': 0}, {'move': 'draw/market'}]})
+    assert status == 200 and body['applied'] == 2
+    assert game.stage_index == 3 and len(game.market) == 2
+
+
+def test_batch_failing_part_way_changes_nothing(post: Post) -> None:
+    game, token = started_game()
+    before: Dict = play.state(game)
+    status, body = post(game, token, {'moves': [
+        {'move': 'play/hand', 'field_index': 0}, {'move': 'play/hand', 'field_index': 9}
+    ]})
+    assert status == 400 and body == {'error': 'Invalid field index', 'failed': 1}
+    assert dict(play.state(game), version=None) == dict(before, version=None)
+    assert lobby.store.get(game.id) is game
+
+
+def test_unknown_routes_not_found(send: Send) -> None:
+    game, _ = started_game()
+    assert send('GET', '/nope')[0] == 404
+    assert send('POST', '/api/game/{}/nope'.format(game.id))[0] == 404
+
+
+def test_wrong_method_not_allowed(send: Send) -> None:
+    game, _ = started_game()
+    assert send('GET', '/api/game/{}/buy'.format(game.id))[0] == 405
+
+
+def test_owner_redirect_keeps_query() -> None:
+    scope: Dict = {'method': 'GET', 'path': '/api/games', 'query_string': b'offset=20&limit=10', 'headers': []}
+    response = asgi_server.owner_redirect(asgi_server.Request(scope, b''), 'http://node2:8080')
+    assert response.status == 307 and response.location == 'http://node2:8080/api/games?offset=20&limit=10'
+    scope['query_string'] = b''
+    assert asgi_server.owner_redirect(asgi_server.Request(scope, b''), 'http://node2:8080').location == \
+        'http://node2:8080/api/games'
+
+
+def test_list_games_pages(send: Send, monkeypatch) -> None:
+    monkeypatch.setattr(lobby, 'matchmaker', Matchmaker())
+    games: List[Game] = [lobby.create_game('host', 'public')['game'] for _ in range(3)]
+    lobby.add_player(games[2], 'guest')
+    status, body = send('GET', '/api/games', 'offset=1&limit=1')
+    assert status == 200 and body['total'] == 3
+    assert [entry['game_id'] for entry in body['games']] == [games[0].id]
+    status, body = send('GET', '/api/games', '')
+    assert [entry['game_id'] for entry in body['games']] == [games[2].id, games[0].id, games[1].id]
+    assert send('GET', '/api/games', 'limit=500')[0] == 400
+    assert send('GET', '/api/games', 'offset=first')[0] == 400
+
+
+def test_metrics_endpoint() -> None:
+    flask_response = TBG.app.test_client().get('/metrics')
+    asgi_response = asgi_server.route(asgi_server.Request({'method': 'GET', 'path': '/metrics', 'headers': []}, b''))
+    for status, content_type, text in (
+        (flask_response.status_code, flask_response.headers['Content-Type'], flask_response.get_data(as_text=True)),
+        (asgi_response.status, asgi_response.content_type, asgi_response.body.decode())
+    ):
+        assert status == 200 and content_type == metrics.CONTENT_TYPE
+        assert '# TYPE tbg_request_seconds histogram' in text and '# TYPE tbg_games gauge' in text
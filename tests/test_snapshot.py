@@ -0,0 +1,70 @@
+'''
+Round trips of whole games through snapshots (app/snapshot.py): after every move of random
+games of every size, loading a snapshot must give back the same game, however many
+trades are open.
+'''
+import random
+
+import pytest
+
+from game import Game
+from player import Player
+import constants
+import game as game_module
+import play
+import snapshot
+
+
+@pytest.mark.parametrize('player_count', range(2, constants.MAX_PLAYERS + 1))
+def test_round_trip_after_every_move(player_count: int) -> None:
+    rng = random.Random(player_count)
+    game: Game = play.new_game(rng, player_count)
+    for _ in range(300):
+        if game.status != 'Running':
+            break
+        play.random_move(game, rng)
+        assert play.state(snapshot.loads(snapshot.dumps(game))) == play.state(game)
+
+
+def test_loaded_game_plays_on_the_same() -> None:
+    rng = random.Random(0)
+    game: Game = play.new_game(rng, constants.MAX_PLAYERS)
+    for _ in range(50):
+        play.random_move(game, rng)
+    loaded: Game = snapshot.loads(snapshot.dumps(game))
+    moves, loaded_moves = random.Random(1), random.Random(1)
+    for _ in range(200):
+        play.random_move(game, moves)
+        play.random_move(loaded, loaded_moves)
+    assert play.state(loaded) == play.state(game)
+
+
+def test_loaded_game_is_complete() -> None:
+    game: Game = play.new_game(random.Random(0), 3)
+    loaded: Game = snapshot.loads(snapshot.dumps(game))
+    assert vars(loaded).keys() == vars(game).keys()
+    for player, loaded_player in zip(game.players, loaded.players):
+        assert vars(loaded_player).keys() == vars(player).keys()
+        for field, loaded_field in zip(player.fields, loaded_player.fields):
+            assert vars(loaded_field).keys() == vars(field).keys()
+
+
+def test_rejects_other_data() -> None:
+    with pytest.raises(snapshot.SnapshotError):
+        snapshot.loads(b'not a snapshot')
+    data: bytearray = bytearray(snapshot.dumps(play.new_game(random.Random(0), 2)))
+    data[len(snapshot.MAGIC)] = snapshot.VERSION + 1
+    with pytest.raises(snapshot.SnapshotError):
+        snapshot.loads(bytes(data))
+
+
+def test_round_trip_more_than_255_trades(monkeypatch) -> None:
+    monkeypatch.setattr(game_module, 'MAX_OPEN_TRADES', 1000)
+    game: Game = play.new_game(random.Random(0), constants.MAX_PLAYERS)
+    game.stage_index = 3
+    host: Player = game.players[0]
+    for index in range(300):
+        assert not game.create_trade(host, game.players[1 + index % 6].name, [], ['Soy Bean']).get('error')
+    loaded: Game = snapshot.loads(snapshot.dumps(game))
+    assert len(loaded.trades) == 300
+    assert play.state(loaded) == play.state(game)
@@ -0,0 +1,91 @@
+'''
+RedisStore (app/store.py) against fakeredis: two nodes sharing one server must hand games
+and client tokens between them, and a game must never be cached without being saved.
+'''
+import random
+import threading
+import time
+from typing import List, Optional
+
+import fakeredis
+import pytest
+
+from game import Game
+from store import RedisStore
+import play
+import snapshot
+
+
+def test_two_nodes_round_trip() -> None:
+    server = fakeredis.FakeServer()
+    first = RedisStore(fakeredis.FakeStrictRedis(server=server))
+    second = RedisStore(fakeredis.FakeStrictRedis(server=server))
+    rng = random.Random(0)
+    game: Game = play.new_game(rng, 4)
+    first.add(game)
+    for player in game.players:
+        first.add_client(player.token, game.id)
+
+    moved: Optional[Game] = second.get(game.id)
+    assert moved is not None and moved is not game
+    assert play.state(moved) == play.state(game)
+    assert [second.get_game_id(player.token) for player in game.players] == [game.id] * 4
+
+    # The second node serves the game from now on, and a restarted first node picks up its moves
+    for _ in range(100):
+        play.random_move(moved, rng)
+        second.save(moved)
+    restarted = RedisStore(fakeredis.FakeStrictRedis(server=server))
+    assert play.state(restarted.get(game.id)) == play.state(moved)
+
+    second.remove(game.id)
+    assert RedisStore(fakeredis.FakeStrictRedis(server=server)).get(game.id) is None
+
+
+def test_unsaved_game_is_not_cached() -> None:
+    def fail(game: Game) -> bytes:
+        raise ValueError('Cannot save')
+
+    store = RedisStore(fakeredis.FakeStrictRedis(), dumps=fail)
+    game: Game = play.new_game(random.Random(0), 2)
+    with pytest.raises(ValueError):
+        store.add(game)
+    assert store.get(game.id) is None
+    assert not store.games()
+
+
+def test_first_loads_share_one_game() -> None:
+    def slow_loads(data: bytes) -> Game:
+        time.sleep(0.01)
+        return snapshot.loads(data)
+
+    server = fakeredis.FakeServer()
+    game: Game = play.new_game(random.Random(0), 2)
+    RedisStore(fakeredis.FakeStrictRedis(server=server)).add(game)
+    store = RedisStore(fakeredis.FakeStrictRedis(server=server), loads=slow_loads)
+    loaded: List[Optional[Game]] = []
+    threads: List[threading.Thread] = [
+        threading.Thread(target=lambda: loaded.append(store.get(game.id))) for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(loaded) == 4 and all(other is loaded[0] for other in loaded)
+
+
+def test_remote_client_tokens_are_not_cached() -> None:
+    server = fakeredis.FakeServer()
+    first = RedisStore(fakeredis.FakeStrictRedis(server=server))
+    second = RedisStore(fakeredis.FakeStrictRedis(server=server))
+    game: Game = play.new_game(random.Random(0), 2)
+    first.add(game)
+    for player in game.players:
+        first.add_client(player.token, game.id)
+
+    # Looking a token up to redirect its client leaves nothing behind on the other node
+    assert [second.get_game_id(player.token) for player in game.players] == [game.id] * 2
+    assert second.client_count() == 0
+    second.get(game.id)
+    second.get_game_id(game.players[0].token)
+    assert second.client_count() == 1
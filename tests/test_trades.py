@@ -0,0 +1,89 @@
+'''
+Open trades and their indexes by player and by offered card (Game.add_trade, remove_trade
+and invalidate_trades): a trade closes once a card it offers leaves the market or a hand,
+answering a trade drops it from every index, and a player's open offers are capped.
+'''
+from typing import List
+
+from game import Game
+from player import Player
+import game as game_module
+
+
+def trading_game() -> Game:
+    '''Returns a game of three players at the host's trading stage, with two cards in the market'''
+    game = Game('public', seed=0)
+    for name in ('host', 'guest', 'third'):
+        game.add_player(Player(name))
+    game.start_game(game.players[0])
+    game.stage_index = 3
+    game.market.extend(game.draw_cards(2))
+    return game
+
+
+def assert_no_trades(game: Game) -> None:
+    assert not game.trades and not game.card_trades
+    assert not any(game.player_trades.values())
+    for player in game.players:
+        assert game.trades_to_dict(player) == []
+
+
+def test_trade_closes_when_market_card_is_played() -> None:
+    game: Game = trading_game()
+    host: Player = game.players[0]
+    card_id: str = game.market.first().id
+    game.create_trade(host, 'guest', [card_id], [])
+    game.create_trade(host, 'third', [card_id], [])
+    assert len(game.trades) == 2 and game.card_trades == {card_id: set(game.trades)}
+    assert not game.market_to_field(host, 0, card_id).get('error')
+    assert_no_trades(game)
+
+
+def test_trade_closes_when_hand_card_is_played() -> None:
+    game: Game = trading_game()
+    host: Player = game.players[0]
+    game.create_trade(host, 'guest', [host.hand.first().id], [])
+    other_id: str = game.market.first().id
+    game.create_trade(host, 'third', [other_id], [])
+    game.stage_index = 0
+    assert not game.hand_to_field(host, 0).get('error')
+    # Only the trade offering the played card closes
+    assert [trade.p2.name for trade in game.trades.values()] == ['third']
+    assert list(game.card_trades) == [other_id]
+    assert game.trades_to_dict(game.players[1]) == []
+
+
+def test_accepting_trade_clears_every_index() -> None:
+    game: Game = trading_game()
+    host, guest, third = game.players
+    offered: str = host.hand.first().id
+    wanted: List[str] = [guest.hand.first().name]
+    game.create_trade(host, 'guest', [offered], wanted)
+    # Offers the same card, so closes once the first trade takes it
+    game.create_trade(host, 'third', [offered], [])
+    trade_id: str = next(trade.id for trade in game.trades.values() if trade.p2 is guest)
+    assert not game.accept_trade(guest, trade_id, [guest.hand.first().id]).get('error')
+    assert_no_trades(game)
+    assert [card.id for card in guest.pending_cards] == [offered]
+
+
+def test_rejecting_trade_clears_every_index() -> None:
+    game: Game = trading_game()
+    host: Player = game.players[0]
+    game.create_trade(host, 'guest', [host.hand.first().id, game.market.first().id], [])
+    assert not game.reject_trade(game.players[1], next(iter(game.trades))).get('error')
+    assert_no_trades(game)
+
+
+def test_open_trades_are_capped(monkeypatch) -> None:
+    monkeypatch.setattr(game_module, 'MAX_OPEN_TRADES', 3)
+    game: Game = trading_game()
+    host, guest, third = game.players
+    for other in ('guest', 'third', 'guest'):
+        assert not game.create_trade(host, other, [], []).get('error')
+    assert game.create_trade(host, 'third', [], []) == {'error': 'Cannot have more than 3 open trades'}
+    assert len(game.trades) == 3
+    # Offers made to a player don't count against their own cap
+    assert not game.create_trade(guest, 'host', [], []).get('error')
+    game.reject_trade(guest, next(trade.id for trade in game.trades.values() if trade.p2 is guest))
+    assert not game.create_trade(host, 'third', [], []).get('error')